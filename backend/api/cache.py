@@ -0,0 +1,175 @@
+"""Caché en memoria de resultados costosos de la API.
+
+``ResultCache`` memoiza resultados por clave con desalojo LRU, expiración por
+TTL y un presupuesto de memoria aproximado. Cada entrada recuerda la
+generación de ingesta con la que se calculó (``database.ingest``); cuando el
+ETL termina un ciclo la generación avanza y las entradas viejas se descartan.
+
+Las peticiones concurrentes por la misma clave esperan al primer cálculo en
+lugar de repetirlo (single-flight), de modo que muchos visores simultáneos
+cuestan una sola interpolación.
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from database.ingest import get_ingest_generation
+
+# Máximo de claves con estadísticas individuales (las más recientes)
+MAX_KEY_STATS = 256
+
+
+def _estimate_bytes(value):
+    # Objetos con arreglos NumPy declaran su tamaño (``nbytes``)
+    nbytes = getattr(value, 'nbytes', None)
+    if nbytes is not None:
+        return int(nbytes)
+    try:
+        return len(json.dumps(value, default=str))
+    except (TypeError, ValueError):
+        return 0
+
+
+class _Entry:
+    __slots__ = ('value', 'size', 'generation', 'expires')
+
+    def __init__(self, value, size, generation, expires):
+        self.value = value
+        self.size = size
+        self.generation = generation
+        self.expires = expires
+
+
+class ResultCache:
+    def __init__(self, max_entries=128, ttl=900, max_bytes=64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        # Se conoce en el primer uso: construir la caché no consulta la BD
+        self._generation = None
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._key_stats = OrderedDict()
+        self._totals = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0}
+
+    # ------------------------------------------------------------------
+    def _key_stat(self, key):
+        stat = self._key_stats.get(key)
+        if stat is None:
+            stat = {'hits': 0, 'misses': 0, 'compute_ms_total': 0.0, 'compute_ms_last': 0.0}
+            self._key_stats[key] = stat
+            while len(self._key_stats) > MAX_KEY_STATS:
+                self._key_stats.popitem(last=False)
+        else:
+            self._key_stats.move_to_end(key)
+        return stat
+
+    def _drop(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+    def _sync_generation(self, generation):
+        """Adoptar ``generation`` (leída fuera del lock) y vaciar si cambió."""
+        if generation != self._generation:
+            if self._generation is not None:
+                self._totals['invalidations'] += 1
+            self._entries.clear()
+            self._bytes = 0
+            self._generation = generation
+
+    def _lookup(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires < time.monotonic():
+            self._drop(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _store(self, key, value, generation):
+        if generation != self._generation:
+            return  # calculado con datos de una ingesta anterior
+        size = _estimate_bytes(value)
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._drop(key)
+        self._entries[key] = _Entry(value, size, generation, time.monotonic() + self.ttl)
+        self._bytes += size
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+            self._totals['evictions'] += 1
+
+    # ------------------------------------------------------------------
+    def get_or_compute(self, key, compute):
+        """Devolver el valor cacheado para ``key`` o calcularlo con ``compute()``.
+
+        ``compute`` retorna ``(value, cacheable)``; solo se guardan los valores
+        con ``cacheable`` verdadero (p.ej. respuestas exitosas).
+        """
+        while True:
+            # Puede consultar la BD: fuera del lock para no encolar a los lectores
+            current = get_ingest_generation()
+            with self._lock:
+                self._sync_generation(current)
+                entry = self._lookup(key)
+                if entry is not None:
+                    self._totals['hits'] += 1
+                    self._key_stat(key)['hits'] += 1
+                    return entry.value
+                waiter = self._inflight.get(key)
+                if waiter is None:
+                    waiter = threading.Event()
+                    self._inflight[key] = waiter
+                    generation = self._generation
+                    self._totals['misses'] += 1
+                    self._key_stat(key)['misses'] += 1
+                    break
+            # Otro hilo está calculando esta clave: esperar y reintentar la lectura
+            waiter.wait()
+
+        start = time.perf_counter()
+        try:
+            value, cacheable = compute()
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            current = get_ingest_generation() if cacheable else None
+            with self._lock:
+                stat = self._key_stat(key)
+                stat['compute_ms_total'] += elapsed_ms
+                stat['compute_ms_last'] = elapsed_ms
+                if cacheable:
+                    self._sync_generation(current)
+                    self._store(key, value, generation)
+            return value
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            waiter.set()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'generation': self._generation,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'ttl_seconds': self.ttl,
+                **self._totals,
+                'keys': [
+                    {'key': list(key) if isinstance(key, tuple) else key, **stat,
+                     'compute_ms_total': round(stat['compute_ms_total'], 3),
+                     'compute_ms_last': round(stat['compute_ms_last'], 3)}
+                    for key, stat in reversed(self._key_stats.items())
+                ]
+            }
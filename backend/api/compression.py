@@ -0,0 +1,72 @@
+"""Compresión opcional (gzip / brotli) de respuestas grandes.
+
+Se activa con ``RESPONSE_COMPRESSION`` (lista separada por comas de
+``br`` y/o ``gzip``, en orden de preferencia). Solo se comprimen respuestas
+200 ya materializadas (no streaming) de tipos de texto/JSON con al menos
+``RESPONSE_COMPRESSION_MIN_BYTES``; el algoritmo se elige según
+``Accept-Encoding``. brotli requiere el paquete ``brotli``; si falta, se
+usa gzip.
+
+Útil cuando la API se expone sin un proxy que ya comprima (nginx, etc.).
+"""
+import gzip
+import logging
+import os
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - dependencia opcional
+    brotli = None
+
+RESPONSE_COMPRESSION = [
+    e.strip() for e in os.getenv('RESPONSE_COMPRESSION', '').split(',') if e.strip()
+]
+RESPONSE_COMPRESSION_MIN_BYTES = int(os.getenv('RESPONSE_COMPRESSION_MIN_BYTES', '1024'))
+# Nivel gzip (1-9); para brotli se usa como calidad (0-11)
+RESPONSE_COMPRESSION_LEVEL = int(os.getenv('RESPONSE_COMPRESSION_LEVEL', '5'))
+
+_COMPRESSIBLE = ('application/json', 'application/x-ndjson', 'text/')
+
+
+def _compress(encoding, data):
+    if encoding == 'br':
+        return brotli.compress(data, quality=min(11, RESPONSE_COMPRESSION_LEVEL))
+    return gzip.compress(data, compresslevel=RESPONSE_COMPRESSION_LEVEL, mtime=0)
+
+
+def _encodings():
+    encodings = []
+    for encoding in RESPONSE_COMPRESSION:
+        if encoding == 'br' and brotli is None:
+            logging.warning("RESPONSE_COMPRESSION incluye br pero el paquete brotli no está instalado")
+            continue
+        if encoding in ('br', 'gzip'):
+            encodings.append(encoding)
+    return encodings
+
+
+def compress_response(response, encodings):
+    if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers
+            or not (response.mimetype or '').startswith(_COMPRESSIBLE)):
+        return response
+    response.vary.add('Accept-Encoding')
+    accepted = request.accept_encodings
+    encoding = next((e for e in encodings if accepted[e]), None)
+    if encoding is None:
+        return response
+    data = response.get_data()
+    if len(data) < RESPONSE_COMPRESSION_MIN_BYTES:
+        return response
+    response.set_data(_compress(encoding, data))
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def init_app(app):
+    """Registrar la compresión como ``after_request`` si está configurada."""
+    encodings = _encodings()
+    if encodings:
+        app.after_request(lambda response: compress_response(response, encodings))
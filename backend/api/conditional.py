@@ -0,0 +1,61 @@
+"""Respuestas HTTP condicionales ligadas a la versión de ingesta.
+
+Los datos que sirve la API solo cambian cuando el ETL termina un ciclo con
+escrituras, así que la versión de ingesta (``database.ingest``) identifica el
+contenido de cualquier respuesta de lectura para una URL dada. El decorador
+``conditional`` agrega ``ETag`` (débil, ``W/"<versión>"``), ``Last-Modified``
+y ``Cache-Control``, y responde ``304 Not Modified`` a ``If-None-Match`` /
+``If-Modified-Since`` vigentes antes de ejecutar la vista, es decir, sin
+tocar la base de datos.
+
+``Cache-Control`` permite reutilizar la respuesta hasta el próximo ciclo
+esperado del ETL (``max-age`` = tiempo restante de ``ETL_POLL_SECONDS``) y
+exige revalidar después; pasado ese tiempo ``max-age`` queda en 0 y cada
+consulta se resuelve con un 304 barato mientras no haya ingesta nueva.
+"""
+from datetime import datetime, timezone
+from functools import wraps
+
+from flask import make_response, request
+
+from database.ingest import INGEST_POLL_SECONDS, get_ingest_state
+
+
+def _max_age(updated_at):
+    interval = INGEST_POLL_SECONDS
+    elapsed = (datetime.now(timezone.utc) - updated_at).total_seconds()
+    return int(min(interval, max(0.0, interval - elapsed)))
+
+
+def _not_modified(etag, updated_at):
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    since = request.if_modified_since
+    return since is not None and updated_at.replace(microsecond=0) <= since
+
+
+def _set_validators(response, etag, updated_at):
+    response.set_etag(etag, weak=True)
+    response.last_modified = updated_at
+    if 'Cache-Control' not in response.headers:
+        response.headers['Cache-Control'] = f"public, max-age={_max_age(updated_at)}, must-revalidate"
+    return response
+
+
+def conditional(view):
+    """Decorador para endpoints de lectura cuyo contenido depende solo de la
+    ingesta (y de la URL). Sin versión conocida (p.ej. base de datos caída)
+    la vista se ejecuta sin validadores."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        version, updated_at = get_ingest_state()
+        if version is None:
+            return view(*args, **kwargs)
+        etag = str(version)
+        if _not_modified(etag, updated_at):
+            return _set_validators(make_response('', 304), etag, updated_at)
+        response = make_response(view(*args, **kwargs))
+        if response.status_code == 200:
+            _set_validators(response, etag, updated_at)
+        return response
+    return wrapper
@@ -1,19 +1,79 @@
+import base64
 import logging
+import math
+import os
 from datetime import datetime, timedelta
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, send_file, stream_with_context
 from database.db_manager import get_db_cursor
+from database.ingest import get_ingest_version
+from database.rollups import consulta_agregada, consulta_cuadros
+from api.cache import ResultCache
+from api.conditional import conditional
+from api.serialization import dumps
+from api import tiles
+import metrics
 import numpy as np
 try:
-    from scipy.interpolate import griddata
+    from api.interpolation import interpolate_grid, interpolate_series, weights_cache_stats
     _SCIPY_AVAILABLE = True
 except Exception:  # pragma: no cover
     _SCIPY_AVAILABLE = False
 
 heatmap_api = Blueprint('heatmap_api', __name__)
 
+# Parámetro del API → columna de mediciones
+FIELD_MAP = {
+    'temperature': 't',
+    'humidity': 'h',
+    'pressure': 'p',
+    'wind_speed': 'ws',
+    'wind_direction': 'wd',
+    'precipitation': 'p1h'
+}
+
 # Estaciones excluidas permanentemente de cualquier interpolación (outliers espaciales)
 EXCLUDED_STATIONS = {403}
 
+# Máximo de celdas devueltas tras submuestrear la grilla interpolada
+MAX_CELLS = 2000
+# Formatos de respuesta de /heatmap/interpolate: lista de puntos (default),
+# grilla columnar con valores JSON o grilla con buffer float32 en base64
+RESPONSE_FORMATS = ('points', 'columnar', 'f32')
+
+# Caché de interpolaciones: se invalida cuando el ETL completa una ingesta
+_interpolation_cache = ResultCache(
+    max_entries=int(os.getenv('HEATMAP_CACHE_MAX_ENTRIES', '128')),
+    ttl=int(os.getenv('HEATMAP_CACHE_TTL', '900')),
+    max_bytes=int(float(os.getenv('HEATMAP_CACHE_MAX_MB', '64')) * 1024 * 1024)
+)
+
+# Grillas finas que alimentan las teselas (una por consulta)
+_tile_field_cache = ResultCache(
+    max_entries=int(os.getenv('HEATMAP_TILE_FIELDS', '16')),
+    ttl=int(os.getenv('HEATMAP_CACHE_TTL', '900')),
+    max_bytes=int(float(os.getenv('HEATMAP_CACHE_MAX_MB', '64')) * 1024 * 1024)
+)
+
+HEATMAP_METHODS = ('grid', 'poly2', 'poly3', 'idw', 'kriging')
+
+# Máximo de cuadros por petición de /heatmap/timeseries
+TIMESERIES_MAX_FRAMES = int(os.getenv('HEATMAP_TIMESERIES_MAX_FRAMES', '500'))
+# Cuadros interpolados por lote en /heatmap/timeseries (cada lote se emite apenas está listo)
+TIMESERIES_CHUNK_FRAMES = max(1, int(os.getenv('HEATMAP_TIMESERIES_CHUNK_FRAMES', '8')))
+# Lado máximo de la grilla pedida con grid_size (valores mayores se recortan)
+HEATMAP_MAX_GRID_SIZE = int(os.getenv('HEATMAP_MAX_GRID_SIZE', '500'))
+
+
+def _grid_size_arg(default=40):
+    """``grid_size`` de la query recortado a ``HEATMAP_MAX_GRID_SIZE``.
+
+    Lanza ``ValueError`` si no es un entero o es menor que 2.
+    """
+    grid_size = int(request.args.get('grid_size', default))
+    if grid_size < 2:
+        raise ValueError(f"grid_size inválido: {grid_size}")
+    return min(grid_size, HEATMAP_MAX_GRID_SIZE)
+
 
 # ---------------------------------------------------------------------------
 # Internal helper to build the heatmap points query (shared by both endpoints)
@@ -26,67 +86,49 @@ def _fetch_heatmap_points(parameter: str, agg: str, hours_back: str | None,
     (previous code attempted blueprint.test_request_context, which does not
     exist on Blueprint objects and caused AttributeError).
     """
-    field_map = {
-        'temperature': 't',
-        'humidity': 'h',
-        'pressure': 'p',
-        'wind_speed': 'ws',
-        'wind_direction': 'wd',
-        'precipitation': 'p1h'
-    }
-    if parameter not in field_map:
+    if parameter not in FIELD_MAP:
         return False, (jsonify({'success': False, 'error': 'Parámetro inválido'}), 400)
 
-    value_field = field_map[parameter]
-    where_clauses = [f"m.{value_field} IS NOT NULL", "e.codigo <> 403"]
-    params = []
+    value_field = FIELD_MAP[parameter]
+    desde = hasta = None
 
     # Time window handling
     if hours_back:
         try:
             hb = int(hours_back)
-            since = datetime.utcnow() - timedelta(hours=hb)
-            where_clauses.append("m.fecha_medicion >= %s")
-            params.append(since)
+            desde = datetime.utcnow() - timedelta(hours=hb)
         except ValueError:
             return False, (jsonify({'success': False, 'error': 'hours_back inválido'}), 400)
     else:
         try:
             if start_date:
-                start_dt = datetime.strptime(start_date, '%Y-%m-%d')
-                where_clauses.append("m.fecha_medicion >= %s")
-                params.append(start_dt)
+                desde = datetime.strptime(start_date, '%Y-%m-%d')
             if end_date:
-                end_dt = datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1)
-                where_clauses.append("m.fecha_medicion < %s")
-                params.append(end_dt)
+                hasta = datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1)
         except ValueError:
             return False, (jsonify({'success': False, 'error': 'Formato de fecha inválido'}), 400)
 
-    agg_func = {
-        'mean': 'AVG',
-        'max': 'MAX',
-        'min': 'MIN'
-    }.get(agg, 'AVG')
+    # Agregados por estación desde rollups (día/hora) y mediciones crudas solo en los bordes
+    value_expr = {
+        'mean': 'SUM(a.suma) / SUM(a.n)',
+        'max': 'MAX(a.maximo)',
+        'min': 'MIN(a.minimo)'
+    }.get(agg, 'SUM(a.suma) / SUM(a.n)')
 
+    agregados_sql, params = consulta_agregada(value_field, desde, hasta, excluir=EXCLUDED_STATIONS)
     sql = f"""
-        SELECT e.latitud, e.longitud, {agg_func}(m.{value_field}) as value
-        FROM mediciones m
-        JOIN estaciones e ON e.codigo = m.estacion_codigo
-        WHERE {' AND '.join(where_clauses)}
+        SELECT e.latitud, e.longitud, {value_expr} as value
+        FROM ({agregados_sql}) a
+        JOIN estaciones e ON e.codigo = a.estacion_codigo
         GROUP BY e.latitud, e.longitud
-        HAVING COUNT(*) > 0
+        HAVING SUM(a.n) > 0
     """
     try:
-        with get_db_cursor() as cursor:
+        with get_db_cursor(statement='heatmap_puntos') as cursor:
             cursor.execute(sql, params)
             rows = cursor.fetchall()
         points = [
-            {
-                'latitude': float(r['latitud']),
-                'longitude': float(r['longitud']),
-                'value': float(r['value']) if r['value'] is not None else None
-            }
+            {'latitude': r['latitud'], 'longitude': r['longitud'], 'value': r['value']}
             for r in rows if r['value'] is not None
         ]
         return True, points
@@ -96,6 +138,7 @@ def _fetch_heatmap_points(parameter: str, agg: str, hours_back: str | None,
 
 
 @heatmap_api.route('/heatmap', methods=['GET'])
+@conditional
 def get_heatmap_points():
     """Endpoint: devuelve puntos crudos (lat, lon, valor) para un parámetro.
 
@@ -179,75 +222,180 @@ def _poly_fit(points, grid_size: int, degree: int):
     return grid_lat, grid_lon, grid_vals
 
 
+def _window_key(hours_back, start_date, end_date):
+    """Ventana temporal normalizada para claves de caché."""
+    if hours_back:
+        try:
+            return ('hours_back', int(hours_back))
+        except ValueError:
+            return ('hours_back', hours_back)
+    return ('range', start_date or None, end_date or None)
+
+
 @heatmap_api.route('/heatmap/interpolate', methods=['GET'])
+@conditional
 def get_heatmap_interpolation():
     """Endpoint: grilla interpolada + submuestreo.
 
-    Query: parameter, agg, ventana temporal, grid_size, method (grid|poly2|poly3)
-    - grid (default): SciPy griddata linear → nearest fallback.
+    Query: parameter, agg, ventana temporal, grid_size, method (grid|poly2|poly3|idw|kriging), format
+    - grid (default): interpolación lineal sobre Delaunay (nearest como fallback)
+      con pesos precalculados por conjunto de estaciones (``api.interpolation``).
     - poly2: Ajuste polinomial de segundo grado (regresión mínima cuadrados).
     - poly3: Ajuste polinomial cúbico (más flexible, riesgo de sobreajuste con pocos puntos).
+    - idw: inverso de la distancia con los vecinos más cercanos (cubre toda la grilla).
+    - kriging: kriging ordinario local; el variograma se ajusta una vez por
+      (parameter, agg, ventana, hora UTC).
+
+    format=points (default) devuelve ``interpolated_points``; ``columnar`` y
+    ``f32`` devuelven ``grid`` (ver ``_grid_columnar``), mucho más compacto.
+
+    Los resultados se memorizan por (parameter, agg, ventana, grid_size, method, format)
+    hasta la siguiente ingesta del ETL (ver ``api.cache``).
     """
     parameter = request.args.get('parameter', 'temperature')
     agg = request.args.get('agg', 'mean')
+    if agg not in ('mean', 'max', 'min'):
+        return jsonify({'success': False, 'error': 'Agregación inválida'}), 400
     method = request.args.get('method', 'grid').lower()
+    if method not in HEATMAP_METHODS:
+        return jsonify({'success': False, 'error': 'Método inválido'}), 400
+    hours_back = request.args.get('hours_back')
+    start_date = request.args.get('start_date')
+    end_date = request.args.get('end_date')
+    try:
+        grid_size = _grid_size_arg()
+    except ValueError:
+        return jsonify({'success': False, 'error': 'grid_size inválido'}), 400
+    fmt = request.args.get('format', 'points').lower()
+    if fmt not in RESPONSE_FORMATS:
+        return jsonify({'success': False, 'error': 'Formato inválido'}), 400
+
+    key = (parameter, agg, _window_key(hours_back, start_date, end_date), grid_size, method, fmt)
+
+    def compute():
+        result = _interpolate(parameter, agg, method, hours_back, start_date, end_date, grid_size, fmt)
+        return result, isinstance(result, dict)
+
+    result = _interpolation_cache.get_or_compute(key, compute)
+    if isinstance(result, dict):
+        return jsonify(result)
+    return result
 
-    # Obtener puntos base
-    ok, result = _fetch_heatmap_points(
-        parameter,
-        agg,
-        request.args.get('hours_back'),
-        request.args.get('start_date'),
-        request.args.get('end_date')
-    )
-    if not ok:
-        return result
-    points = result
-    if len(points) < 4:
-        return jsonify({'success': False, 'warning': 'Datos insuficientes para interpolación', 'points': points})
 
-    grid_size = int(request.args.get('grid_size', 40))
+@heatmap_api.route('/heatmap/cache/stats', methods=['GET'])
+def get_heatmap_cache_stats():
+    """Estadísticas de la caché de interpolaciones (hits, misses, tiempo de cálculo por clave)
+    y de la caché de pesos de triangulación."""
+    return jsonify({
+        'success': True,
+        'interpolation': _interpolation_cache.stats(),
+        'tile_fields': _tile_field_cache.stats(),
+        'weights': weights_cache_stats() if _SCIPY_AVAILABLE else None
+    })
+
+
+def _subsample(grid_lat, grid_lon, grid_vals, grid_size):
+    """Submuestrear la grilla a ~MAX_CELLS celdas tomando cada ``step`` filas/columnas.
+
+    El paso se aplica en ambos ejes, así que se calcula sobre el lado de la
+    grilla y no sobre su área: con ``step = ceil(grid_size / isqrt(MAX_CELLS))``
+    quedan a lo sumo ``isqrt(MAX_CELLS)`` celdas por lado, es decir
+    ``ceil(grid_size / step) ** 2 <= MAX_CELLS``.
+    """
+    step = _subsample_step(grid_size)
+    return grid_lat[::step, ::step], grid_lon[::step, ::step], grid_vals[::step, ::step]
+
+
+def _subsample_step(grid_size):
+    return max(1, math.ceil(grid_size / math.isqrt(MAX_CELLS)))
+
+
+def _grid_points(grid_lat, grid_lon, grid_vals):
+    """Lista de puntos ``{latitude, longitude, value}`` de las celdas con valor."""
+    mask = ~np.isnan(grid_vals)
+    return [
+        {'latitude': lat, 'longitude': lon, 'value': v}
+        for lat, lon, v in zip(grid_lat[mask].tolist(), grid_lon[mask].tolist(), grid_vals[mask].tolist())
+    ]
+
+
+def _grid_columnar(grid_lat, grid_lon, grid_vals, binary=False):
+    """Grilla regular como origen, paso, forma y valores en orden fila-mayor.
+
+    La celda ``(i, j)`` está en ``origin + (i * step[0], j * step[1])`` y su
+    valor es ``values[i * shape[1] + j]``; las celdas sin dato son ``null``
+    (o NaN en el buffer binario). Con ``binary`` los valores van como
+    float32 little-endian codificado en base64.
+    """
+    rows, cols = grid_vals.shape
+    lat_axis = grid_lat[:, 0]
+    lon_axis = grid_lon[0, :]
+    grid = {
+        'origin': [float(lat_axis[0]), float(lon_axis[0])],
+        'step': [
+            float(lat_axis[1] - lat_axis[0]) if rows > 1 else 0.0,
+            float(lon_axis[1] - lon_axis[0]) if cols > 1 else 0.0
+        ],
+        'shape': [rows, cols]
+    }
+    if binary:
+        grid['encoding'] = 'float32-le-base64'
+    grid['values'] = _encode_values(grid_vals, binary)
+    return grid
+
 
+def _encode_values(grid_vals, binary=False):
+    """Valores de la grilla en orden fila-mayor: lista con ``null`` o float32 base64."""
+    flat = grid_vals.ravel()
+    if binary:
+        return base64.b64encode(flat.astype('<f4').tobytes()).decode('ascii')
+    values = flat.astype(object)
+    values[np.isnan(flat)] = None
+    return values.tolist()
+
+
+def _grid_for(points, parameter, agg, method, hours_back, start_date, end_date, grid_size):
+    """(ok, result): ``result`` es ``(grid_lat, grid_lon, grid_vals)`` o el cuerpo/respuesta de error."""
     # Seleccionar método
     if method.startswith('poly'):
         degree = 2 if method == 'poly2' else 3 if method == 'poly3' else 2
-        poly_output = _poly_fit(points, grid_size, degree)
+        with metrics.interpolation_duration.time(f'poly{degree}', grid_size):
+            poly_output = _poly_fit(points, grid_size, degree)
         if poly_output is None:
-            return jsonify({'success': False, 'warning': f'Polinomio grado {degree} no estable con puntos disponibles', 'points': points})
+            return False, {'success': False, 'warning': f'Polinomio grado {degree} no estable con puntos disponibles', 'points': points}
         grid_lat, grid_lon, grid_vals = poly_output
     else:
         # Requiere SciPy
         if not _SCIPY_AVAILABLE:
-            return jsonify({'success': False, 'error': 'SciPy no disponible para método grid'}), 501
-        lats = np.array([p['latitude'] for p in points])
-        lons = np.array([p['longitude'] for p in points])
-        vals = np.array([p['value'] for p in points])
-        lat_lin = np.linspace(lats.min(), lats.max(), grid_size)
-        lon_lin = np.linspace(lons.min(), lons.max(), grid_size)
-        grid_lon, grid_lat = np.meshgrid(lon_lin, lat_lin)
-        grid_vals = griddata((lats, lons), vals, (grid_lat, grid_lon), method='linear')
-        if np.isnan(grid_vals).all():
-            grid_vals = griddata((lats, lons), vals, (grid_lat, grid_lon), method='nearest')
-
-    max_cells = 2000
-    step = max(1, int((grid_size * grid_size) / max_cells))
-    interpolated = []
-    for i in range(0, grid_size, step):
-        for j in range(0, grid_size, step):
-            v = grid_vals[i, j]
-            if np.isnan(v):
-                continue
-            interpolated.append({
-                'latitude': float(grid_lat[i, j]),
-                'longitude': float(grid_lon[i, j]),
-                'value': float(v)
-            })
+            return False, (jsonify({'success': False, 'error': f'SciPy no disponible para método {method}'}), 501)
+        # Pesos cacheados por conjunto de estaciones, grid_size y método
+        engine_method = method if method in ('idw', 'kriging') else 'linear'
+        variogram_key = None
+        if engine_method == 'kriging':
+            variogram_key = (parameter, agg, _window_key(hours_back, start_date, end_date),
+                             datetime.utcnow().strftime('%Y-%m-%dT%H'))
+        etiqueta = 'grid' if engine_method == 'linear' else engine_method
+        with metrics.interpolation_duration.time(etiqueta, grid_size):
+            grid_lat, grid_lon, grid_vals = interpolate_grid(
+                [p['latitude'] for p in points],
+                [p['longitude'] for p in points],
+                [p['value'] for p in points],
+                grid_size,
+                method=engine_method,
+                variogram_key=variogram_key
+            )
+    return True, (grid_lat, grid_lon, grid_vals)
 
-    # Estadísticos para mejorar leyenda
-    values = [p['value'] for p in points if isinstance(p['value'], (int, float))]
+
+def _point_stats(points):
+    """Mínimo, cuantiles (q25, q50, q75, q90) y máximo de los valores por estación."""
+    return _value_stats([p['value'] for p in points if isinstance(p['value'], (int, float))])
+
+
+def _value_stats(values):
     stats = None
-    if values:
-        arr = np.array(values)
+    if len(values):
+        arr = np.asarray(values, dtype=float)
         stats = {
             'min': float(arr.min()),
             'q25': float(np.quantile(arr, 0.25)),
@@ -256,15 +404,355 @@ def get_heatmap_interpolation():
             'q90': float(np.quantile(arr, 0.90)),
             'max': float(arr.max())
         }
+    return stats
 
-    return jsonify({
+
+def _interpolate(parameter, agg, method, hours_back, start_date, end_date, grid_size, fmt='points'):
+    """Calcula la respuesta de /heatmap/interpolate.
+
+    Retorna el dict del cuerpo JSON (cacheable) o una respuesta Flask de
+    error ``(response, status)`` que no se cachea.
+    """
+    # Obtener puntos base
+    ok, result = _fetch_heatmap_points(parameter, agg, hours_back, start_date, end_date)
+    if not ok:
+        return result
+    points = result
+    if len(points) < 4:
+        return {'success': False, 'warning': 'Datos insuficientes para interpolación', 'points': points}
+
+    ok, result = _grid_for(points, parameter, agg, method, hours_back, start_date, end_date, grid_size)
+    if not ok:
+        return result
+    grid_lat, grid_lon, grid_vals = result
+
+    sub_lat, sub_lon, sub_vals = _subsample(grid_lat, grid_lon, grid_vals, grid_size)
+    if fmt == 'points':
+        payload = {'interpolated_points': _grid_points(sub_lat, sub_lon, sub_vals)}
+    else:
+        payload = {'grid': _grid_columnar(sub_lat, sub_lon, sub_vals, binary=(fmt == 'f32'))}
+    count = int(np.count_nonzero(~np.isnan(sub_vals)))
+
+    # Estadísticos para mejorar leyenda
+    stats = _point_stats(points)
+
+    return {
         'success': True,
         'parameter': parameter,
         'aggregation': agg,
         'points_used': len(points),
         'grid_size': grid_size,
-        'interpolated_points': interpolated,
-        'count': len(interpolated),
+        **payload,
+        'count': count,
+        'format': fmt,
         'interp_method': method,
         'stats': stats
+    }
+
+
+# ---------------------------------------------------------------------------
+# Teselas raster XYZ
+# ---------------------------------------------------------------------------
+def _tile_query(parameter):
+    """Parámetros de la consulta de teselas validados: ``(query, variant)`` o ``(None, error)``.
+
+    ``variant`` nombra el directorio de la consulta en la caché de disco, por
+    lo que solo se construye con valores conocidos.
+    """
+    if parameter not in FIELD_MAP:
+        return None, (jsonify({'success': False, 'error': 'Parámetro inválido'}), 400)
+    agg = request.args.get('agg', 'mean')
+    if agg not in ('mean', 'max', 'min'):
+        agg = 'mean'
+    method = request.args.get('method', 'grid').lower()
+    if method not in HEATMAP_METHODS:
+        method = 'grid'
+    hours_back = request.args.get('hours_back')
+    start_date = request.args.get('start_date')
+    end_date = request.args.get('end_date')
+    try:
+        if hours_back:
+            window = f"h{int(hours_back)}"
+        else:
+            for value in (start_date, end_date):
+                if value:
+                    datetime.strptime(value, '%Y-%m-%d')
+            window = f"{start_date or 'inicio'}_{end_date or 'fin'}"
+    except ValueError:
+        return None, (jsonify({'success': False, 'error': 'Ventana temporal inválida'}), 400)
+    query = {
+        'parameter': parameter, 'agg': agg, 'method': method,
+        'hours_back': hours_back, 'start_date': start_date, 'end_date': end_date,
+    }
+    return query, f"{agg}_{method}_{window}"
+
+
+def _tile_field(query):
+    """``TileField`` cacheado de la consulta, o respuesta Flask de error."""
+    key = (query['parameter'], query['agg'], query['method'],
+           _window_key(query['hours_back'], query['start_date'], query['end_date']))
+
+    def compute():
+        ok, result = _fetch_heatmap_points(query['parameter'], query['agg'], query['hours_back'],
+                                           query['start_date'], query['end_date'])
+        if not ok:
+            return result, False
+        points = result
+        if len(points) < 4:
+            return (jsonify({'success': False, 'warning': 'Datos insuficientes para interpolación'}), 404), False
+        ok, result = _grid_for(points, query['parameter'], query['agg'], query['method'],
+                               query['hours_back'], query['start_date'], query['end_date'],
+                               tiles.TILE_FIELD_SIZE)
+        if not ok:
+            error = result if isinstance(result, tuple) else (jsonify(result), 422)
+            return error, False
+        field = tiles.TileField(*result, stats=_point_stats(points), parameter=query['parameter'])
+        return field, True
+
+    return _tile_field_cache.get_or_compute(key, compute)
+
+
+def _tile_cache_headers(response, version):
+    # Con ?v=<versión vigente> la URL es inmutable hasta la próxima ingesta
+    if request.args.get('v') == version:
+        response.headers['Cache-Control'] = 'public, max-age=86400, immutable'
+    else:
+        response.headers['Cache-Control'] = 'public, max-age=60'
+    return response
+
+
+@heatmap_api.route('/heatmap/tiles/<parameter>/<int:z>/<int:x>/<int:y>.png', methods=['GET'])
+@conditional
+def get_heatmap_tile(parameter, z, x, y):
+    """Endpoint: tesela PNG 256×256 del heatmap interpolado (esquema XYZ / Web Mercator).
+
+    Query: agg, method, ventana temporal (como /heatmap/interpolate) y
+    opcionalmente ``v`` (versión de ingesta devuelta por ``/scale``).
+    Las teselas se guardan en disco por versión de ingesta y se sirven desde
+    ahí hasta el siguiente ciclo del ETL.
+    """
+    if z > tiles.TILE_MAX_ZOOM or x >= 2 ** z or y >= 2 ** z:
+        return jsonify({'success': False, 'error': 'Tesela fuera de rango'}), 404
+    query, variant = _tile_query(parameter)
+    if query is None:
+        return variant
+
+    version = get_ingest_version()
+    path = tiles.tile_path(version, parameter, variant, z, x, y)
+    if os.path.exists(path):
+        return _tile_cache_headers(send_file(path, mimetype='image/png'), version)
+
+    field = _tile_field(query)
+    if not isinstance(field, tiles.TileField):
+        return field
+    png = tiles.render_tile(field, z, x, y)
+    if png is None:
+        png = tiles.empty_tile()
+    else:
+        try:
+            tiles.save_tile(path, version, png)
+        except OSError:
+            logging.exception("No se pudo guardar la tesela %s", path)
+    return _tile_cache_headers(Response(png, mimetype='image/png'), version)
+
+
+@heatmap_api.route('/heatmap/tiles/<parameter>/scale', methods=['GET'])
+@conditional
+def get_heatmap_tile_scale(parameter):
+    """Endpoint: escala de color de las teselas (cuantiles y paleta) y versión de ingesta.
+
+    El frontend la usa para la leyenda y para armar la URL de teselas con ``v``.
+    """
+    query, variant = _tile_query(parameter)
+    if query is None:
+        return variant
+    version = get_ingest_version()
+    field = _tile_field(query)
+    if not isinstance(field, tiles.TileField):
+        return field
+    lat_min, lon_min, lat_max, lon_max = field.bounds
+    return jsonify({
+        'success': True,
+        'parameter': parameter,
+        'aggregation': query['agg'],
+        'interp_method': query['method'],
+        'version': version,
+        'stats': field.stats,
+        'palette': tiles.PALETTES.get(parameter),
+        'bounds': [[lat_min, lon_min], [lat_max, lon_max]],
+        'tile_size': tiles.TILE_SIZE,
+        'max_zoom': tiles.TILE_MAX_ZOOM
     })
+
+
+# ---------------------------------------------------------------------------
+# Series temporales (animaciones)
+# ---------------------------------------------------------------------------
+def _fetch_timeseries_values(value_field, agg, desde, step_seconds, frames):
+    """Valores por ubicación de estación y cuadro en una sola consulta agrupada.
+
+    Retorna ``(lats, lons, values)`` con ``values`` de forma ``(estaciones, frames)``
+    y NaN donde una estación no tiene datos en el cuadro. Con pasos de horas
+    enteras los cuadros salen de los rollups (``consulta_cuadros``).
+    """
+    if step_seconds % 3600 == 0:
+        value_expr = {
+            'max': 'MAX(c.maximo)',
+            'min': 'MIN(c.minimo)'
+        }.get(agg, 'SUM(c.suma) / SUM(c.n)')
+        cuadros_sql, params = consulta_cuadros(value_field, desde, timedelta(seconds=step_seconds), frames,
+                                               excluir=EXCLUDED_STATIONS)
+        sql = f"""
+            SELECT e.latitud, e.longitud, c.cuadro AS frame, {value_expr} AS value
+            FROM ({cuadros_sql}) c
+            JOIN estaciones e ON e.codigo = c.estacion_codigo
+            GROUP BY e.latitud, e.longitud, c.cuadro
+            HAVING SUM(c.n) > 0
+        """
+    else:
+        sql, params = _timeseries_raw_sql(value_field, agg, desde, step_seconds, frames)
+    with get_db_cursor(statement='heatmap_serie') as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+
+    coords = sorted({(r['latitud'], r['longitud']) for r in rows})
+    index = {c: i for i, c in enumerate(coords)}
+    values = np.full((len(coords), frames), np.nan)
+    for r in rows:
+        values[index[(r['latitud'], r['longitud'])], r['frame']] = r['value']
+    lats = np.array([c[0] for c in coords])
+    lons = np.array([c[1] for c in coords])
+    return lats, lons, values
+
+
+def _timeseries_raw_sql(value_field, agg, desde, step_seconds, frames):
+    """SQL + params de los cuadros leídos de ``mediciones`` (pasos que no son horas enteras)."""
+    agg_expr = {'max': 'MAX', 'min': 'MIN'}.get(agg, 'AVG')
+    hasta = desde + timedelta(seconds=step_seconds * frames)
+    sql = f"""
+        SELECT e.latitud, e.longitud,
+               FLOOR(EXTRACT(EPOCH FROM (m.fecha_medicion - %s::timestamp)) / %s)::int AS frame,
+               {agg_expr}(m.{value_field}::float8) AS value
+        FROM mediciones m
+        JOIN estaciones e ON e.codigo = m.estacion_codigo
+        WHERE m.fecha_medicion >= %s AND m.fecha_medicion < %s
+          AND m.{value_field} IS NOT NULL
+          AND m.estacion_codigo <> ALL(%s)
+        GROUP BY e.latitud, e.longitud, frame
+    """
+    return sql, [desde, step_seconds, desde, hasta, list(EXCLUDED_STATIONS)]
+
+
+@heatmap_api.route('/heatmap/timeseries', methods=['GET'])
+@conditional
+def get_heatmap_timeseries():
+    """Endpoint: cuadros interpolados de una ventana para animaciones (NDJSON en streaming).
+
+    Query: parameter, agg, hours_back (default 24) | start_date, end_date,
+    step_minutes (default 10), grid_size (default 40), method (grid|idw),
+    format (f32 default | columnar).
+
+    Una consulta agrupa los valores por estación y cuadro (de los rollups si
+    ``step_minutes`` es múltiplo de 60); los cuadros se interpolan con los
+    mismos pesos (``interpolate_series``) en lotes de
+    ``TIMESERIES_CHUNK_FRAMES`` que se emiten apenas están listos. La
+    primera línea es ``{"type": "meta", ...}`` con la geometría de la grilla,
+    los instantes y la escala de color común; luego una línea
+    ``{"type": "frame", ...}`` por cuadro con sus valores.
+    """
+    parameter = request.args.get('parameter', 'temperature')
+    agg = request.args.get('agg', 'mean')
+    method = request.args.get('method', 'grid').lower()
+    fmt = request.args.get('format', 'f32').lower()
+    if parameter not in FIELD_MAP:
+        return jsonify({'success': False, 'error': 'Parámetro inválido'}), 400
+    if method not in ('grid', 'idw'):
+        return jsonify({'success': False, 'error': 'Método inválido para series (grid|idw)'}), 400
+    if fmt not in ('f32', 'columnar'):
+        return jsonify({'success': False, 'error': 'Formato inválido'}), 400
+    if not _SCIPY_AVAILABLE:
+        return jsonify({'success': False, 'error': f'SciPy no disponible para método {method}'}), 501
+
+    try:
+        step_minutes = int(request.args.get('step_minutes', 10))
+        grid_size = _grid_size_arg()
+        start_date = request.args.get('start_date')
+        end_date = request.args.get('end_date')
+        if start_date:
+            desde = datetime.strptime(start_date, '%Y-%m-%d')
+            hasta = (datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1)
+                     if end_date else datetime.utcnow())
+        else:
+            hasta = datetime.utcnow()
+            desde = hasta - timedelta(hours=int(request.args.get('hours_back', 24)))
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Parámetros inválidos'}), 400
+    if step_minutes <= 0 or desde >= hasta:
+        return jsonify({'success': False, 'error': 'Parámetros inválidos'}), 400
+
+    # Alinear el inicio al paso para que los cuadros caigan en horas "redondas"
+    step_seconds = step_minutes * 60
+    epoch = datetime(1970, 1, 1)
+    desde = epoch + timedelta(seconds=(desde - epoch).total_seconds() // step_seconds * step_seconds)
+    frames = math.ceil((hasta - desde).total_seconds() / step_seconds)
+    if frames > TIMESERIES_MAX_FRAMES:
+        return jsonify({'success': False, 'error': f'Demasiados cuadros ({frames} > {TIMESERIES_MAX_FRAMES})'}), 400
+
+    try:
+        lats, lons, values = _fetch_timeseries_values(FIELD_MAP[parameter], agg, desde, step_seconds, frames)
+    except Exception as e:  # pragma: no cover - runtime protection
+        logging.exception("Error obteniendo serie de heatmap")
+        return jsonify({'success': False, 'error': str(e)}), 500
+    if len(lats) < 4:
+        return jsonify({'success': False, 'warning': 'Datos insuficientes para interpolación'})
+
+    engine_method = 'idw' if method == 'idw' else 'linear'
+    step = _subsample_step(grid_size)
+
+    def interpolar(inicio):
+        """Cuadros ``[inicio, inicio + TIMESERIES_CHUNK_FRAMES)`` ya submuestreados."""
+        with metrics.interpolation_duration.time(f'{method}_serie', grid_size):
+            grid_lat, grid_lon, grids = interpolate_series(
+                lats, lons, values[:, inicio:inicio + TIMESERIES_CHUNK_FRAMES], grid_size, engine_method)
+        return grid_lat[::step, ::step], grid_lon[::step, ::step], grids[:, ::step, ::step]
+
+    # El primer lote se calcula antes de responder: un error de triangulación
+    # sigue siendo un 500 y la geometría de la grilla va en la línea meta
+    sub_lat, sub_lon, primeros = interpolar(0)
+    stats = _value_stats(values[~np.isnan(values)])
+    geometry = _grid_columnar(sub_lat, sub_lon, np.zeros(sub_lat.shape), binary=False)
+    del geometry['values']
+
+    def generate():
+        meta = {
+            'type': 'meta',
+            'success': True,
+            'parameter': parameter,
+            'aggregation': agg,
+            'interp_method': method,
+            'format': fmt,
+            'step_minutes': step_minutes,
+            'frames': frames,
+            'times': [(desde + timedelta(seconds=step_seconds * i)).isoformat() for i in range(frames)],
+            'stations': len(lats),
+            'grid': geometry,
+            'stats': stats
+        }
+        if fmt == 'f32':
+            meta['grid']['encoding'] = 'float32-le-base64'
+        yield dumps(meta) + '\n'
+        grids = primeros
+        for inicio in range(0, frames, TIMESERIES_CHUNK_FRAMES):
+            if inicio:
+                grids = interpolar(inicio)[2]
+            for j, grid in enumerate(grids):
+                i = inicio + j
+                yield dumps({
+                    'type': 'frame',
+                    'index': i,
+                    'time': meta['times'][i],
+                    'stations': int(np.count_nonzero(~np.isnan(values[:, i]))),
+                    'values': _encode_values(grid, binary=(fmt == 'f32'))
+                }) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
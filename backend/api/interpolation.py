@@ -0,0 +1,390 @@
+"""Motor de interpolación espacial con pesos precalculados.
+
+Las coordenadas de las estaciones casi nunca cambian, así que la
+triangulación de Delaunay y los pesos baricéntricos de cada celda de la
+grilla se calculan una sola vez por conjunto de estaciones y ``grid_size``
+y se guardan como una matriz dispersa ``celdas × estaciones``. Interpolar
+queda reducido a un producto matriz-vector (o matriz-matriz para evaluar
+varios parámetros a la vez con las mismas estaciones).
+
+Métodos:
+
+- ``linear``: igual que ``scipy.interpolate.griddata`` con ``method='linear'``
+  (NaN fuera del casco convexo) y, si la triangulación no es posible o no
+  cubre ninguna celda, ``method='nearest'``.
+- ``idw``: inverso de la distancia a las ``IDW_NEIGHBORS`` estaciones más
+  cercanas (``cKDTree``); cubre toda la grilla.
+- ``kriging``: kriging ordinario local con las ``KRIGING_NEIGHBORS`` más
+  cercanas y un variograma exponencial ajustado a los datos. El ajuste se
+  cachea por la clave que indique el llamador (parámetro + bucket temporal)
+  y los pesos por variograma, así que solo se resuelven los sistemas de
+  kriging cuando cambia la estructura espacial.
+
+Las distancias de ``idw`` y ``kriging`` se miden en km sobre una proyección
+plana local (equirectangular), suficiente para el área metropolitana.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from scipy import sparse
+from scipy.optimize import curve_fit
+from scipy.spatial import Delaunay, cKDTree
+from scipy.spatial import QhullError
+from scipy.spatial.distance import pdist
+
+# Máximo de juegos de pesos (estaciones, grid_size, método) en memoria
+WEIGHTS_CACHE_SIZE = int(os.getenv('HEATMAP_WEIGHTS_CACHE_SIZE', '32'))
+# Máximo de variogramas ajustados en memoria
+VARIOGRAM_CACHE_SIZE = int(os.getenv('HEATMAP_VARIOGRAM_CACHE_SIZE', '64'))
+IDW_NEIGHBORS = int(os.getenv('HEATMAP_IDW_NEIGHBORS', '8'))
+IDW_POWER = float(os.getenv('HEATMAP_IDW_POWER', '2'))
+KRIGING_NEIGHBORS = int(os.getenv('HEATMAP_KRIGING_NEIGHBORS', '12'))
+# Celdas por lote al resolver los sistemas de kriging (acota la memoria)
+KRIGING_CHUNK = 20000
+VARIOGRAM_BINS = 12
+
+METHODS = ('linear', 'idw', 'kriging')
+
+# km por grado de latitud
+_KM_PER_DEG = 111.32
+
+
+def regular_grid(lats, lons, grid_size):
+    """Grilla ``grid_size × grid_size`` sobre el rectángulo que cubre las estaciones."""
+    lat_lin = np.linspace(lats.min(), lats.max(), grid_size)
+    lon_lin = np.linspace(lons.min(), lons.max(), grid_size)
+    grid_lon, grid_lat = np.meshgrid(lon_lin, lat_lin)
+    return grid_lat, grid_lon
+
+
+def _linear_weights(stations, targets):
+    """Matriz dispersa de pesos baricéntricos y máscara de celdas cubiertas.
+
+    Retorna ``None`` si las estaciones no admiten triangulación (p.ej.
+    colineales) o ninguna celda cae dentro del casco convexo.
+    """
+    try:
+        tri = Delaunay(stations)
+    except (QhullError, ValueError):
+        return None
+    simplex = tri.find_simplex(targets)
+    inside = simplex >= 0
+    if not inside.any():
+        return None
+
+    rows = np.nonzero(inside)[0]
+    s = simplex[inside]
+    transform = tri.transform[s]
+    # Coordenadas baricéntricas: b = T · (x - r), tercera = 1 - b0 - b1
+    b = np.einsum('ijk,ik->ij', transform[:, :2, :], targets[inside] - transform[:, 2, :])
+    bary = np.column_stack([b, 1.0 - b.sum(axis=1)])
+    weights = sparse.csr_matrix(
+        (bary.ravel(), (np.repeat(rows, 3), tri.simplices[s].ravel())),
+        shape=(len(targets), len(stations))
+    )
+    return weights, inside
+
+
+def _nearest_weights(stations, targets):
+    """Matriz dispersa que asigna a cada celda la estación más cercana."""
+    _, idx = cKDTree(stations).query(targets)
+    n = len(targets)
+    weights = sparse.csr_matrix(
+        (np.ones(n), (np.arange(n), idx)),
+        shape=(n, len(stations))
+    )
+    return weights, np.ones(n, dtype=bool)
+
+
+def _planar_km(lats, lons, lat0):
+    """Coordenadas ``(x, y)`` en km de una proyección equirectangular centrada en ``lat0``."""
+    x = lons * _KM_PER_DEG * np.cos(np.radians(lat0))
+    y = lats * _KM_PER_DEG
+    return np.column_stack([x, y])
+
+
+def _neighbors(stations_km, targets_km, k):
+    """Distancias e índices de las ``k`` estaciones más cercanas a cada celda."""
+    k = min(k, len(stations_km))
+    dist, idx = cKDTree(stations_km).query(targets_km, k=k)
+    if k == 1:
+        dist, idx = dist[:, None], idx[:, None]
+    return dist, idx
+
+
+def _rows_to_sparse(w, idx, n_stations):
+    n_targets, k = idx.shape
+    return sparse.csr_matrix(
+        (w.ravel(), (np.repeat(np.arange(n_targets), k), idx.ravel())),
+        shape=(n_targets, n_stations)
+    )
+
+
+def _idw_weights(stations_km, targets_km, k=IDW_NEIGHBORS, power=IDW_POWER):
+    """Pesos IDW normalizados; una celda sobre una estación toma su valor exacto."""
+    dist, idx = _neighbors(stations_km, targets_km, k)
+    exact = dist[:, 0] < 1e-9
+    with np.errstate(divide='ignore'):
+        w = 1.0 / dist ** power
+    w[exact] = 0.0
+    w[exact, 0] = 1.0
+    w /= w.sum(axis=1, keepdims=True)
+    return _rows_to_sparse(w, idx, len(stations_km)), np.ones(len(targets_km), dtype=bool)
+
+
+def _exponential(h, nugget, sill, rango):
+    """Variograma exponencial (``rango`` práctico: ~95% de la meseta)."""
+    return nugget + sill * (1.0 - np.exp(-3.0 * h / rango))
+
+
+def fit_variogram(stations_km, vals, bins=VARIOGRAM_BINS):
+    """Ajustar ``(nugget, sill, rango_km)`` al semivariograma empírico.
+
+    Se agrupan los pares de estaciones por distancia hasta la mitad de la
+    distancia máxima; si el ajuste no converge se usa un modelo sin nugget
+    con meseta igual a la varianza y rango de un tercio de esa distancia.
+    """
+    d = pdist(stations_km)
+    g = 0.5 * pdist(vals[:, None], 'sqeuclidean')
+    max_d = d.max() / 2 if len(d) else 1.0
+    var = float(vals.var()) or 1.0
+    default = (0.0, var, max_d / 3 or 1.0)
+    mask = d <= max_d
+    if mask.sum() < 3:
+        return default
+
+    edges = np.linspace(0.0, max_d, bins + 1)
+    which = np.clip(np.digitize(d[mask], edges) - 1, 0, bins - 1)
+    count = np.bincount(which, minlength=bins)
+    used = count > 0
+    h = np.bincount(which, d[mask], minlength=bins)[used] / count[used]
+    gamma = np.bincount(which, g[mask], minlength=bins)[used] / count[used]
+    if len(h) < 3:
+        return default
+    try:
+        popt, _ = curve_fit(
+            _exponential, h, gamma, p0=default,
+            bounds=([0.0, 1e-12, 1e-3], [np.inf, np.inf, np.inf]),
+            sigma=1.0 / np.sqrt(count[used]), maxfev=2000
+        )
+    except (RuntimeError, ValueError):
+        return default
+    return tuple(float(v) for v in popt)
+
+
+def _kriging_weights(stations_km, targets_km, variogram, k=KRIGING_NEIGHBORS):
+    """Pesos de kriging ordinario local con las ``k`` estaciones más cercanas.
+
+    Para cada celda: ``[Γ 1; 1ᵀ 0] [w; μ] = [γ₀; 1]``. La matriz de la
+    izquierda solo depende del vecindario, y las celdas contiguas comparten
+    vecindario, así que se invierte una vez por vecindario distinto y cada
+    celda se resuelve con un producto matriz-vector (en lotes).
+    """
+    dist, idx = _neighbors(stations_km, targets_km, k)
+    n_targets, k = idx.shape
+    nugget, sill, rango = variogram
+
+    def gamma(h):
+        return np.where(h > 0, _exponential(h, nugget, sill, rango), 0.0)
+
+    # Vecindarios como conjuntos: ordenar índices (y distancias) por fila
+    order = np.argsort(idx, axis=1)
+    idx = np.take_along_axis(idx, order, axis=1)
+    dist = np.take_along_axis(dist, order, axis=1)
+    sets, which = np.unique(idx, axis=0, return_inverse=True)
+    which = which.ravel()
+
+    pts = stations_km[sets]
+    a = np.ones((len(sets), k + 1, k + 1))
+    a[:, :k, :k] = gamma(np.linalg.norm(pts[:, :, None, :] - pts[:, None, :, :], axis=-1))
+    a[:, k, k] = 0.0
+    try:
+        a_inv = np.linalg.inv(a)
+    except np.linalg.LinAlgError:
+        # Algún vecindario singular (variograma degenerado)
+        a_inv = np.linalg.pinv(a)
+
+    w = np.empty((n_targets, k))
+    for start in range(0, n_targets, KRIGING_CHUNK):
+        sl = slice(start, start + KRIGING_CHUNK)
+        b = np.ones((len(which[sl]), k + 1))
+        b[:, :k] = gamma(dist[sl])
+        w[sl] = np.einsum('tij,tj->ti', a_inv[which[sl], :k, :], b)
+    return _rows_to_sparse(w, idx, len(stations_km)), np.ones(n_targets, dtype=bool)
+
+
+class GridInterpolator:
+    """Pesos de interpolación de un conjunto de estaciones sobre su grilla.
+
+    ``lats``/``lons`` deben venir en el orden canónico de ``station_order``;
+    los valores pasados a ``__call__`` siguen ese mismo orden. ``variogram``
+    solo se usa con ``method='kriging'``.
+    """
+
+    def __init__(self, lats, lons, grid_size, method='linear', variogram=None):
+        if method not in METHODS:
+            raise ValueError(f"Método de interpolación desconocido: {method}")
+        self.grid_size = grid_size
+        self.grid_lat, self.grid_lon = regular_grid(lats, lons, grid_size)
+        if method == 'linear':
+            stations = np.column_stack([lats, lons])
+            targets = np.column_stack([self.grid_lat.ravel(), self.grid_lon.ravel()])
+            linear = _linear_weights(stations, targets)
+            self.method = 'linear' if linear is not None else 'nearest'
+            self.weights, self.inside = linear or _nearest_weights(stations, targets)
+            return
+
+        lat0 = float(lats.mean())
+        stations = _planar_km(lats, lons, lat0)
+        targets = _planar_km(self.grid_lat.ravel(), self.grid_lon.ravel(), lat0)
+        self.method = method
+        if method == 'idw':
+            self.weights, self.inside = _idw_weights(stations, targets)
+        else:
+            self.weights, self.inside = _kriging_weights(stations, targets, variogram)
+
+    def __call__(self, values):
+        """Evaluar la grilla para ``values`` de forma ``(n,)`` o ``(n, k)``.
+
+        Retorna un arreglo ``(grid_size, grid_size)`` o ``(k, grid_size, grid_size)``
+        con NaN en las celdas fuera del casco convexo.
+        """
+        values = np.asarray(values, dtype=float)
+        out = self.weights @ values
+        out[~self.inside] = np.nan
+        if values.ndim == 1:
+            return out.reshape(self.grid_size, self.grid_size)
+        return out.T.reshape(values.shape[1], self.grid_size, self.grid_size)
+
+
+def station_order(lats, lons):
+    """Índices que ordenan las estaciones por (lat, lon).
+
+    El orden de las filas que llegan de la base no es estable; ordenarlas
+    hace que el mismo conjunto de estaciones reutilice los mismos pesos.
+    """
+    return np.lexsort((lons, lats))
+
+
+_cache = OrderedDict()
+_variograms = OrderedDict()
+_lock = threading.Lock()
+_stats = {
+    'hits': 0, 'misses': 0, 'build_ms_total': 0.0, 'build_ms_last': 0.0,
+    'variogram_hits': 0, 'variogram_misses': 0,
+}
+
+
+def get_interpolator(lats, lons, grid_size, method='linear', variogram=None):
+    """``GridInterpolator`` cacheado para estas coordenadas (ya ordenadas), ``grid_size``,
+    método y variograma."""
+    key = (lats.tobytes(), lons.tobytes(), grid_size, method, variogram)
+    with _lock:
+        interpolator = _cache.get(key)
+        if interpolator is not None:
+            _cache.move_to_end(key)
+            _stats['hits'] += 1
+            return interpolator
+
+    start = time.perf_counter()
+    interpolator = GridInterpolator(lats, lons, grid_size, method, variogram)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    with _lock:
+        _stats['misses'] += 1
+        _stats['build_ms_total'] += elapsed_ms
+        _stats['build_ms_last'] = elapsed_ms
+        _cache[key] = interpolator
+        while len(_cache) > WEIGHTS_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return interpolator
+
+
+def get_variogram(key, lats, lons, vals):
+    """Variograma cacheado por ``key`` (p.ej. parámetro + bucket temporal).
+
+    Con ``key=None`` se ajusta siempre sin guardar.
+    """
+    if key is not None:
+        with _lock:
+            variogram = _variograms.get(key)
+            if variogram is not None:
+                _variograms.move_to_end(key)
+                _stats['variogram_hits'] += 1
+                return variogram
+
+    variogram = fit_variogram(_planar_km(lats, lons, float(lats.mean())), vals)
+    if key is not None:
+        with _lock:
+            _stats['variogram_misses'] += 1
+            _variograms[key] = variogram
+            while len(_variograms) > VARIOGRAM_CACHE_SIZE:
+                _variograms.popitem(last=False)
+    return variogram
+
+
+def interpolate_grid(lats, lons, vals, grid_size, method='linear', variogram_key=None):
+    """Interpolar ``vals`` sobre la grilla regular con ``method`` (ver ``METHODS``).
+
+    Retorna ``(grid_lat, grid_lon, grid_vals)``; ``vals`` puede ser ``(n,)``
+    o ``(n, k)`` para evaluar varios parámetros con las mismas estaciones
+    (kriging solo admite uno, porque el variograma depende de los valores).
+    """
+    lats = np.asarray(lats, dtype=float)
+    lons = np.asarray(lons, dtype=float)
+    vals = np.asarray(vals, dtype=float)
+    order = station_order(lats, lons)
+    lats, lons, vals = lats[order], lons[order], vals[order]
+    variogram = None
+    if method == 'kriging':
+        if vals.ndim != 1:
+            raise ValueError("Kriging interpola un parámetro por llamada")
+        variogram = get_variogram(variogram_key, lats, lons, vals)
+    interpolator = get_interpolator(lats, lons, grid_size, method, variogram)
+    return interpolator.grid_lat, interpolator.grid_lon, interpolator(vals)
+
+
+def interpolate_series(lats, lons, values, grid_size, method='linear'):
+    """Interpolar muchos instantes ``values`` de forma ``(n, T)`` con los mismos pesos.
+
+    Las estaciones sin dato en un instante (NaN) se omiten renormalizando
+    los pesos de cada celda: ``(W · v) / (W · presentes)``; una celda cuyas
+    estaciones de apoyo faltan todas queda en NaN. Retorna
+    ``(grid_lat, grid_lon, frames)`` con ``frames`` de forma ``(T, grid_size, grid_size)``.
+    Kriging no aplica: su variograma depende de los valores de cada instante.
+    """
+    if method not in ('linear', 'idw'):
+        raise ValueError(f"Método no soportado para series: {method}")
+    lats = np.asarray(lats, dtype=float)
+    lons = np.asarray(lons, dtype=float)
+    values = np.asarray(values, dtype=float)
+    order = station_order(lats, lons)
+    lats, lons, values = lats[order], lons[order], values[order]
+    interpolator = get_interpolator(lats, lons, grid_size, method)
+
+    present = ~np.isnan(values)
+    num = interpolator.weights @ np.where(present, values, 0.0)
+    den = interpolator.weights @ present.astype(float)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        out = num / den
+    out[np.abs(den) < 1e-12] = np.nan
+    out[~interpolator.inside] = np.nan
+    frames = out.T.reshape(values.shape[1], grid_size, grid_size)
+    return interpolator.grid_lat, interpolator.grid_lon, frames
+
+
+def weights_cache_stats():
+    with _lock:
+        return {
+            'entries': len(_cache),
+            'max_entries': WEIGHTS_CACHE_SIZE,
+            'hits': _stats['hits'],
+            'misses': _stats['misses'],
+            'build_ms_total': round(_stats['build_ms_total'], 3),
+            'build_ms_last': round(_stats['build_ms_last'], 3),
+            'variograms': len(_variograms),
+            'variogram_hits': _stats['variogram_hits'],
+            'variogram_misses': _stats['variogram_misses'],
+        }
@@ -1,7 +1,19 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, jsonify, request, stream_with_context
+import calendar
+import csv
+import io
 import logging
-from datetime import datetime, timedelta
-from database.db_manager import get_db_cursor
+import os
+import time
+from datetime import datetime, timedelta, timezone
+import numpy as np
+from database.db_manager import get_db_cursor, get_pool_stats, execute_prepared
+from database.rollups import RESOLUCIONES, consulta_serie
+from etl.pipeline import get_last_cycle_stats
+from etl.scheduler import get_startup_state
+from api.conditional import conditional
+from api.downsampling import lttb
+from api.serialization import dumps
 
 api = Blueprint('api', __name__)
 
@@ -12,11 +24,12 @@ ZONES = [
 ]
 
 @api.route('/forecasts', methods=['GET'])
+@conditional
 def get_forecasts():
     """Obtiene pronósticos de lluvia para todas las zonas desde la BD"""
     try:
         data = {}
-        with get_db_cursor() as cursor:
+        with get_db_cursor(statement='pronosticos') as cursor:
             cursor.execute("""
                 SELECT zona, date_update, fecha, temperatura_maxima, temperatura_minima,
                        lluvia_madrugada, lluvia_mannana, lluvia_tarde, lluvia_noche
@@ -46,13 +59,14 @@ def get_forecasts():
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @api.route('/forecasts/<zone>', methods=['GET'])
+@conditional
 def get_zone_forecast(zone):
     """Pronóstico de una zona específica desde la BD"""
     if zone not in ZONES:
         return jsonify({'success': False, 'error': 'Zona no válida'}), 400
     try:
-        with get_db_cursor() as cursor:
-            cursor.execute("""
+        with get_db_cursor(statement='pronostico_zona') as cursor:
+            execute_prepared(cursor, 'pronostico_zona', """
                 SELECT date_update, fecha, temperatura_maxima, temperatura_minima,
                        lluvia_madrugada, lluvia_mannana, lluvia_tarde, lluvia_noche
                 FROM pronosticos WHERE zona = %s ORDER BY fecha
@@ -80,10 +94,11 @@ def get_zone_forecast(zone):
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @api.route('/stations', methods=['GET'])
+@conditional
 def get_stations():
     """Lista estaciones activas desde la BD"""
     try:
-        with get_db_cursor() as cursor:
+        with get_db_cursor(statement='estaciones') as cursor:
             cursor.execute("""
                 SELECT codigo, nombre, latitud, longitud, ciudad, comuna, subcuenca, barrio, valor, red, activa
                 FROM estaciones WHERE activa = true
@@ -95,16 +110,15 @@ def get_stations():
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @api.route('/stations/<int:station_id>/data', methods=['GET'])
+@conditional
 def get_station_data(station_id):
     """Última medición de una estación"""
     try:
-        with get_db_cursor() as cursor:
-            cursor.execute("""
-                SELECT e.codigo, e.nombre, e.latitud, e.longitud, e.ciudad, m.*
+        with get_db_cursor(statement='ultima_medicion_estacion') as cursor:
+            execute_prepared(cursor, 'ultima_medicion_estacion', """
+                SELECT e.codigo, e.nombre, e.latitud, e.longitud, e.ciudad, u.*
                 FROM estaciones e
-                JOIN LATERAL (
-                    SELECT * FROM mediciones m2 WHERE m2.estacion_codigo = e.codigo ORDER BY fecha_medicion DESC LIMIT 1
-                ) m ON TRUE
+                JOIN ultimas_mediciones u ON u.estacion_codigo = e.codigo
                 WHERE e.codigo = %s
             """, (station_id,))
             row = cursor.fetchone()
@@ -116,17 +130,16 @@ def get_station_data(station_id):
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @api.route('/stations/all-data', methods=['GET'])
+@conditional
 def get_all_stations_data():
     """Última medición de todas las estaciones activas"""
     try:
-        with get_db_cursor() as cursor:
+        with get_db_cursor(statement='ultimas_mediciones') as cursor:
             cursor.execute("""
                 SELECT e.codigo, e.nombre, e.latitud, e.longitud, e.ciudad,
-                       m.fecha_medicion, m.t, m.h, m.p, m.ws, m.wd, m.p1h, m.p24h
+                       u.fecha_medicion, u.t, u.h, u.p, u.ws, u.wd, u.p1h, u.p24h
                 FROM estaciones e
-                LEFT JOIN LATERAL (
-                    SELECT * FROM mediciones m2 WHERE m2.estacion_codigo = e.codigo ORDER BY fecha_medicion DESC LIMIT 1
-                ) m ON TRUE
+                LEFT JOIN ultimas_mediciones u ON u.estacion_codigo = e.codigo
                 WHERE e.activa = true
             """)
             rows = cursor.fetchall()
@@ -138,66 +151,491 @@ def get_all_stations_data():
                 'info': {
                     'codigo': codigo,
                     'nombre': r['nombre'],
-                    'latitud': float(r['latitud']),
-                    'longitud': float(r['longitud']),
+                    'latitud': r['latitud'],
+                    'longitud': r['longitud'],
                     'ciudad': r['ciudad']
                 },
                 'timestamp': r['fecha_medicion'].isoformat() if r.get('fecha_medicion') else None,
-                't': float(r['t']) if r.get('t') is not None else None,
-                'h': float(r['h']) if r.get('h') is not None else None,
-                'p': float(r['p']) if r.get('p') is not None else None,
-                'ws': float(r['ws']) if r.get('ws') is not None else None,
-                'wd': float(r['wd']) if r.get('wd') is not None else None,
-                'p1h': float(r['p1h']) if r.get('p1h') is not None else None,
-                'p24h': float(r['p24h']) if r.get('p24h') is not None else None
+                't': r['t'],
+                'h': r['h'],
+                'p': r['p'],
+                'ws': r['ws'],
+                'wd': r['wd'],
+                'p1h': r['p1h'],
+                'p24h': r['p24h']
             }
         return jsonify({'success': True, 'data': data, 'count': len(data)})
     except Exception as e:
         logging.exception("Error en /stations/all-data")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+# Columnas del histórico por estación
+HISTORY_COLUMNS = ('fecha_medicion', 't', 'h', 'p', 'ws', 'wd', 'p1h', 'p24h')
+HISTORY_LIMIT = 5000
+# Máximo de estaciones por petición de /stations/history
+HISTORY_MAX_STATIONS = int(os.getenv('HISTORY_MAX_STATIONS', '50'))
+# Puntos por defecto de las series reducidas (resolution=...)
+HISTORY_MAX_POINTS = 1000
+HISTORY_MAX_LIMIT = int(os.getenv('HISTORY_MAX_LIMIT', '50000'))
+# Filas totales por petición de /stations/history (se reparten entre las estaciones)
+HISTORY_MAX_TOTAL_ROWS = int(os.getenv('HISTORY_MAX_TOTAL_ROWS', '200000'))
+# Filas por lote del cursor del servidor en exportaciones
+HISTORY_EXPORT_CHUNK = int(os.getenv('HISTORY_EXPORT_CHUNK', '2000'))
+
+
+def _history_range(args):
+    """``(desde, hasta)`` de la ventana (``hours_back`` o rango); ``None`` = abierta.
+
+    Lanza ``ValueError`` si los parámetros no son válidos.
+    """
+    hours_back = args.get('hours_back')
+    start_date = args.get('start_date')
+    end_date = args.get('end_date')
+    desde = hasta = None
+    if hours_back:
+        desde = datetime.utcnow() - timedelta(hours=int(hours_back))
+    else:
+        if start_date:
+            desde = datetime.strptime(start_date, '%Y-%m-%d')
+        if end_date:
+            hasta = datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1)
+    return desde, hasta
+
+
+def _history_window(args):
+    """Condiciones SQL + params de la ventana temporal (``hours_back`` o rango).
+
+    Lanza ``ValueError`` si los parámetros no son válidos.
+    """
+    where, params = [], []
+    desde, hasta = _history_range(args)
+    if desde is not None:
+        where.append('fecha_medicion >= %s')
+        params.append(desde)
+    if hasta is not None:
+        where.append('fecha_medicion < %s')
+        params.append(hasta)
+    return where, params
+
+
+def _export_value(v):
+    return v.isoformat() if isinstance(v, datetime) else v
+
+
+def _stream_history(station_id, where, params, fmt):
+    """Generador NDJSON/CSV del histórico completo en orden ascendente.
+
+    Usa un cursor del servidor y ``fetchmany``: la memoria es constante sin
+    importar el largo de la ventana.
+    """
+    sql = f"""
+        SELECT {', '.join(HISTORY_COLUMNS)}
+        FROM mediciones
+        WHERE {' AND '.join(where)}
+        ORDER BY fecha_medicion ASC
+    """
+    if fmt == 'csv':
+        yield ','.join(HISTORY_COLUMNS) + '\n'
+    with get_db_cursor(name=f'historial_{station_id}', statement='historial_stream') as cursor:
+        cursor.itersize = HISTORY_EXPORT_CHUNK
+        cursor.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(HISTORY_EXPORT_CHUNK)
+            if not rows:
+                break
+            buffer = io.StringIO()
+            if fmt == 'csv':
+                writer = csv.writer(buffer, lineterminator='\n')
+                for r in rows:
+                    writer.writerow([_export_value(r[c]) for c in HISTORY_COLUMNS])
+            else:
+                for r in rows:
+                    buffer.write(dumps({c: _export_value(r[c]) for c in HISTORY_COLUMNS}))
+                    buffer.write('\n')
+            yield buffer.getvalue()
+
+
+def _lttb_history(station_id, parameter, max_points):
+    """Mediciones de la ventana elegidas por LTTB sobre ``parameter``.
+
+    Primero se leen solo ``(date_timestamp, parameter)`` con un cursor del
+    servidor y ``fetchmany`` hacia arreglos NumPy; después se consultan las
+    filas completas únicamente de los puntos elegidos. Retorna
+    ``(filas, puntos_de_origen)``.
+    """
+    where, params = _history_window(request.args)
+    where.insert(0, 'estacion_codigo = %s')
+    params.insert(0, station_id)
+    where.append(f'{parameter} IS NOT NULL')
+    partes_x, partes_y = [], []
+    with get_db_cursor(name=f'lttb_{station_id}', statement='historial_lttb') as cursor:
+        cursor.itersize = HISTORY_EXPORT_CHUNK
+        cursor.execute(f"""
+            SELECT date_timestamp, {parameter} AS valor
+            FROM mediciones
+            WHERE {' AND '.join(where)}
+            ORDER BY fecha_medicion ASC
+        """, params)
+        while True:
+            rows = cursor.fetchmany(HISTORY_EXPORT_CHUNK)
+            if not rows:
+                break
+            partes_x.append(np.fromiter((r['date_timestamp'] for r in rows), dtype=np.int64, count=len(rows)))
+            partes_y.append(np.fromiter((r['valor'] for r in rows), dtype=float, count=len(rows)))
+    if not partes_x:
+        return [], 0
+    x = np.concatenate(partes_x)
+    y = np.concatenate(partes_y)
+    elegidos = x[lttb(x, y, max_points)]
+    with get_db_cursor(statement='historial_lttb_filas') as cursor:
+        cursor.execute(f"""
+            SELECT {', '.join(HISTORY_COLUMNS)}
+            FROM mediciones
+            WHERE {' AND '.join(where)} AND date_timestamp = ANY(%s)
+            ORDER BY fecha_medicion ASC
+        """, params + [elegidos.tolist()])
+        return cursor.fetchall(), len(x)
+
+
+def _downsampled_history(station_id, resolution):
+    """Serie de una estación con a lo sumo ``max_points`` puntos (default 1000).
+
+    - ``5m``, ``1h``, ``1d``: promedio, mínimo y máximo por bucket calculados
+      en SQL (rollups horarios/diarios para los tramos completos). Cada fila
+      trae ``<param>`` (promedio), ``<param>_min`` y ``<param>_max``. Si la
+      ventana produce más buckets que ``max_points`` se usa la siguiente
+      resolución más gruesa (``resolution`` informa la usada).
+    - ``lttb``: mediciones crudas elegidas por Largest-Triangle-Three-Buckets
+      sobre ``parameter`` (default ``t``), conservando picos y valles.
+    """
+    if resolution not in RESOLUCIONES and resolution != 'lttb':
+        return jsonify({'success': False, 'error': 'Resolución inválida (5m|1h|1d|lttb)'}), 400
+    try:
+        desde, hasta = _history_range(request.args)
+        max_points = max(3, min(int(request.args.get('max_points', HISTORY_MAX_POINTS)), HISTORY_MAX_LIMIT))
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Parámetros inválidos'}), 400
+    parametros = [c for c in HISTORY_COLUMNS if c != 'fecha_medicion']
+
+    try:
+        if resolution == 'lttb':
+            parameter = request.args.get('parameter', 't')
+            if parameter not in parametros:
+                return jsonify({'success': False, 'error': 'Parámetro inválido'}), 400
+            data, source_count = _lttb_history(station_id, parameter, max_points)
+            return jsonify({'success': True, 'station_id': station_id, 'resolution': 'lttb',
+                            'parameter': parameter, 'source_count': source_count,
+                            'data': data, 'count': len(data)})
+
+        niveles = list(RESOLUCIONES)
+        for nivel in niveles[niveles.index(resolution):]:
+            sql, params = consulta_serie(station_id, parametros, nivel, desde, hasta)
+            with get_db_cursor(statement='historial_resolucion') as cursor:
+                cursor.execute(sql, params)
+                rows = cursor.fetchall()
+            buckets = {}
+            for r in rows:
+                fila = buckets.setdefault(r['bucket'], {'fecha_medicion': r['bucket']})
+                p = r['parametro']
+                fila[p] = r['suma'] / r['n'] if r['n'] else None
+                fila[f'{p}_min'] = r['minimo']
+                fila[f'{p}_max'] = r['maximo']
+            if len(buckets) <= max_points:
+                break
+        data = list(buckets.values())[-max_points:]
+        return jsonify({'success': True, 'station_id': station_id, 'resolution': nivel,
+                        'requested_resolution': resolution, 'data': data, 'count': len(data)})
+    except Exception as e:
+        logging.exception("Error en /stations/<id>/history (resolution)")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
 @api.route('/stations/<int:station_id>/history', methods=['GET'])
+@conditional
 def get_station_history(station_id):
-    """Histórico de mediciones de una estación (últimas N horas o rango de fechas)."""
-    hours_back = request.args.get('hours_back')
-    start_date = request.args.get('start_date')
-    end_date = request.args.get('end_date')
-    where = ['estacion_codigo = %s']
-    params = [station_id]
+    """Histórico de mediciones de una estación (últimas N horas o rango de fechas).
+
+    - ``format=json`` (default): página de hasta ``limit`` filas (5000) de la
+      más reciente a la más antigua. Si hay más, ``next_before`` es el cursor
+      para pedir la siguiente página con ``before=<next_before>``.
+    - ``format=ndjson|csv``: exportación completa de la ventana en orden
+      ascendente, en streaming y sin tope. ``after=<fecha ISO>`` reanuda una
+      exportación interrumpida.
+    - ``resolution=5m|1h|1d|lttb`` (solo JSON): serie reducida a lo sumo a
+      ``max_points`` puntos (ver ``_downsampled_history``).
+    """
+    fmt = request.args.get('format', 'json').lower()
+    if fmt not in ('json', 'ndjson', 'csv'):
+        return jsonify({'success': False, 'error': 'Formato inválido'}), 400
+    resolution = request.args.get('resolution')
+    if resolution:
+        if fmt != 'json':
+            return jsonify({'success': False, 'error': 'resolution solo aplica a format=json'}), 400
+        return _downsampled_history(station_id, resolution)
     try:
-        if hours_back:
-            hb = int(hours_back)
-            since = datetime.utcnow() - timedelta(hours=hb)
-            where.append('fecha_medicion >= %s')
-            params.append(since)
-        else:
-            if start_date:
-                sd = datetime.strptime(start_date, '%Y-%m-%d')
-                where.append('fecha_medicion >= %s')
-                params.append(sd)
-            if end_date:
-                ed = datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1)
-                where.append('fecha_medicion < %s')
-                params.append(ed)
+        where, params = _history_window(request.args)
+        before = request.args.get('before')
+        after = request.args.get('after')
+        if before:
+            where.append('fecha_medicion < %s')
+            params.append(datetime.fromisoformat(before))
+        if after:
+            where.append('fecha_medicion > %s')
+            params.append(datetime.fromisoformat(after))
+        limit = max(1, min(int(request.args.get('limit', HISTORY_LIMIT)), HISTORY_MAX_LIMIT))
     except ValueError:
         return jsonify({'success': False, 'error': 'Parámetros de fecha inválidos'}), 400
+    where.insert(0, 'estacion_codigo = %s')
+    params.insert(0, station_id)
+
+    if fmt != 'json':
+        mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+        response = Response(stream_with_context(_stream_history(station_id, where, params, fmt)),
+                            mimetype=mimetype)
+        response.headers['Content-Disposition'] = f'attachment; filename=estacion_{station_id}.{fmt}'
+        return response
+
     sql = f"""
-        SELECT fecha_medicion, t, h, p, ws, wd, p1h, p24h
+        SELECT {', '.join(HISTORY_COLUMNS)}
         FROM mediciones
         WHERE {' AND '.join(where)}
         ORDER BY fecha_medicion DESC
-        LIMIT 5000
+        LIMIT %s
     """
     try:
-        with get_db_cursor() as cursor:
-            cursor.execute(sql, params)
+        with get_db_cursor(statement='historial_estacion') as cursor:
+            cursor.execute(sql, params + [limit])
             rows = cursor.fetchall()
-        return jsonify({'success': True, 'station_id': station_id, 'data': rows, 'count': len(rows)})
+        next_before = rows[-1]['fecha_medicion'].isoformat() if len(rows) == limit else None
+        return jsonify({'success': True, 'station_id': station_id, 'data': rows, 'count': len(rows),
+                        'next_before': next_before})
     except Exception as e:
         logging.exception("Error en /stations/<id>/history")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@api.route('/stations/history', methods=['GET'])
+@conditional
+def get_stations_history():
+    """Histórico de varias estaciones en una sola consulta, en formato columnar.
+
+    Query: ``ids`` (códigos separados por coma), ventana temporal como
+    ``/stations/<id>/history``, ``parameters`` (subconjunto opcional de
+    t,h,p,ws,wd,p1h,p24h) y ``limit`` (filas más recientes por estación,
+    recortado para que el total no pase de ``HISTORY_MAX_TOTAL_ROWS``).
+
+    Cada estación trae un arreglo ``time`` (epoch en ms, UTC) compartido por
+    los arreglos de cada parámetro, en orden ascendente.
+    """
+    try:
+        ids = sorted({int(i) for i in request.args.get('ids', '').split(',') if i.strip()})
+        where, params = _history_window(request.args)
+        limit = max(1, min(int(request.args.get('limit', HISTORY_LIMIT)), HISTORY_MAX_LIMIT))
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Parámetros inválidos'}), 400
+    if not ids or len(ids) > HISTORY_MAX_STATIONS:
+        return jsonify({'success': False, 'error': f'ids requerido (máximo {HISTORY_MAX_STATIONS} estaciones)'}), 400
+    limit = max(1, min(limit, HISTORY_MAX_TOTAL_ROWS // len(ids)))
+    disponibles = [c for c in HISTORY_COLUMNS if c != 'fecha_medicion']
+    pedidos = request.args.get('parameters')
+    parametros = [p for p in pedidos.split(',') if p in disponibles] if pedidos else disponibles
+    if not parametros:
+        return jsonify({'success': False, 'error': 'Parámetros inválidos'}), 400
+
+    # Un LATERAL por estación recorre idx_mediciones_estacion_fecha con su propio LIMIT
+    condiciones = ['estacion_codigo = s.codigo'] + where
+    sql = f"""
+        SELECT s.codigo AS estacion_codigo, m.fecha_medicion, {', '.join('m.' + p for p in parametros)}
+        FROM unnest(%s::int[]) AS s(codigo)
+        CROSS JOIN LATERAL (
+            SELECT fecha_medicion, {', '.join(parametros)}
+            FROM mediciones
+            WHERE {' AND '.join(condiciones)}
+            ORDER BY fecha_medicion DESC
+            LIMIT %s
+        ) m
+        ORDER BY s.codigo, m.fecha_medicion
+    """
+    # Los lotes se vuelcan directo a los arreglos columnares: nunca se
+    # materializa la lista completa de filas
+    estaciones = {str(i): {'time': [], **{p: [] for p in parametros}} for i in ids}
+    total = 0
+    try:
+        with get_db_cursor(statement='historial_estaciones') as cursor:
+            cursor.execute(sql, [ids] + params + [limit])
+            while True:
+                rows = cursor.fetchmany(HISTORY_EXPORT_CHUNK)
+                if not rows:
+                    break
+                total += len(rows)
+                for r in rows:
+                    serie = estaciones[str(r['estacion_codigo'])]
+                    serie['time'].append(calendar.timegm(r['fecha_medicion'].timetuple()) * 1000
+                                         + r['fecha_medicion'].microsecond // 1000)
+                    for p in parametros:
+                        serie[p].append(r[p])
+    except Exception as e:
+        logging.exception("Error en /stations/history")
+        return jsonify({'success': False, 'error': str(e)}), 500
+    return jsonify({'success': True, 'parameters': parametros, 'stations': estaciones, 'count': total})
+
+
+# Antigüedad máxima de la última medición para considerar los datos frescos
+READINESS_MAX_STALENESS_MINUTES = int(os.getenv('READINESS_MAX_STALENESS_MINUTES', '30'))
+
+
 @api.route('/health', methods=['GET'])
 def health_check():
     """Endpoint de salud"""
-    return jsonify({'status': 'healthy', 'timestamp': str(datetime.now())})
\ No newline at end of file
+    return jsonify({'status': 'healthy', 'timestamp': str(datetime.now()), 'db_pool': get_pool_stats(),
+                    'etl': get_last_cycle_stats()})
+
+
+@api.route('/health/live', methods=['GET'])
+def health_live():
+    """Liveness: el proceso atiende peticiones (no consulta la base de datos)."""
+    return jsonify({'status': 'alive', 'timestamp': str(datetime.now())})
+
+
+@api.route('/health/ready', methods=['GET'])
+def health_ready():
+    """Readiness: base de datos, pool, última ingesta y frescura de los datos.
+
+    503 si la base no responde o el esquema aún no está listo (p.ej. mientras
+    el arranque en segundo plano aplica ``init.sql``). Con datos más viejos
+    que ``READINESS_MAX_STALENESS_MINUTES`` responde 200 con estado
+    ``degraded``: la API sigue sirviendo lo que hay.
+    """
+    ahora = datetime.utcnow()
+    inicio = time.perf_counter()
+    database = {'ok': True}
+    fila = None
+    try:
+        with get_db_cursor(statement='health_ready') as cursor:
+            cursor.execute("""
+                SELECT v.version, v.updated_at,
+                       (SELECT MAX(fecha_medicion) FROM ultimas_mediciones) AS ultima_medicion
+                FROM ingesta_version v WHERE v.id = 1
+            """)
+            fila = cursor.fetchone()
+    except Exception as e:
+        database = {'ok': False, 'error': str(e)}
+    database['latency_ms'] = round((time.perf_counter() - inicio) * 1000, 3)
+
+    ingest = None
+    data = None
+    fresh = False
+    if fila is not None:
+        ingest = {
+            'version': fila['version'],
+            'last_success': fila['updated_at'].isoformat(),
+            'age_s': round((datetime.now(timezone.utc) - fila['updated_at']).total_seconds(), 1),
+        }
+        ultima = fila['ultima_medicion']
+        edad = (ahora - ultima).total_seconds() if ultima else None
+        fresh = edad is not None and edad <= READINESS_MAX_STALENESS_MINUTES * 60
+        data = {
+            'latest_measurement': ultima.isoformat() if ultima else None,
+            'age_s': round(edad, 1) if edad is not None else None,
+            'max_staleness_s': READINESS_MAX_STALENESS_MINUTES * 60,
+            'fresh': fresh,
+        }
+
+    ciclo = get_last_cycle_stats()
+    if not database['ok'] or fila is None:
+        status = 'not_ready'
+    else:
+        status = 'ready' if fresh else 'degraded'
+    body = {
+        'status': status,
+        'timestamp': str(datetime.now()),
+        'database': database,
+        'db_pool': get_pool_stats(),
+        'ingest': ingest,
+        'data': data,
+        'etl': {
+            'startup': get_startup_state(),
+            'last_cycle': {k: ciclo[k] for k in ('inicio', 'duracion_s', 'escrituras', 'errores')} if ciclo else None,
+        },
+    }
+    return jsonify(body), 503 if status == 'not_ready' else 200
+
+# Orden del ranking de estaciones en /etl/runs (columna de la consulta)
+_ETL_RUNS_ORDEN = {'total': 'total_ms', 'p95': 'p95_ms', 'avg': 'avg_ms', 'max': 'max_ms'}
+
+
+@api.route('/etl/runs', methods=['GET'])
+def get_etl_runs():
+    """Bitácora de ciclos del ETL (``etl_runs`` / ``etl_run_estaciones``).
+
+    Query: ``limit`` (ciclos recientes, 50; máx. 500), ``hours_back``
+    (ventana de la tendencia y del ranking, 24), ``top`` (estaciones, 20) y
+    ``sort`` (total|p95|avg|max). Por defecto ``total`` ordena por tiempo de
+    descarga acumulado: las estaciones que más consumen el plazo del ciclo.
+
+    - ``runs``: ciclos recientes con duración, plazo y conteos por resultado.
+    - ``trend``: por hora, ciclos y duración promedio/p95/máxima.
+    - ``slowest_stations``: latencia de descarga por estación en la ventana.
+    """
+    try:
+        limit = max(1, min(int(request.args.get('limit', 50)), 500))
+        hours_back = max(1, min(int(request.args.get('hours_back', 24)), 24 * 90))
+        top = max(1, min(int(request.args.get('top', 20)), 200))
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Parámetros inválidos'}), 400
+    orden = _ETL_RUNS_ORDEN.get(request.args.get('sort', 'total'))
+    if orden is None:
+        return jsonify({'success': False, 'error': f"sort debe ser uno de {', '.join(_ETL_RUNS_ORDEN)}"}), 400
+
+    try:
+        with get_db_cursor(statement='etl_runs') as cursor:
+            cursor.execute("""
+                SELECT id, inicio, duracion_s, plazo_s, vencido, abortado, catalogo,
+                       estaciones, estaciones_sondeadas, estaciones_omitidas,
+                       activas, antiguas, inactivas, sin_cambios, errores_descarga,
+                       mediciones_guardadas, escrituras, errores
+                FROM etl_runs
+                ORDER BY inicio DESC
+                LIMIT %s
+            """, (limit,))
+            runs = cursor.fetchall()
+
+            cursor.execute("""
+                SELECT date_trunc('hour', inicio) AS hour,
+                       COUNT(*) AS runs,
+                       ROUND(AVG(duracion_s)::numeric, 3) AS avg_duration_s,
+                       ROUND(percentile_cont(0.95) WITHIN GROUP (ORDER BY duracion_s)::numeric, 3) AS p95_duration_s,
+                       MAX(duracion_s) AS max_duration_s,
+                       COUNT(*) FILTER (WHERE vencido) AS deadline_missed,
+                       SUM(estaciones_sondeadas) AS stations_polled
+                FROM etl_runs
+                WHERE inicio >= CURRENT_TIMESTAMP - %s * INTERVAL '1 hour'
+                GROUP BY 1
+                ORDER BY 1
+            """, (hours_back,))
+            trend = cursor.fetchall()
+
+            cursor.execute(f"""
+                SELECT s.estacion_codigo AS station_id, e.nombre AS name,
+                       COUNT(*) AS fetches,
+                       ROUND(SUM(s.latencia_ms)::numeric, 1) AS total_ms,
+                       ROUND(AVG(s.latencia_ms)::numeric, 1) AS avg_ms,
+                       ROUND(percentile_cont(0.95) WITHIN GROUP (ORDER BY s.latencia_ms)::numeric, 1) AS p95_ms,
+                       MAX(s.latencia_ms) AS max_ms,
+                       COUNT(*) FILTER (WHERE s.resultado IN ('error', 'error_conexion')) AS errors,
+                       (array_agg(s.resultado ORDER BY s.run_id DESC))[1] AS last_result
+                FROM etl_run_estaciones s
+                JOIN etl_runs r ON r.id = s.run_id
+                LEFT JOIN estaciones e ON e.codigo = s.estacion_codigo
+                WHERE r.inicio >= CURRENT_TIMESTAMP - %s * INTERVAL '1 hour'
+                  AND s.latencia_ms IS NOT NULL
+                GROUP BY s.estacion_codigo, e.nombre
+                ORDER BY {orden} DESC, s.estacion_codigo
+                LIMIT %s
+            """, (hours_back, top))
+            slowest = cursor.fetchall()
+    except Exception as e:
+        logging.exception("Error en /etl/runs")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+    return jsonify({'success': True, 'hours_back': hours_back, 'runs': runs, 'count': len(runs),
+                    'trend': trend, 'slowest_stations': slowest})
@@ -0,0 +1,204 @@
+"""Teselas raster XYZ (PNG) del heatmap interpolado.
+
+Una consulta (parámetro, agregación, método, ventana) se interpola una sola
+vez en una grilla fina (``TileField``) sobre el rectángulo de las
+estaciones; cada tesela de 256×256 px solo muestrea esa grilla
+(bilineal), la colorea y la codifica en PNG con NumPy + zlib. El costo por
+tesela es constante e independiente del número de estaciones.
+
+La escala de color usa los cuantiles de los valores por estación
+(min, q25, q50, q75, q90, max): cada cuantil se ubica en la misma posición
+de la paleta, como en la leyenda del frontend.
+
+Las teselas se guardan en ``TILES_DIR/<versión de ingesta>/...`` para
+servirlas desde disco (o un proxy estático) hasta la siguiente ingesta. Se
+conservan la versión actual y la anterior: otro worker de la API puede
+seguir sirviendo la anterior hasta que note el cambio de versión.
+"""
+import os
+import shutil
+import struct
+import threading
+import zlib
+
+import numpy as np
+
+TILE_SIZE = 256
+TILE_MAX_ZOOM = int(os.getenv('HEATMAP_TILE_MAX_ZOOM', '18'))
+# Lado de la grilla interpolada que alimenta las teselas
+TILE_FIELD_SIZE = int(os.getenv('HEATMAP_TILE_FIELD_SIZE', '256'))
+TILE_ALPHA = 190
+TILES_DIR = os.getenv(
+    'TILES_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'tiles_cache')
+)
+
+# Paletas por parámetro (posición en [0, 1] → color), iguales a getHeatmapGradient del frontend
+PALETTES = {
+    'temperature': [(0.0, '#0000ff'), (0.25, '#00bfff'), (0.5, '#00ff6e'), (0.7, '#ffff00'), (0.9, '#ff8000'), (1.0, '#ff0000')],
+    'humidity': [(0.0, '#8b4513'), (0.2, '#daa520'), (0.4, '#ffff66'), (0.6, '#00ff66'), (0.8, '#3399ff'), (1.0, '#0000ff')],
+    'precipitation': [(0.0, '#ffffff'), (0.2, '#b3e5fc'), (0.4, '#4fc3f7'), (0.6, '#0288d1'), (0.8, '#01579b'), (1.0, '#002f6c')],
+    'pressure': [(0.0, '#4a148c'), (0.3, '#6a1b9a'), (0.5, '#1565c0'), (0.7, '#26a69a'), (0.85, '#ffee58'), (1.0, '#ef6c00')],
+    'wind_speed': [(0.0, '#e0f7fa'), (0.2, '#80deea'), (0.4, '#26c6da'), (0.6, '#00acc1'), (0.8, '#00838f'), (1.0, '#004d40')],
+}
+_DEFAULT_PALETTE = [(0.0, '#ffffff'), (1.0, '#000000')]
+
+# Posición en la paleta de cada estadístico de la escala
+_STAT_POSITIONS = (('min', 0.0), ('q25', 0.25), ('q50', 0.5), ('q75', 0.75), ('q90', 0.9), ('max', 1.0))
+
+
+def _rgb(color):
+    return tuple(int(color[i:i + 2], 16) for i in (1, 3, 5))
+
+
+class TileField:
+    """Grilla interpolada regular + escala de color de una consulta."""
+
+    def __init__(self, grid_lat, grid_lon, grid_vals, stats, parameter):
+        self.values = np.asarray(grid_vals, dtype=np.float32)
+        self.lat0 = float(grid_lat[0, 0])
+        self.lon0 = float(grid_lon[0, 0])
+        rows, cols = self.values.shape
+        self.dlat = float(grid_lat[-1, 0] - self.lat0) / max(rows - 1, 1) or 1e-9
+        self.dlon = float(grid_lon[0, -1] - self.lon0) / max(cols - 1, 1) or 1e-9
+        self.bounds = (self.lat0, self.lon0, float(grid_lat[-1, 0]), float(grid_lon[0, -1]))
+        self.stats = stats
+        self.parameter = parameter
+
+        scale = [(stats[k], pos) for k, pos in _STAT_POSITIONS] if stats else [(0.0, 0.0), (1.0, 1.0)]
+        self._scale_vals = np.array([v for v, _ in scale])
+        self._scale_pos = np.array([p for _, p in scale])
+        palette = PALETTES.get(parameter, _DEFAULT_PALETTE)
+        self._palette_pos = np.array([p for p, _ in palette])
+        self._palette_rgb = np.array([_rgb(c) for _, c in palette], dtype=float)
+
+    @property
+    def nbytes(self):
+        return self.values.nbytes
+
+    def intersects(self, south, west, north, east):
+        lat_min, lon_min, lat_max, lon_max = self.bounds
+        return not (north < lat_min or south > lat_max or east < lon_min or west > lon_max)
+
+    def sample(self, lat, lon):
+        """Valores bilineales en ``lat``/``lon`` (broadcast); NaN fuera de la grilla."""
+        rows, cols = self.values.shape
+        fi = (lat - self.lat0) / self.dlat
+        fj = (lon - self.lon0) / self.dlon
+        valid = (fi >= 0) & (fi <= rows - 1) & (fj >= 0) & (fj <= cols - 1)
+        fi = np.clip(fi, 0, rows - 1)
+        fj = np.clip(fj, 0, cols - 1)
+        i0 = np.minimum(fi.astype(int), rows - 2)
+        j0 = np.minimum(fj.astype(int), cols - 2)
+        di = fi - i0
+        dj = fj - j0
+        v = self.values
+        out = (v[i0, j0] * (1 - di) * (1 - dj) + v[i0 + 1, j0] * di * (1 - dj) +
+               v[i0, j0 + 1] * (1 - di) * dj + v[i0 + 1, j0 + 1] * di * dj)
+        return np.where(valid, out, np.nan)
+
+    def colorize(self, values):
+        """Arreglo RGBA ``uint8``; las celdas sin valor quedan transparentes."""
+        missing = np.isnan(values)
+        filled = np.where(missing, self._scale_vals[0], values)
+        if self._scale_vals[-1] > self._scale_vals[0]:
+            pos = np.interp(filled, self._scale_vals, self._scale_pos)
+        else:
+            pos = np.full(filled.shape, 0.5)
+        rgba = np.empty(values.shape + (4,), dtype=np.uint8)
+        for c in range(3):
+            rgba[..., c] = np.interp(pos, self._palette_pos, self._palette_rgb[:, c])
+        rgba[..., 3] = np.where(missing, 0, TILE_ALPHA)
+        return rgba
+
+
+def tile_coordinates(z, x, y):
+    """Latitudes (filas) y longitudes (columnas) de los centros de píxel de una tesela."""
+    n = 2 ** z
+    pix = (np.arange(TILE_SIZE) + 0.5) / TILE_SIZE
+    lon = (x + pix) / n * 360.0 - 180.0
+    lat = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * (y + pix) / n))))
+    return lat, lon
+
+
+def tile_bounds(z, x, y):
+    """``(south, west, north, east)`` de la tesela en grados."""
+    n = 2 ** z
+    west = x / n * 360.0 - 180.0
+    east = (x + 1) / n * 360.0 - 180.0
+    north = float(np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * y / n)))))
+    south = float(np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * (y + 1) / n)))))
+    return south, west, north, east
+
+
+def encode_png(rgba):
+    """Codificar un arreglo ``(alto, ancho, 4)`` uint8 como PNG RGBA."""
+    height, width, _ = rgba.shape
+    raw = np.zeros((height, width * 4 + 1), dtype=np.uint8)  # byte de filtro 0 por fila
+    raw[:, 1:] = rgba.reshape(height, -1)
+
+    def chunk(tag, data):
+        return (struct.pack('>I', len(data)) + tag + data +
+                struct.pack('>I', zlib.crc32(tag + data) & 0xffffffff))
+
+    return (b'\x89PNG\r\n\x1a\n' +
+            chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0)) +
+            chunk(b'IDAT', zlib.compress(raw.tobytes(), 6)) +
+            chunk(b'IEND', b''))
+
+
+_empty_tile = None
+
+
+def empty_tile():
+    """PNG transparente (teselas sin datos)."""
+    global _empty_tile
+    if _empty_tile is None:
+        _empty_tile = encode_png(np.zeros((TILE_SIZE, TILE_SIZE, 4), dtype=np.uint8))
+    return _empty_tile
+
+
+def render_tile(field, z, x, y):
+    """PNG de la tesela ``z/x/y`` o ``None`` si no toca la grilla."""
+    if not field.intersects(*tile_bounds(z, x, y)):
+        return None
+    lat, lon = tile_coordinates(z, x, y)
+    values = field.sample(lat[:, None], lon[None, :])
+    return encode_png(field.colorize(values))
+
+
+_prune_lock = threading.Lock()
+_current_version = None
+
+
+def tile_path(version, parameter, variant, z, x, y, directory=TILES_DIR):
+    return os.path.join(directory, version, parameter, variant, str(z), str(x), f"{y}.png")
+
+
+def prune_tiles(version, directory=TILES_DIR):
+    """Borrar los directorios de versiones anteriores a ``version - 1``.
+
+    La versión previa se conserva porque cada proceso lee la versión de
+    ingesta con su propio retraso (``INGEST_VERSION_TTL``) y puede estar
+    sirviéndola todavía.
+    """
+    if not os.path.isdir(directory):
+        return
+    minima = int(version) - 1
+    for name in os.listdir(directory):
+        if name.isdigit() and int(name) < minima:
+            shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+
+
+def save_tile(path, version, png, directory=TILES_DIR):
+    """Escribir la tesela (atómico) y, al cambiar de versión, podar las antiguas."""
+    global _current_version
+    with _prune_lock:
+        if _current_version != version:
+            prune_tiles(version, directory)
+            _current_version = version
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporal = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temporal, 'wb') as f:
+        f.write(png)
+    os.replace(temporal, path)
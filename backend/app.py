@@ -1,7 +1,24 @@
+"""Aplicación principal Flask.
+
+Se registra el blueprint de la API REST y, en modo embebido, se inicia el
+scheduler de ETL en un hilo en background (APScheduler) para mantener la
+base de datos actualizada con los datos de SIATA. En producción el ETL corre
+aparte (``python -m etl.worker``) y la API solo sirve lecturas.
+
+Variables de entorno relevantes:
+    - DATABASE_URL: cadena de conexión PostgreSQL
+    - ETL_MODE: "embedded" (default) corre el ETL aquí bajo el lock de líder;
+      "off" deja la API sin ETL (modo solo API)
+    - DISABLE_SCHEDULER: "1" equivale a ETL_MODE=off (compatibilidad)
+    - RESPONSE_COMPRESSION: "br,gzip" / "gzip" para comprimir respuestas grandes
+"""
+
 from flask import Flask
 from flask_cors import CORS
 from api.routes import api
 from api.heatmap_routes import heatmap_api
+from api import compression, serialization
+import metrics
 from etl.scheduler import start_scheduler
 import logging, os
 
@@ -10,17 +27,10 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 
 app = Flask(__name__)
 CORS(app)
-
-"""Aplicación principal Flask.
-
-Se registra el blueprint de la API REST y se inicia el scheduler de ETL
-en un hilo en background (APScheduler) para mantener la base de datos
-actualizada con los datos de SIATA.
-
-Variables de entorno relevantes:
-    - DATABASE_URL: cadena de conexión PostgreSQL
-    - DISABLE_SCHEDULER: si está definido ("1"), no inicia el scheduler
-"""
+serialization.init_app(app)
+# Antes que compression: mide el tamaño ya comprimido
+metrics.init_app(app)
+compression.init_app(app)
 
 # Registrar blueprints (API principal y endpoints de heatmap)
 app.register_blueprint(api, url_prefix='/api')
@@ -30,11 +40,16 @@ app.register_blueprint(heatmap_api, url_prefix='/api')
 def index():
     return {'message': 'SIATA Data API', 'status': 'running'}
 
+# "embedded": ETL dentro de la API (bajo el lock de líder); "off": solo API
+ETL_MODE = 'off' if os.getenv('DISABLE_SCHEDULER') == '1' else os.getenv('ETL_MODE', 'embedded').lower()
+
 def _maybe_start_scheduler():
     """Arranca el scheduler solo una vez evitando doble inicio con el reloader."""
-    if os.getenv('DISABLE_SCHEDULER') == '1':
-        logging.info("Scheduler deshabilitado por DISABLE_SCHEDULER=1")
+    if ETL_MODE == 'off':
+        logging.info("ETL deshabilitado en este proceso (modo solo API)")
         return
+    if ETL_MODE != 'embedded':
+        logging.warning(f"ETL_MODE desconocido '{ETL_MODE}'; se usa 'embedded'")
     # Evitar doble ejecución cuando FLASK_DEBUG está activo
     if os.environ.get('WERKZEUG_RUN_MAIN') == 'true' or not app.debug:
         try:
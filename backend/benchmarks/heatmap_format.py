@@ -0,0 +1,76 @@
+"""Benchmark del submuestreo y formatos de respuesta de /heatmap/interpolate.
+
+Compara el recorrido celda a celda anterior con la versión vectorizada
+(``format=points``) y con los formatos columnares (``columnar`` y ``f32``):
+tiempo de construcción + serialización JSON y tamaño del cuerpo.
+
+Uso (desde backend/):
+    python -m benchmarks.heatmap_format [grid_size ...]
+"""
+import json
+import sys
+import time
+
+import numpy as np
+
+from api.heatmap_routes import MAX_CELLS, _grid_columnar, _grid_points, _subsample
+
+
+def _legacy_points(grid_lat, grid_lon, grid_vals, grid_size):
+    step = max(1, int(grid_size / MAX_CELLS ** 0.5))
+    interpolated = []
+    for i in range(0, grid_size, step):
+        for j in range(0, grid_size, step):
+            v = grid_vals[i, j]
+            if np.isnan(v):
+                continue
+            interpolated.append({
+                'latitude': float(grid_lat[i, j]),
+                'longitude': float(grid_lon[i, j]),
+                'value': float(v)
+            })
+    return interpolated
+
+
+def _synthetic_grid(grid_size):
+    lat_lin = np.linspace(6.0, 6.5, grid_size)
+    lon_lin = np.linspace(-75.7, -75.3, grid_size)
+    grid_lon, grid_lat = np.meshgrid(lon_lin, lat_lin)
+    grid_vals = 20 + 5 * np.sin(grid_lat * 40) * np.cos(grid_lon * 40)
+    # Fuera del casco convexo griddata deja NaN: simular ~25% de celdas vacías
+    grid_vals[(grid_lat - 6.25) ** 2 + (grid_lon + 75.5) ** 2 > 0.06] = np.nan
+    return grid_lat, grid_lon, grid_vals
+
+
+def _measure(build, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        body = json.dumps(build())
+    return (time.perf_counter() - start) / repeat * 1000, len(body)
+
+
+def main(sizes):
+    print(f"{'grid':>6} {'formato':>10} {'ms':>9} {'bytes':>10}")
+    for grid_size in sizes:
+        grid_lat, grid_lon, grid_vals = _synthetic_grid(grid_size)
+        repeat = 20
+
+        def vectorized(binary=None):
+            sub = _subsample(grid_lat, grid_lon, grid_vals, grid_size)
+            if binary is None:
+                return _grid_points(*sub)
+            return _grid_columnar(*sub, binary=binary)
+
+        casos = [
+            ('legacy', lambda: _legacy_points(grid_lat, grid_lon, grid_vals, grid_size)),
+            ('points', vectorized),
+            ('columnar', lambda: vectorized(binary=False)),
+            ('f32', lambda: vectorized(binary=True)),
+        ]
+        for nombre, build in casos:
+            ms, size = _measure(build, repeat)
+            print(f"{grid_size:>6} {nombre:>10} {ms:>9.3f} {size:>10}")
+
+
+if __name__ == '__main__':
+    main([int(a) for a in sys.argv[1:]] or [40, 55, 89, 200, 500])
@@ -0,0 +1,84 @@
+"""Benchmark del motor de interpolación (``api.interpolation``).
+
+1. Compara ``scipy.interpolate.griddata`` (triangula en cada llamada) con
+   los pesos precalculados: construcción en frío y mat-vec con pesos
+   cacheados, para distintos números de estaciones y ``grid_size``.
+2. Compara los métodos de /heatmap/interpolate (grid, poly2, poly3, idw,
+   kriging) sobre un campo sintético conocido: latencia en frío y con
+   caché, RMSE contra el campo real en las celdas con valor y cobertura.
+
+Uso (desde backend/):
+    python -m benchmarks.interpolation [grid_size ...]
+"""
+import sys
+import time
+
+import numpy as np
+from scipy.interpolate import griddata
+
+from api import interpolation
+from api.heatmap_routes import _poly_fit
+from api.interpolation import GridInterpolator, interpolate_grid, regular_grid
+
+
+def _field(lats, lons):
+    return 20 + 5 * np.sin(lats * 40) * np.cos(lons * 40)
+
+
+def _stations(n, seed=0):
+    rng = np.random.default_rng(seed)
+    lats = rng.uniform(6.0, 6.5, n)
+    lons = rng.uniform(-75.7, -75.3, n)
+    vals = _field(lats, lons) + rng.normal(0, 0.3, n)
+    return lats, lons, vals
+
+
+def _ms(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - start) / repeat * 1000, result
+
+
+def main(sizes):
+    print(f"{'estaciones':>10} {'grid':>6} {'griddata ms':>12} {'build ms':>10} {'cached ms':>10} {'iguales':>8}")
+    for n in (40, 150, 500):
+        lats, lons, vals = _stations(n)
+        for grid_size in sizes:
+            grid_lat, grid_lon = regular_grid(lats, lons, grid_size)
+            t_ref, ref = _ms(lambda: griddata((lats, lons), vals, (grid_lat, grid_lon), method='linear'), 5)
+            t_build, _ = _ms(lambda: GridInterpolator(lats, lons, grid_size), 3)
+            interpolate_grid(lats, lons, vals, grid_size)  # calentar la caché
+            t_cached, (_, _, out) = _ms(lambda: interpolate_grid(lats, lons, vals, grid_size), 20)
+            iguales = np.allclose(ref, out, equal_nan=True)
+            print(f"{n:>10} {grid_size:>6} {t_ref:>12.2f} {t_build:>10.2f} {t_cached:>10.3f} {str(iguales):>8}")
+
+    print()
+    print(f"{'estaciones':>10} {'grid':>6} {'método':>8} {'frío ms':>10} {'caché ms':>10} {'rmse':>8} {'cobertura':>10}")
+    for n in (40, 150):
+        lats, lons, vals = _stations(n)
+        points = [{'latitude': a, 'longitude': b, 'value': v} for a, b, v in zip(lats, lons, vals)]
+        for grid_size in sizes:
+            for method in ('grid', 'poly2', 'poly3', 'idw', 'kriging'):
+                if method.startswith('poly'):
+                    def run():
+                        return _poly_fit(points, grid_size, int(method[-1]))
+                    t_cold, (grid_lat, grid_lon, out) = _ms(run, 1)
+                    t_cached = t_cold
+                else:
+                    engine = 'linear' if method == 'grid' else method
+                    interpolation._cache.clear()
+                    interpolation._variograms.clear()
+
+                    def run():
+                        return interpolate_grid(lats, lons, vals, grid_size, engine, variogram_key=('bench', n))
+                    t_cold, _ = _ms(run, 1)
+                    t_cached, (grid_lat, grid_lon, out) = _ms(run, 5)
+                valid = ~np.isnan(out)
+                rmse = np.sqrt(np.mean((out[valid] - _field(grid_lat, grid_lon)[valid]) ** 2))
+                print(f"{n:>10} {grid_size:>6} {method:>8} {t_cold:>10.2f} {t_cached:>10.3f} "
+                      f"{rmse:>8.3f} {valid.mean():>10.0%}")
+
+
+if __name__ == '__main__':
+    main([int(a) for a in sys.argv[1:]] or [40, 100, 200, 500])
@@ -0,0 +1,74 @@
+"""Benchmark de serialización de las respuestas más grandes de la API.
+
+Simula el histórico de una estación (filas con ``datetime`` y lecturas) y
+``/stations/all-data`` y compara:
+- ``json+Decimal``: proveedor por defecto de Flask con filas ``Decimal`` (antes);
+- ``json+float()``: conversión ``float(...)`` por campo + proveedor por defecto;
+- ``orjson``: filas ya en ``float`` (typecaster) + ``OrjsonProvider``.
+Además reporta el tamaño comprimido con gzip (y brotli si está instalado).
+
+Uso (desde backend/):
+    python -m benchmarks.json_serialization [filas ...]
+"""
+import gzip
+import sys
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from api.compression import RESPONSE_COMPRESSION_LEVEL, brotli
+from api.routes import HISTORY_COLUMNS
+from api.serialization import OrjsonProvider, orjson
+
+_CAMPOS = HISTORY_COLUMNS[1:]
+
+
+def _history_rows(n):
+    inicio = datetime(2026, 1, 1)
+    return [
+        {'fecha_medicion': inicio + timedelta(minutes=i),
+         **{c: Decimal(f"{20 + (i * 7 + k) % 100 / 10:.3f}") for k, c in enumerate(_CAMPOS)}}
+        for i in range(n)
+    ]
+
+
+def _as_float(rows):
+    return [{k: float(v) if isinstance(v, Decimal) else v for k, v in r.items()} for r in rows]
+
+
+def _measure(dump, payload, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        body = dump(payload)
+    return (time.perf_counter() - start) / repeat * 1000, body
+
+
+def main(sizes):
+    app = Flask(__name__)
+    default = DefaultJSONProvider(app)
+    casos = [
+        ('json+Decimal', lambda rows: default.dumps({'data': rows}, separators=(',', ':')), False),
+        ('json+float()', lambda rows: default.dumps({'data': _as_float(rows)}, separators=(',', ':')), False),
+    ]
+    if orjson is not None:
+        fast = OrjsonProvider(app)
+        casos.append(('orjson', lambda rows: fast.dumps({'data': rows}), True))
+
+    print(f"{'filas':>7} {'caso':>13} {'ms':>9} {'bytes':>10} {'gzip':>9} {'br':>9}")
+    for n in sizes:
+        decimales = _history_rows(n)
+        flotantes = _as_float(decimales)
+        repeat = max(3, 20000 // n)
+        for nombre, dump, usa_float in casos:
+            ms, body = _measure(dump, flotantes if usa_float else decimales, repeat)
+            data = body.encode()
+            comprimido = len(gzip.compress(data, compresslevel=RESPONSE_COMPRESSION_LEVEL))
+            br = len(brotli.compress(data, quality=RESPONSE_COMPRESSION_LEVEL)) if brotli else '-'
+            print(f"{n:>7} {nombre:>13} {ms:>9.3f} {len(data):>10} {comprimido:>9} {br:>9}")
+
+
+if __name__ == '__main__':
+    main([int(a) for a in sys.argv[1:]] or [100, 1000, 5000, 50000])
@@ -1,37 +1,340 @@
 import psycopg2
 import psycopg2.extras
+import psycopg2.extensions
 import os
+import re
+import threading
+import time
+import weakref
 from contextlib import contextmanager
 
-def get_db_connection():
-    """Crear conexión a la base de datos"""
-    database_url = os.getenv('DATABASE_URL')
-    return psycopg2.connect(database_url)
+import metrics
+
+# Configuración del pool (variables de entorno)
+DB_POOL_MIN = int(os.getenv('DB_POOL_MIN', '1'))
+DB_POOL_MAX = int(os.getenv('DB_POOL_MAX', '10'))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '30'))
+# Segundos de inactividad tras los cuales se verifica la conexión con SELECT 1
+DB_POOL_HEALTHCHECK_IDLE = float(os.getenv('DB_POOL_HEALTHCHECK_IDLE', '30'))
+DB_PREPARED_STATEMENTS = os.getenv('DB_PREPARED_STATEMENTS') == '1'
+# Segundos máximos para abrir una conexión (evita colgarse si el host no responde)
+DB_CONNECT_TIMEOUT = int(os.getenv('DB_CONNECT_TIMEOUT', '5'))
+
+# NUMERIC/DECIMAL como float nativo (en vez de decimal.Decimal) en todo el
+# proceso: las vistas serializan las filas sin convertir campo por campo
+_DECIMAL_A_FLOAT = psycopg2.extensions.new_type(
+    psycopg2.extensions.DECIMAL.values, 'DECIMAL_A_FLOAT',
+    lambda valor, cursor: float(valor) if valor is not None else None
+)
+psycopg2.extensions.register_type(_DECIMAL_A_FLOAT)
+psycopg2.extensions.register_type(psycopg2.extensions.new_array_type(
+    (1231,), 'DECIMAL_A_FLOAT[]', _DECIMAL_A_FLOAT
+))
+
+
+class _TimedCursor(psycopg2.extras.RealDictCursor):
+    """RealDictCursor que mide cada ``execute`` en ``siata_db_query_duration_seconds``
+    con la etiqueta ``statement`` que asigna ``get_db_cursor``."""
+    statement = 'otros'
+
+    def execute(self, query, vars=None):
+        inicio = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            metrics.db_query_duration.observe(time.perf_counter() - inicio, self.statement)
+
+
+class PoolTimeout(Exception):
+    """No se obtuvo conexión del pool dentro de DB_POOL_TIMEOUT."""
+
+
+class ConnectionPool:
+    """Pool de conexiones thread-safe con espera acotada y estadísticas.
+
+    Conserva abiertas hasta ``maxconn`` conexiones (LIFO) y un semáforo hace
+    esperar al solicitante hasta ``timeout`` cuando todas están en uso.
+    Al entregar una conexión se valida que siga abierta y, si estuvo
+    inactiva más de ``healthcheck_idle`` segundos, se prueba con ``SELECT 1``
+    y se reemplaza si falló.
+    """
+
+    def __init__(self, dsn, minconn=DB_POOL_MIN, maxconn=DB_POOL_MAX,
+                 timeout=DB_POOL_TIMEOUT, healthcheck_idle=DB_POOL_HEALTHCHECK_IDLE):
+        self.dsn = dsn
+        self.maxconn = max(1, maxconn)
+        self.timeout = timeout
+        self.healthcheck_idle = healthcheck_idle
+        self._slots = threading.BoundedSemaphore(self.maxconn)
+        self._lock = threading.Lock()
+        self._idle = []
+        self._open = 0
+        self._last_used = {}
+        # Sentencias preparadas por conexión (clave: el objeto conexión; débil
+        # para no retener conexiones ajenas al pool)
+        self._prepared = weakref.WeakKeyDictionary()
+        self._in_use = 0
+        self._checkouts = 0
+        self._timeouts = 0
+        self._discarded = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._checkout_total = 0.0
+        self._checkout_max = 0.0
+        for _ in range(min(max(0, minconn), self.maxconn)):
+            conn = self._connect()
+            self._last_used[id(conn)] = time.monotonic()
+            self._idle.append(conn)
+
+    def _connect(self):
+        conn = psycopg2.connect(self.dsn, connect_timeout=DB_CONNECT_TIMEOUT)
+        with self._lock:
+            self._open += 1
+        return conn
+
+    def _healthy(self, conn):
+        if conn.closed:
+            return False
+        last = self._last_used.get(id(conn))
+        if last is not None and time.monotonic() - last < self.healthcheck_idle:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _discard(self, conn):
+        self._last_used.pop(id(conn), None)
+        with self._lock:
+            self._prepared.pop(conn, None)
+        try:
+            conn.close()
+        finally:
+            with self._lock:
+                self._open -= 1
+                self._discarded += 1
+
+    def _take(self):
+        with self._lock:
+            conn = self._idle.pop() if self._idle else None
+        if conn is None:
+            return self._connect()
+        if not self._healthy(conn):
+            self._discard(conn)
+            return self._connect()
+        return conn
+
+    def getconn(self):
+        start = time.perf_counter()
+        if not self._slots.acquire(timeout=self.timeout):
+            with self._lock:
+                self._timeouts += 1
+            raise PoolTimeout(f"Sin conexiones libres tras {self.timeout}s (max={self.maxconn})")
+        waited = time.perf_counter() - start
+        try:
+            conn = self._take()
+        except Exception:
+            self._slots.release()
+            raise
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self._in_use += 1
+            self._checkouts += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+            self._checkout_total += elapsed
+            self._checkout_max = max(self._checkout_max, elapsed)
+        return conn
+
+    def putconn(self, conn, close=False):
+        try:
+            if not close and not conn.closed:
+                status = conn.info.transaction_status
+                if status == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN:
+                    close = True
+                elif status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            if close or conn.closed:
+                self._discard(conn)
+            else:
+                self._last_used[id(conn)] = time.monotonic()
+                with self._lock:
+                    self._idle.append(conn)
+        finally:
+            with self._lock:
+                self._in_use -= 1
+            self._slots.release()
+
+    def is_prepared(self, conn, nombre):
+        """True si la sentencia ``nombre`` ya se preparó en ``conn``."""
+        with self._lock:
+            return nombre in self._prepared.get(conn, ())
+
+    def mark_prepared(self, conn, nombre):
+        """Registrar que ``nombre`` quedó preparada en ``conn``."""
+        with self._lock:
+            self._prepared.setdefault(conn, set()).add(nombre)
+
+    def stats(self):
+        with self._lock:
+            checkouts = self._checkouts or 1
+            return {
+                'max': self.maxconn,
+                'open': self._open,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'checkouts': self._checkouts,
+                'timeouts': self._timeouts,
+                'discarded': self._discarded,
+                'wait_avg_ms': round(self._wait_total / checkouts * 1000, 3),
+                'wait_max_ms': round(self._wait_max * 1000, 3),
+                'checkout_avg_ms': round(self._checkout_total / checkouts * 1000, 3),
+                'checkout_max_ms': round(self._checkout_max * 1000, 3),
+            }
+
+    def closeall(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            self._discard(conn)
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    """Pool compartido del proceso (se crea al primer uso y tras un fork)."""
+    global _pool, _pool_pid
+    if _pool is None or _pool_pid != os.getpid():
+        with _pool_lock:
+            if _pool is None or _pool_pid != os.getpid():
+                _pool = ConnectionPool(os.getenv('DATABASE_URL'))
+                _pool_pid = os.getpid()
+    return _pool
+
+def get_pool_stats():
+    """Estadísticas del pool, o None si aún no se ha creado."""
+    if _pool is None or _pool_pid != os.getpid():
+        return None
+    return _pool.stats()
+
+def _pool_gauges():
+    stats = get_pool_stats()
+    if stats is None:
+        return None
+    return {(estado,): stats[estado] for estado in ('open', 'in_use', 'idle')}
+
+metrics.Gauge('siata_db_pool_connections', 'Conexiones del pool por estado',
+              ('state',), callback=_pool_gauges)
 
 @contextmanager
-def get_db_cursor():
-    """Context manager para manejar conexiones y cursores"""
-    conn = None
+def get_db_cursor(name=None, statement=None):
+    """Context manager para manejar conexiones y cursores (checkout del pool).
+
+    Con ``name`` el cursor es del lado del servidor (named cursor): las filas
+    se traen por lotes con ``fetchmany``/``itersize`` en vez de cargar todo
+    el resultado en memoria.
+
+    ``statement`` etiqueta la duración de las consultas en las métricas
+    (nombre estable y de baja cardinalidad, p.ej. ``'historial_estacion'``).
+    """
+    pool = get_pool()
+    conn = pool.getconn()
+    cursor = None
+    broken = False
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        cursor = conn.cursor(name=name, cursor_factory=_TimedCursor)
+        if statement is not None:
+            cursor.statement = statement
         yield cursor
+        if name is not None:
+            cursor.close()  # el cursor del servidor deja de existir al terminar la transacción
         conn.commit()
     except Exception as e:
-        if conn:
+        broken = conn.closed != 0
+        if not broken:
             conn.rollback()
         raise e
     finally:
-        if conn:
-            cursor.close()
-            conn.close()
+        if cursor is not None and not cursor.closed:
+            try:
+                cursor.close()
+            except psycopg2.Error:
+                pass  # named cursor ya invalidado por el rollback
+        pool.putconn(conn, close=broken)
+
+_PLACEHOLDER = re.compile(r'%s')
+# Cualquier '%' que no inicie un '%s': '%%', '%(nombre)s', '%d'...
+_PLACEHOLDER_NO_SOPORTADO = re.compile(r'%(?!s)')
+
+def execute_prepared(cursor, nombre, sql, params=()):
+    """Ejecutar ``sql`` como sentencia preparada del servidor si
+    DB_PREPARED_STATEMENTS=1; en otro caso equivale a ``cursor.execute``.
+
+    ``nombre`` identifica la sentencia; se prepara una sola vez por conexión.
+    ``sql`` solo admite placeholders ``%s`` posicionales (uno por parámetro):
+    ``%%``, ``%(nombre)s`` u otros se rechazan con ``ValueError`` en ambos
+    modos, porque el ``PREPARE`` no pasa por el formateo de psycopg2.
+    """
+    no_soportado = _PLACEHOLDER_NO_SOPORTADO.search(sql)
+    if no_soportado:
+        raise ValueError(f"execute_prepared({nombre}): placeholder no soportado "
+                         f"{sql[no_soportado.start():no_soportado.start() + 2]!r}; usar solo %s")
+    marcadores = len(_PLACEHOLDER.findall(sql))
+    if marcadores != len(params):
+        raise ValueError(f"execute_prepared({nombre}): {marcadores} placeholders y {len(params)} parámetros")
+    if not DB_PREPARED_STATEMENTS:
+        cursor.execute(sql, params)
+        return
+    pool = get_pool()
+    if not pool.is_prepared(cursor.connection, nombre):
+        contador = iter(range(1, len(params) + 1))
+        cuerpo = _PLACEHOLDER.sub(lambda _: f"${next(contador)}", sql)
+        cursor.execute(f"PREPARE {nombre} AS {cuerpo}")
+        pool.mark_prepared(cursor.connection, nombre)
+    if params:
+        cursor.execute(f"EXECUTE {nombre} ({', '.join(['%s'] * len(params))})", params)
+    else:
+        cursor.execute(f"EXECUTE {nombre}")
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'init.sql')
+
+def ensure_schema():
+    """Aplicar init.sql (idempotente) para crear tablas, índices y
+    restricciones nuevas en bases ya existentes.
+
+    Si ``mediciones`` aún es la tabla sin particionar del esquema anterior,
+    se renombra a ``mediciones_legacy`` y se copia a la versión particionada
+    mes a mes (ver ``partitions.completar_migracion``); una copia
+    interrumpida se retoma en la siguiente llamada.
+    """
+    from .partitions import preparar_migracion, migracion_pendiente, completar_migracion
+
+    with open(SCHEMA_PATH, encoding='utf-8') as f:
+        ddl = f.read()
+    with get_db_cursor(statement='ensure_schema') as cursor:
+        renombrada = preparar_migracion(cursor)
+        pendiente = renombrada or migracion_pendiente(cursor)
+        # Al retomar una copia no se aplica todavía: las cargas iniciales de
+        # los rollups verían solo los meses ya copiados
+        if renombrada or not pendiente:
+            cursor.execute(ddl)
+    if pendiente:
+        completar_migracion()
+        # Re-aplicar para que las cargas iniciales vean los datos migrados
+        with get_db_cursor(statement='ensure_schema') as cursor:
+            cursor.execute(ddl)
 
 def init_db():
     """Verificar conexión a la base de datos"""
     try:
-        with get_db_cursor() as cursor:
+        with get_db_cursor(statement='init_db') as cursor:
             cursor.execute("SELECT 1")
             print("✅ Conexión a base de datos establecida")
     except Exception as e:
         print(f"❌ Error conectando a la base de datos: {e}")
-        raise e
\ No newline at end of file
+        raise e
@@ -0,0 +1,97 @@
+"""Versión de ingesta: contador persistido que avanza cada vez que el ETL
+termina un ciclo de recolección con escrituras.
+
+Vive en la tabla ``ingesta_version`` (una sola fila), de modo que todos los
+procesos (API y ETL) y los reinicios comparten el mismo valor. Las cachés de
+resultados derivados (p.ej. interpolaciones del heatmap) y las teselas en
+disco la incluyen en su validez, y la API deriva de ella ``ETag`` y
+``Last-Modified`` (ver ``api.conditional``).
+
+La API no consulta la tabla en cada petición: el último valor leído se
+reutiliza durante ``INGEST_VERSION_TTL`` segundos. Si el ciclo corre en el
+mismo proceso, ``bump_ingest_generation`` actualiza ese valor al instante.
+"""
+import os
+import threading
+import time
+
+from database.db_manager import get_db_cursor
+
+# Segundos que se reutiliza la versión leída antes de volver a consultarla
+INGEST_VERSION_TTL = float(os.getenv('INGEST_VERSION_TTL', '5'))
+# Intervalo entre descargas de pronósticos y lista de estaciones
+INGEST_INTERVAL_MINUTES = int(os.getenv('ETL_INTERVAL_MINUTES', '10'))
+# Cada cuánto corre el ciclo del ETL; las estaciones se sondean según su cadencia
+INGEST_POLL_SECONDS = int(os.getenv('ETL_POLL_SECONDS', '60'))
+
+_lock = threading.Lock()
+_version = None
+_updated_at = None
+_checked = float('-inf')
+
+
+def _refresh():
+    """Releer la versión si el valor en memoria venció.
+
+    Mientras un hilo consulta, los demás siguen con el valor anterior. Solo
+    se espera en la primera lectura del proceso; si ya hubo un intento (aunque
+    fallara, p.ej. BD caída o tabla aún no creada) nadie se bloquea: se
+    responde con lo conocido, aunque sea ``None``, y se reintenta tras otro TTL.
+    """
+    global _version, _updated_at, _checked
+    if time.monotonic() - _checked < INGEST_VERSION_TTL:
+        return
+    primera = _version is None and _checked == float('-inf')
+    if not _lock.acquire(blocking=primera):
+        return
+    try:
+        if time.monotonic() - _checked < INGEST_VERSION_TTL:
+            return
+        try:
+            with get_db_cursor(statement='ingesta_version') as cursor:
+                cursor.execute("SELECT version, updated_at FROM ingesta_version WHERE id = 1")
+                row = cursor.fetchone()
+            if row is not None:
+                _version, _updated_at = row['version'], row['updated_at']
+        except Exception:
+            pass  # sin base de datos o tabla aún no creada: se mantiene lo conocido
+        _checked = time.monotonic()
+    finally:
+        _lock.release()
+
+
+def get_ingest_state():
+    """``(versión, updated_at)`` de la ingesta actual, o ``(None, None)`` si se desconoce."""
+    _refresh()
+    return _version, _updated_at
+
+
+def get_ingest_generation():
+    """Generación actual de ingesta (0 si aún no se conoce)."""
+    _refresh()
+    return _version or 0
+
+
+def bump_ingest_generation():
+    """Avanzar la versión persistida (llamado al finalizar ``collect_all_data``
+    si el ciclo escribió datos). Retorna la nueva versión."""
+    global _version, _updated_at, _checked
+    with get_db_cursor(statement='incrementar_ingesta') as cursor:
+        cursor.execute("""
+            INSERT INTO ingesta_version (id, version, updated_at)
+            VALUES (1, 1, CURRENT_TIMESTAMP)
+            ON CONFLICT (id) DO UPDATE SET
+                version = ingesta_version.version + 1,
+                updated_at = EXCLUDED.updated_at
+            RETURNING version, updated_at
+        """)
+        row = cursor.fetchone()
+    with _lock:
+        _version, _updated_at = row['version'], row['updated_at']
+        _checked = time.monotonic()
+    return _version
+
+
+def get_ingest_version():
+    """Identificador de la ingesta actual para nombrar artefactos (p.ej. teselas)."""
+    return str(get_ingest_generation())
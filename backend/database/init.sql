@@ -16,11 +16,13 @@ CREATE TABLE IF NOT EXISTS estaciones (
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Mediciones particionadas por mes en fecha_medicion (ver database/partitions.py).
+-- La PK y las claves únicas deben incluir la columna de partición.
 CREATE TABLE IF NOT EXISTS mediciones (
-    id SERIAL PRIMARY KEY,
+    id BIGSERIAL,
     estacion_codigo INTEGER REFERENCES estaciones(codigo),
     date_timestamp BIGINT NOT NULL,
-    fecha_medicion TIMESTAMP,
+    fecha_medicion TIMESTAMP NOT NULL,
     t DECIMAL(6, 3),
     h DECIMAL(6, 3),
     p DECIMAL(8, 3),
@@ -30,8 +32,60 @@ CREATE TABLE IF NOT EXISTS mediciones (
     p1h DECIMAL(8, 5),
     p24h DECIMAL(8, 5),
     is_valid BOOLEAN DEFAULT true,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-);
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, fecha_medicion)
+) PARTITION BY RANGE (fecha_medicion);
+
+-- Recibe las filas de meses sin partición (p.ej. fechas fuera de la ventana
+-- creada por adelantado) en vez de rechazar el lote; crear_particiones_mediciones
+-- las mueve a su partición mensual
+CREATE TABLE IF NOT EXISTS mediciones_default PARTITION OF mediciones DEFAULT;
+
+-- Crea (si faltan) las particiones mensuales mediciones_YYYY_MM desde el mes de `desde`.
+-- Si mediciones_default tiene filas del mes, se crea la tabla suelta, se mueven
+-- las filas y luego se adjunta (crearla directamente fallaría)
+CREATE OR REPLACE FUNCTION crear_particiones_mediciones(desde DATE, meses INTEGER)
+RETURNS INTEGER AS $$
+DECLARE
+    inicio DATE := date_trunc('month', desde)::date;
+    fin DATE;
+    nombre TEXT;
+    creadas INTEGER := 0;
+BEGIN
+    FOR i IN 1..meses LOOP
+        fin := (inicio + INTERVAL '1 month')::date;
+        nombre := 'mediciones_' || to_char(inicio, 'YYYY_MM');
+        IF to_regclass(nombre) IS NULL THEN
+            IF EXISTS (SELECT 1 FROM mediciones_default WHERE fecha_medicion >= inicio AND fecha_medicion < fin) THEN
+                EXECUTE format('CREATE TABLE %I (LIKE mediciones INCLUDING DEFAULTS)', nombre);
+                EXECUTE format(
+                    'WITH movidas AS (
+                         DELETE FROM mediciones_default WHERE fecha_medicion >= %L AND fecha_medicion < %L
+                         RETURNING *
+                     )
+                     INSERT INTO %I SELECT * FROM movidas',
+                    inicio, fin, nombre
+                );
+                EXECUTE format(
+                    'ALTER TABLE mediciones ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                    nombre, inicio, fin
+                );
+            ELSE
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF mediciones FOR VALUES FROM (%L) TO (%L)',
+                    nombre, inicio, fin
+                );
+            END IF;
+            creadas := creadas + 1;
+        END IF;
+        inicio := fin;
+    END LOOP;
+    RETURN creadas;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Mes anterior, actual y los tres siguientes (el scheduler mantiene la ventana hacia adelante)
+SELECT crear_particiones_mediciones((CURRENT_DATE - INTERVAL '1 month')::date, 5);
 
 CREATE TABLE IF NOT EXISTS pronosticos (
     id SERIAL PRIMARY KEY,
@@ -47,12 +101,185 @@ CREATE TABLE IF NOT EXISTS pronosticos (
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Última medición por estación (mantenida por la ingesta; sirve /stations/all-data
+-- y /stations/<id>/data sin recorrer mediciones)
+CREATE TABLE IF NOT EXISTS ultimas_mediciones (
+    estacion_codigo INTEGER PRIMARY KEY REFERENCES estaciones(codigo),
+    date_timestamp BIGINT NOT NULL,
+    fecha_medicion TIMESTAMP,
+    t DECIMAL(6, 3),
+    h DECIMAL(6, 3),
+    p DECIMAL(8, 3),
+    ws DECIMAL(6, 3),
+    wd DECIMAL(6, 3),
+    p10m DECIMAL(8, 5),
+    p1h DECIMAL(8, 5),
+    p24h DECIMAL(8, 5),
+    is_valid BOOLEAN DEFAULT true,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Carga inicial desde mediciones existentes (solo si la tabla está vacía)
+INSERT INTO ultimas_mediciones (
+    estacion_codigo, date_timestamp, fecha_medicion,
+    t, h, p, ws, wd, p10m, p1h, p24h, is_valid
+)
+SELECT DISTINCT ON (estacion_codigo)
+    estacion_codigo, date_timestamp, fecha_medicion,
+    t, h, p, ws, wd, p10m, p1h, p24h, is_valid
+FROM mediciones
+WHERE estacion_codigo IS NOT NULL
+  AND NOT EXISTS (SELECT 1 FROM ultimas_mediciones)
+ORDER BY estacion_codigo, date_timestamp DESC
+ON CONFLICT (estacion_codigo) DO NOTHING;
+
+-- Rollups horarios y diarios por estación y parámetro (ver database/rollups.py)
+CREATE TABLE IF NOT EXISTS mediciones_hora (
+    estacion_codigo INTEGER NOT NULL REFERENCES estaciones(codigo),
+    parametro VARCHAR(8) NOT NULL,
+    bucket TIMESTAMP NOT NULL,
+    n INTEGER NOT NULL,
+    suma DOUBLE PRECISION NOT NULL,
+    minimo DOUBLE PRECISION NOT NULL,
+    maximo DOUBLE PRECISION NOT NULL,
+    suma_cuadrados DOUBLE PRECISION NOT NULL,
+    PRIMARY KEY (parametro, bucket, estacion_codigo)
+);
+
+CREATE TABLE IF NOT EXISTS mediciones_dia (
+    estacion_codigo INTEGER NOT NULL REFERENCES estaciones(codigo),
+    parametro VARCHAR(8) NOT NULL,
+    bucket TIMESTAMP NOT NULL,
+    n INTEGER NOT NULL,
+    suma DOUBLE PRECISION NOT NULL,
+    minimo DOUBLE PRECISION NOT NULL,
+    maximo DOUBLE PRECISION NOT NULL,
+    suma_cuadrados DOUBLE PRECISION NOT NULL,
+    PRIMARY KEY (parametro, bucket, estacion_codigo)
+);
+
+-- Carga inicial de rollups desde mediciones existentes (solo si están vacíos)
+INSERT INTO mediciones_hora (
+    estacion_codigo, parametro, bucket, n, suma, minimo, maximo, suma_cuadrados
+)
+SELECT m.estacion_codigo, v.parametro, date_trunc('hour', m.fecha_medicion),
+       COUNT(*), SUM(v.valor), MIN(v.valor), MAX(v.valor), SUM(v.valor * v.valor)
+FROM mediciones m
+CROSS JOIN LATERAL (VALUES
+    ('t', m.t::float8), ('h', m.h::float8), ('p', m.p::float8), ('ws', m.ws::float8),
+    ('wd', m.wd::float8), ('p10m', m.p10m::float8), ('p1h', m.p1h::float8), ('p24h', m.p24h::float8)
+) AS v(parametro, valor)
+WHERE m.estacion_codigo IS NOT NULL
+  AND m.fecha_medicion IS NOT NULL
+  AND v.valor IS NOT NULL
+  AND NOT EXISTS (SELECT 1 FROM mediciones_hora)
+GROUP BY 1, 2, 3;
+
+INSERT INTO mediciones_dia (
+    estacion_codigo, parametro, bucket, n, suma, minimo, maximo, suma_cuadrados
+)
+SELECT estacion_codigo, parametro, date_trunc('day', bucket),
+       SUM(n), SUM(suma), MIN(minimo), MAX(maximo), SUM(suma_cuadrados)
+FROM mediciones_hora
+WHERE NOT EXISTS (SELECT 1 FROM mediciones_dia)
+GROUP BY 1, 2, 3;
+
+-- Estado del sondeo adaptativo por estación (ver etl/polling.py): cadencia
+-- aprendida (EWMA de segundos entre date_timestamp), fallos consecutivos para
+-- el backoff y próxima descarga
+CREATE TABLE IF NOT EXISTS sondeo_estaciones (
+    estacion_codigo INTEGER PRIMARY KEY REFERENCES estaciones(codigo),
+    cadencia_s REAL,
+    ultimo_timestamp BIGINT,
+    fallos INTEGER NOT NULL DEFAULT 0,
+    ultimo_resultado VARCHAR(20),
+    proximo_sondeo TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_sondeo_proximo ON sondeo_estaciones(proximo_sondeo);
+
+-- Carga inicial: cadencia = mediana de los intervalos de los últimos 2 días (solo si la tabla está vacía)
+INSERT INTO sondeo_estaciones (estacion_codigo, cadencia_s, ultimo_timestamp)
+SELECT estacion_codigo,
+       percentile_cont(0.5) WITHIN GROUP (ORDER BY intervalo),
+       MAX(date_timestamp)
+FROM (
+    SELECT estacion_codigo, date_timestamp,
+           date_timestamp - LAG(date_timestamp) OVER (PARTITION BY estacion_codigo ORDER BY date_timestamp) AS intervalo
+    FROM mediciones
+    WHERE fecha_medicion >= CURRENT_TIMESTAMP - INTERVAL '2 days'
+      AND NOT EXISTS (SELECT 1 FROM sondeo_estaciones)
+) x
+WHERE intervalo > 0
+GROUP BY estacion_codigo
+ON CONFLICT (estacion_codigo) DO NOTHING;
+
+-- Versión de ingesta (una sola fila): el ETL la incrementa al terminar cada ciclo
+-- con escrituras y la API deriva de ella ETag/Last-Modified (ver database/ingest.py)
+CREATE TABLE IF NOT EXISTS ingesta_version (
+    id SMALLINT PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+    version BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+INSERT INTO ingesta_version (id) VALUES (1) ON CONFLICT (id) DO NOTHING;
+
+-- Bitácora de ciclos del ETL (ver etl/runs.py): una fila por ciclo con sus
+-- conteos; `resumen` guarda etapas, colas y descargas del ciclo
+CREATE TABLE IF NOT EXISTS etl_runs (
+    id BIGSERIAL PRIMARY KEY,
+    inicio TIMESTAMPTZ NOT NULL,
+    duracion_s REAL NOT NULL,
+    plazo_s REAL,
+    vencido BOOLEAN NOT NULL DEFAULT false,
+    abortado BOOLEAN NOT NULL DEFAULT false,
+    catalogo BOOLEAN NOT NULL DEFAULT false,
+    estaciones INTEGER,
+    estaciones_sondeadas INTEGER,
+    estaciones_omitidas INTEGER,
+    activas INTEGER,
+    antiguas INTEGER,
+    inactivas INTEGER,
+    sin_cambios INTEGER,
+    errores_descarga INTEGER,
+    mediciones_guardadas INTEGER,
+    escrituras INTEGER,
+    errores TEXT[],
+    resumen JSONB
+);
+CREATE INDEX IF NOT EXISTS idx_etl_runs_inicio ON etl_runs(inicio);
+
+-- Resultado y latencia de descarga de cada estación sondeada en cada ciclo
+CREATE TABLE IF NOT EXISTS etl_run_estaciones (
+    run_id BIGINT NOT NULL REFERENCES etl_runs(id) ON DELETE CASCADE,
+    estacion_codigo INTEGER NOT NULL,
+    resultado VARCHAR(20) NOT NULL,
+    latencia_ms REAL,
+    PRIMARY KEY (run_id, estacion_codigo)
+);
+CREATE INDEX IF NOT EXISTS idx_etl_run_estaciones_estacion ON etl_run_estaciones(estacion_codigo, run_id);
+
 -- Índices para optimización
 CREATE INDEX IF NOT EXISTS idx_mediciones_estacion_fecha ON mediciones(estacion_codigo, fecha_medicion);
 CREATE INDEX IF NOT EXISTS idx_mediciones_fecha ON mediciones(fecha_medicion);
-CREATE INDEX IF NOT EXISTS idx_pronosticos_zona_fecha ON pronosticos(zona, fecha);
 CREATE INDEX IF NOT EXISTS idx_estaciones_activa ON estaciones(activa);
 
+-- Clave única de mediciones (ingesta idempotente con ON CONFLICT). Incluye
+-- fecha_medicion por el particionado; se deriva de date_timestamp, así que la
+-- unicidad efectiva sigue siendo (estacion_codigo, date_timestamp).
+CREATE UNIQUE INDEX IF NOT EXISTS uq_mediciones_estacion_timestamp ON mediciones(estacion_codigo, date_timestamp, fecha_medicion);
+
+-- Clave única de pronósticos (upsert por zona y fecha); reemplaza al índice simple previo.
+DELETE FROM pronosticos a
+USING pronosticos b
+WHERE a.zona = b.zona
+  AND a.fecha = b.fecha
+  AND a.id < b.id
+  AND NOT EXISTS (
+      SELECT 1 FROM pg_indexes WHERE indexname = 'uq_pronosticos_zona_fecha'
+  );
+CREATE UNIQUE INDEX IF NOT EXISTS uq_pronosticos_zona_fecha ON pronosticos(zona, fecha);
+DROP INDEX IF EXISTS idx_pronosticos_zona_fecha;
+
 -- Insertar datos de prueba (opcional)
 INSERT INTO estaciones (codigo, nombre, latitud, longitud, ciudad, activa)
 VALUES (999, 'Estacion Test', 6.2442, -75.5812, 'Medellin', true)
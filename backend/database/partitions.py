@@ -0,0 +1,237 @@
+"""Particiones mensuales de ``mediciones``: creación, migración y retención.
+
+``mediciones`` está particionada por rango en ``fecha_medicion`` con una
+partición por mes (``mediciones_YYYY_MM``) y ``mediciones_default`` para
+las filas de meses sin partición. La función SQL
+``crear_particiones_mediciones`` (definida en init.sql) crea las que falten;
+el scheduler llama ``mantener_particiones`` a diario para asegurar los meses
+siguientes, mover las filas de ``mediciones_default`` a su mes y aplicar la
+retención: las particiones más antiguas que
+``MEDICIONES_RETENCION_MESES`` se exportan a ``<ARCHIVO_DIR>/mediciones_YYYY_MM.csv.gz``
+(COPY en CSV comprimido) y luego se separan y eliminan. Los rollups
+horarios/diarios no se tocan, así que las ventanas largas del heatmap siguen
+respondiendo con datos agregados.
+"""
+import gzip
+import os
+import re
+import shutil
+from datetime import date
+
+from .db_manager import get_db_cursor
+
+MEDICIONES_RETENCION_MESES = int(os.getenv('MEDICIONES_RETENCION_MESES', '24'))
+MESES_ADELANTE = int(os.getenv('MEDICIONES_PARTICIONES_ADELANTE', '3'))
+ARCHIVO_DIR = os.getenv(
+    'ARCHIVO_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'archive')
+)
+
+_NOMBRE_PARTICION = re.compile(r'^mediciones_(\d{4})_(\d{2})$')
+
+
+def _sumar_meses(d, meses):
+    total = d.year * 12 + (d.month - 1) + meses
+    return date(total // 12, total % 12 + 1, 1)
+
+
+def preparar_migracion(cursor):
+    """Si ``mediciones`` es una tabla no particionada (esquema anterior), la
+    renombra a ``mediciones_legacy`` junto con sus índices y secuencia para
+    que init.sql cree la versión particionada. Retorna True si renombró."""
+    cursor.execute("""
+        SELECT c.relkind FROM pg_class c
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE c.relname = 'mediciones' AND n.nspname = current_schema()
+    """)
+    fila = cursor.fetchone()
+    if fila is None or fila['relkind'] != 'r':
+        return False
+
+    cursor.execute("ALTER TABLE mediciones RENAME TO mediciones_legacy")
+    cursor.execute("ALTER INDEX IF EXISTS mediciones_pkey RENAME TO mediciones_legacy_pkey")
+    cursor.execute("DROP INDEX IF EXISTS uq_mediciones_estacion_timestamp")
+    cursor.execute("DROP INDEX IF EXISTS idx_mediciones_estacion_fecha")
+    cursor.execute("ALTER INDEX IF EXISTS idx_mediciones_fecha RENAME TO idx_mediciones_legacy_fecha")
+    cursor.execute("ALTER SEQUENCE IF EXISTS mediciones_id_seq RENAME TO mediciones_legacy_id_seq")
+    return True
+
+
+def migracion_pendiente(cursor):
+    """True si quedó una ``mediciones_legacy`` por copiar (migración interrumpida)."""
+    cursor.execute("SELECT to_regclass('mediciones_legacy') IS NOT NULL AS pendiente")
+    return cursor.fetchone()['pendiente']
+
+
+def completar_migracion():
+    """Copiar ``mediciones_legacy`` a la tabla particionada, un mes por
+    transacción, y eliminarla.
+
+    Cada mes se copia con ``ON CONFLICT DO NOTHING``: si la migración se
+    interrumpe, ``ensure_schema`` la retoma en el siguiente arranque sin
+    duplicar filas. Retorna las filas copiadas.
+    """
+    with get_db_cursor(statement='migracion_mediciones') as cursor:
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_mediciones_legacy_fecha ON mediciones_legacy(fecha_medicion)")
+        cursor.execute("""
+            SELECT date_trunc('month', fecha_medicion)::date AS mes, COUNT(*) AS filas
+            FROM mediciones_legacy
+            WHERE fecha_medicion IS NOT NULL
+            GROUP BY 1
+            ORDER BY 1
+        """)
+        meses = cursor.fetchall()
+
+    total = sum(m['filas'] for m in meses)
+    copiadas = 0
+    for i, fila in enumerate(meses, 1):
+        mes = fila['mes']
+        with get_db_cursor(statement='migracion_mediciones') as cursor:
+            cursor.execute("SELECT crear_particiones_mediciones(%s, 1)", (mes,))
+            cursor.execute("""
+                INSERT INTO mediciones (
+                    id, estacion_codigo, date_timestamp, fecha_medicion,
+                    t, h, p, ws, wd, p10m, p1h, p24h, is_valid, created_at
+                )
+                SELECT id, estacion_codigo, date_timestamp, fecha_medicion,
+                       t, h, p, ws, wd, p10m, p1h, p24h, is_valid, created_at
+                FROM mediciones_legacy
+                WHERE fecha_medicion >= %s AND fecha_medicion < %s
+                ORDER BY id
+                ON CONFLICT DO NOTHING
+            """, (mes, _sumar_meses(mes, 1)))
+        copiadas += fila['filas']
+        print(f"🚚 Migrando mediciones: {mes:%Y-%m} ({i}/{len(meses)} meses, {copiadas}/{total} filas)")
+
+    with get_db_cursor(statement='migracion_mediciones') as cursor:
+        cursor.execute("""
+            SELECT setval(pg_get_serial_sequence('mediciones', 'id'),
+                          GREATEST((SELECT COALESCE(MAX(id), 0) FROM mediciones), 1))
+        """)
+        cursor.execute("DROP TABLE mediciones_legacy")
+    return total
+
+
+def asegurar_particiones(meses_adelante=MESES_ADELANTE):
+    """Crear las particiones del mes actual y los ``meses_adelante`` siguientes."""
+    with get_db_cursor(statement='asegurar_particiones') as cursor:
+        cursor.execute(
+            "SELECT crear_particiones_mediciones(CURRENT_DATE, %s) AS creadas",
+            (meses_adelante + 1,)
+        )
+        return cursor.fetchone()['creadas']
+
+
+def vaciar_particion_default(continuar=None):
+    """Mover las filas de ``mediciones_default`` a sus particiones mensuales.
+
+    ``crear_particiones_mediciones`` crea cada mes faltante y le traslada sus
+    filas, un mes por transacción. Retorna los meses movidos.
+    """
+    with get_db_cursor(statement='vaciar_particion_default') as cursor:
+        cursor.execute("""
+            SELECT DISTINCT date_trunc('month', fecha_medicion)::date AS mes
+            FROM mediciones_default
+            ORDER BY mes
+        """)
+        meses = [fila['mes'] for fila in cursor.fetchall()]
+    movidos = []
+    for mes in meses:
+        if continuar is not None and not continuar():
+            break
+        with get_db_cursor(statement='vaciar_particion_default') as cursor:
+            cursor.execute("SELECT crear_particiones_mediciones(%s, 1)", (mes,))
+        movidos.append(mes)
+    return movidos
+
+
+def listar_particiones():
+    """Lista ``(nombre, primer_dia_del_mes)`` de las particiones de mediciones."""
+    with get_db_cursor(statement='listar_particiones') as cursor:
+        cursor.execute("""
+            SELECT c.relname AS nombre
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            JOIN pg_class p ON p.oid = i.inhparent
+            WHERE p.relname = 'mediciones'
+            ORDER BY c.relname
+        """)
+        filas = cursor.fetchall()
+    particiones = []
+    for fila in filas:
+        m = _NOMBRE_PARTICION.match(fila['nombre'])
+        if m:
+            particiones.append((fila['nombre'], date(int(m.group(1)), int(m.group(2)), 1)))
+    return particiones
+
+
+def archivar_particion(nombre, directorio=ARCHIVO_DIR, continuar=None):
+    """Exportar una partición a CSV gzip y luego separarla y eliminarla.
+
+    El archivo se escribe primero con sufijo ``.tmp`` y se renombra solo si
+    el COPY terminó; la partición se elimina después, en otra transacción.
+    Si ``continuar()`` retorna False antes del DETACH, la partición se deja
+    intacta y se retorna None. Retorna la ruta del archivo generado.
+    """
+    os.makedirs(directorio, exist_ok=True)
+    destino = os.path.join(directorio, f"{nombre}.csv.gz")
+    temporal = destino + '.tmp'
+
+    with get_db_cursor(statement='archivar_particion') as cursor:
+        with gzip.open(temporal, 'wb') as archivo:
+            cursor.copy_expert(
+                f'COPY (SELECT * FROM "{nombre}" ORDER BY fecha_medicion) TO STDOUT WITH CSV HEADER',
+                archivo
+            )
+    shutil.move(temporal, destino)
+
+    if continuar is not None and not continuar():
+        return None
+    with get_db_cursor(statement='archivar_particion') as cursor:
+        cursor.execute(f'ALTER TABLE mediciones DETACH PARTITION "{nombre}"')
+        cursor.execute(f'DROP TABLE "{nombre}"')
+    return destino
+
+
+def aplicar_retencion(retencion_meses=MEDICIONES_RETENCION_MESES, directorio=ARCHIVO_DIR, continuar=None):
+    """Archivar las particiones cuyo mes terminó hace más de ``retencion_meses``.
+
+    ``retencion_meses <= 0`` desactiva la retención. ``continuar`` (opcional)
+    se consulta antes de tocar cada partición; si retorna False se detiene.
+    Retorna las rutas archivadas.
+    """
+    if retencion_meses <= 0:
+        return []
+    limite = _sumar_meses(date.today().replace(day=1), -retencion_meses)
+    archivados = []
+    for nombre, mes in listar_particiones():
+        if mes < limite:
+            if continuar is not None and not continuar():
+                break
+            ruta = archivar_particion(nombre, directorio, continuar)
+            if ruta is None:
+                break
+            archivados.append(ruta)
+    return archivados
+
+
+def mantener_particiones(continuar=None):
+    """Tarea diaria: particiones futuras, vaciado de ``mediciones_default`` y
+    retención/archivo de las antiguas.
+
+    ``continuar`` se pasa a ``vaciar_particion_default`` y
+    ``aplicar_retencion`` (el scheduler usa
+    ``etl.leader.es_lider`` para no archivar sin el liderazgo).
+    """
+    try:
+        if continuar is not None and not continuar():
+            return
+        creadas = asegurar_particiones()
+        if creadas:
+            print(f"🗂️ Particiones de mediciones creadas: {creadas}")
+        for mes in vaciar_particion_default(continuar=continuar):
+            print(f"🗂️ Filas de mediciones_default movidas a mediciones_{mes:%Y_%m}")
+        for ruta in aplicar_retencion(continuar=continuar):
+            print(f"📦 Partición archivada en {ruta}")
+    except Exception as e:
+        print(f"❌ Error manteniendo particiones: {e}")
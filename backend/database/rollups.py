@@ -0,0 +1,336 @@
+"""Agregados horarios y diarios de mediciones (rollups).
+
+``mediciones_hora`` y ``mediciones_dia`` guardan, por estación, parámetro y
+bucket, el conteo, suma, mínimo, máximo y suma de cuadrados de los valores
+no nulos. Con esos cinco campos se puede reconstruir promedio, extremos y
+varianza de cualquier unión de buckets.
+
+El ETL llama ``actualizar_rollups`` tras cada inserción: se recalculan solo
+los buckets desde la hora de la medición más antigua del lote, por lo que
+el costo por ciclo es proporcional a las últimas horas y no al histórico.
+
+``planificar_ventana`` divide una ventana temporal en tramos que se
+responden con la fuente más gruesa posible (día > hora > crudo) y
+``consulta_agregada`` arma la consulta que los combina. ``consulta_serie``
+hace lo mismo para la serie temporal de una estación por buckets de 5
+minutos, hora o día, y ``consulta_cuadros`` para todas las estaciones por
+cuadros de una o más horas (animaciones del heatmap).
+"""
+from datetime import timedelta
+
+# Columnas de mediciones agregadas en los rollups
+PARAMETROS = ('t', 'h', 'p', 'ws', 'wd', 'p10m', 'p1h', 'p24h')
+
+_VALORES = ', '.join(f"('{p}', m.{p}::float8)" for p in PARAMETROS)
+
+_REFRESCAR_HORA = f"""
+    INSERT INTO mediciones_hora (
+        estacion_codigo, parametro, bucket, n, suma, minimo, maximo, suma_cuadrados
+    )
+    SELECT m.estacion_codigo, v.parametro, date_trunc('hour', m.fecha_medicion),
+           COUNT(*), SUM(v.valor), MIN(v.valor), MAX(v.valor), SUM(v.valor * v.valor)
+    FROM mediciones m
+    CROSS JOIN LATERAL (VALUES {_VALORES}) AS v(parametro, valor)
+    WHERE m.fecha_medicion >= date_trunc('hour', %s::timestamp)
+      AND m.estacion_codigo IS NOT NULL
+      AND v.valor IS NOT NULL
+    GROUP BY 1, 2, 3
+    ON CONFLICT (parametro, bucket, estacion_codigo) DO UPDATE SET
+        n = EXCLUDED.n,
+        suma = EXCLUDED.suma,
+        minimo = EXCLUDED.minimo,
+        maximo = EXCLUDED.maximo,
+        suma_cuadrados = EXCLUDED.suma_cuadrados
+"""
+
+_REFRESCAR_DIA = """
+    INSERT INTO mediciones_dia (
+        estacion_codigo, parametro, bucket, n, suma, minimo, maximo, suma_cuadrados
+    )
+    SELECT estacion_codigo, parametro, date_trunc('day', bucket),
+           SUM(n), SUM(suma), MIN(minimo), MAX(maximo), SUM(suma_cuadrados)
+    FROM mediciones_hora
+    WHERE bucket >= date_trunc('day', %s::timestamp)
+    GROUP BY 1, 2, 3
+    ON CONFLICT (parametro, bucket, estacion_codigo) DO UPDATE SET
+        n = EXCLUDED.n,
+        suma = EXCLUDED.suma,
+        minimo = EXCLUDED.minimo,
+        maximo = EXCLUDED.maximo,
+        suma_cuadrados = EXCLUDED.suma_cuadrados
+"""
+
+
+def actualizar_rollups(cursor, desde):
+    """Recalcular buckets horarios y diarios a partir de ``desde`` (UTC naive)."""
+    if desde is None:
+        return
+    cursor.execute(_REFRESCAR_HORA, (desde,))
+    cursor.execute(_REFRESCAR_DIA, (desde,))
+
+
+def _piso_hora(t):
+    return t.replace(minute=0, second=0, microsecond=0)
+
+
+def _techo_hora(t):
+    piso = _piso_hora(t)
+    return piso if piso == t else piso + timedelta(hours=1)
+
+
+def _piso_dia(t):
+    return t.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _techo_dia(t):
+    piso = _piso_dia(t)
+    return piso if piso == t else piso + timedelta(days=1)
+
+
+def planificar_ventana(desde, hasta):
+    """Dividir ``[desde, hasta)`` en tramos ``(fuente, inicio, fin)``.
+
+    ``fuente`` es ``'dia'``, ``'hora'`` o ``'crudo'``; ``None`` en ``desde``
+    o ``hasta`` significa ventana abierta. Los días completos se responden
+    con ``mediciones_dia``, las horas completas restantes con
+    ``mediciones_hora`` y solo los bordes no alineados con ``mediciones``.
+    """
+    if desde is not None and hasta is not None and desde >= hasta:
+        return []
+
+    tramos = []
+
+    def agregar(fuente, inicio, fin):
+        if inicio is None or fin is None or inicio < fin:
+            tramos.append((fuente, inicio, fin))
+
+    # Borde inicial no alineado a la hora
+    inicio = desde
+    if desde is not None:
+        h0 = _techo_hora(desde)
+        if hasta is not None and h0 >= hasta:
+            agregar('crudo', desde, hasta)
+            return tramos
+        agregar('crudo', desde, h0)
+        inicio = h0
+
+    # Borde final no alineado a la hora
+    fin = None if hasta is None else _piso_hora(hasta)
+    if inicio is not None and fin is not None and _techo_dia(inicio) >= fin:
+        agregar('hora', inicio, fin)
+    else:
+        d0 = None if inicio is None else _techo_dia(inicio)
+        d1 = None if fin is None else _piso_dia(fin)
+        if inicio is not None:
+            agregar('hora', inicio, d0)
+        agregar('dia', d0, d1)
+        if fin is not None:
+            agregar('hora', d1, fin)
+
+    if hasta is not None:
+        agregar('crudo', fin, hasta)
+    return tramos
+
+
+def _filtro(columna, inicio, fin, params):
+    condiciones = []
+    if inicio is not None:
+        condiciones.append(f"{columna} >= %s")
+        params.append(inicio)
+    if fin is not None:
+        condiciones.append(f"{columna} < %s")
+        params.append(fin)
+    return condiciones
+
+
+def consulta_agregada(parametro, desde, hasta, excluir=()):
+    """SQL + params con los agregados por estación de ``parametro`` en la ventana.
+
+    Devuelve filas ``(estacion_codigo, n, suma, minimo, maximo,
+    suma_cuadrados)`` combinando rollups y mediciones crudas según
+    ``planificar_ventana``. ``excluir`` son códigos de estación a omitir.
+    """
+    if parametro not in PARAMETROS:
+        raise ValueError(f"Parámetro no agregado: {parametro}")
+
+    partes = []
+    params = []
+    for fuente, inicio, fin in planificar_ventana(desde, hasta):
+        if fuente == 'crudo':
+            condiciones = [f"m.{parametro} IS NOT NULL", "m.estacion_codigo IS NOT NULL"]
+            condiciones += _filtro('m.fecha_medicion', inicio, fin, params)
+            partes.append(f"""
+                SELECT m.estacion_codigo, COUNT(*) AS n, SUM(m.{parametro}::float8) AS suma,
+                       MIN(m.{parametro}::float8) AS minimo, MAX(m.{parametro}::float8) AS maximo,
+                       SUM(m.{parametro}::float8 * m.{parametro}::float8) AS suma_cuadrados
+                FROM mediciones m
+                WHERE {' AND '.join(condiciones)}
+                GROUP BY m.estacion_codigo
+            """)
+        else:
+            tabla = 'mediciones_dia' if fuente == 'dia' else 'mediciones_hora'
+            params.append(parametro)
+            condiciones = ["parametro = %s"] + _filtro('bucket', inicio, fin, params)
+            partes.append(f"""
+                SELECT estacion_codigo, SUM(n) AS n, SUM(suma) AS suma,
+                       MIN(minimo) AS minimo, MAX(maximo) AS maximo,
+                       SUM(suma_cuadrados) AS suma_cuadrados
+                FROM {tabla}
+                WHERE {' AND '.join(condiciones)}
+                GROUP BY estacion_codigo
+            """)
+
+    if not partes:
+        partes.append("""
+            SELECT NULL::integer AS estacion_codigo, 0::bigint AS n, NULL::float8 AS suma,
+                   NULL::float8 AS minimo, NULL::float8 AS maximo, NULL::float8 AS suma_cuadrados
+            WHERE false
+        """)
+
+    exclusion = ''
+    if excluir:
+        exclusion = 'WHERE estacion_codigo <> ALL(%s)'
+        params.append(list(excluir))
+
+    sql = f"""
+        SELECT estacion_codigo, SUM(n) AS n, SUM(suma) AS suma,
+               MIN(minimo) AS minimo, MAX(maximo) AS maximo,
+               SUM(suma_cuadrados) AS suma_cuadrados
+        FROM ({' UNION ALL '.join(partes)}) tramos
+        {exclusion}
+        GROUP BY estacion_codigo
+    """
+    return sql, params
+
+
+# Resoluciones de ``consulta_serie``: tamaño del bucket
+RESOLUCIONES = {
+    '5m': timedelta(minutes=5),
+    '1h': timedelta(hours=1),
+    '1d': timedelta(days=1),
+}
+
+_BUCKET_CRUDO = {
+    '5m': "date_trunc('hour', m.fecha_medicion) + FLOOR(EXTRACT(MINUTE FROM m.fecha_medicion) / 5) * INTERVAL '5 minutes'",
+    '1h': "date_trunc('hour', m.fecha_medicion)",
+    '1d': "date_trunc('day', m.fecha_medicion)",
+}
+
+
+def consulta_serie(estacion, parametros, resolucion, desde, hasta):
+    """SQL + params de la serie de ``estacion`` agregada por ``resolucion``.
+
+    Devuelve filas ``(bucket, parametro, n, suma, minimo, maximo)`` ordenadas
+    por bucket. Con ``1h`` y ``1d`` los tramos completos salen de los rollups
+    y solo los bordes de ``mediciones``; ``5m`` siempre lee las crudas.
+    """
+    if resolucion not in RESOLUCIONES:
+        raise ValueError(f"Resolución no soportada: {resolucion}")
+    parametros = [p for p in parametros if p in PARAMETROS]
+    if not parametros:
+        raise ValueError("Sin parámetros agregables")
+
+    if resolucion == '5m':
+        tramos = [('crudo', desde, hasta)] if desde is None or hasta is None or desde < hasta else []
+    else:
+        tramos = planificar_ventana(desde, hasta)
+
+    valores = ', '.join(f"('{p}', m.{p}::float8)" for p in parametros)
+    partes = []
+    params = []
+    for fuente, inicio, fin in tramos:
+        if fuente == 'crudo':
+            params.append(estacion)
+            condiciones = ["m.estacion_codigo = %s", "v.valor IS NOT NULL"]
+            condiciones += _filtro('m.fecha_medicion', inicio, fin, params)
+            partes.append(f"""
+                SELECT {_BUCKET_CRUDO[resolucion]} AS bucket, v.parametro,
+                       COUNT(*) AS n, SUM(v.valor) AS suma, MIN(v.valor) AS minimo, MAX(v.valor) AS maximo
+                FROM mediciones m
+                CROSS JOIN LATERAL (VALUES {valores}) AS v(parametro, valor)
+                WHERE {' AND '.join(condiciones)}
+                GROUP BY 1, 2
+            """)
+        else:
+            # Con resolución horaria los tramos diarios también salen de mediciones_hora
+            tabla = 'mediciones_dia' if fuente == 'dia' and resolucion == '1d' else 'mediciones_hora'
+            bucket = "date_trunc('day', bucket)" if resolucion == '1d' else 'bucket'
+            params.extend([estacion, list(parametros)])
+            condiciones = ["estacion_codigo = %s", "parametro = ANY(%s)"]
+            condiciones += _filtro('bucket', inicio, fin, params)
+            partes.append(f"""
+                SELECT {bucket} AS bucket, parametro, SUM(n) AS n, SUM(suma) AS suma,
+                       MIN(minimo) AS minimo, MAX(maximo) AS maximo
+                FROM {tabla}
+                WHERE {' AND '.join(condiciones)}
+                GROUP BY 1, 2
+            """)
+
+    if not partes:
+        partes.append("""
+            SELECT NULL::timestamp AS bucket, NULL::varchar AS parametro, 0::bigint AS n,
+                   NULL::float8 AS suma, NULL::float8 AS minimo, NULL::float8 AS maximo
+            WHERE false
+        """)
+
+    sql = f"""
+        SELECT bucket, parametro, SUM(n)::bigint AS n, SUM(suma) AS suma,
+               MIN(minimo) AS minimo, MAX(maximo) AS maximo
+        FROM ({' UNION ALL '.join(partes)}) tramos
+        GROUP BY bucket, parametro
+        ORDER BY bucket
+    """
+    return sql, params
+
+
+def consulta_cuadros(parametro, desde, paso, cuadros, excluir=()):
+    """SQL + params con los agregados por estación y cuadro de ``parametro``.
+
+    Los cuadros cubren ``[desde, desde + cuadros * paso)``; devuelve filas
+    ``(estacion_codigo, cuadro, n, suma, minimo, maximo)``. ``paso`` debe ser
+    múltiplo de una hora y ``desde`` una hora exacta, así cada bucket cae en
+    un solo cuadro y toda la ventana sale de los rollups: ``mediciones_dia``
+    si el paso es de días enteros, ``mediciones_hora`` en otro caso.
+    """
+    if parametro not in PARAMETROS:
+        raise ValueError(f"Parámetro no agregado: {parametro}")
+    if paso % timedelta(hours=1) or paso <= timedelta(0) or _piso_hora(desde) != desde:
+        raise ValueError("El paso debe ser múltiplo de una hora y el inicio una hora exacta")
+
+    por_dias = not paso % timedelta(days=1) and _piso_dia(desde) == desde
+    segundos = paso.total_seconds()
+    partes = []
+    params = []
+    for fuente, inicio, fin in planificar_ventana(desde, desde + paso * cuadros):
+        tabla = 'mediciones_dia' if fuente == 'dia' and por_dias else 'mediciones_hora'
+        params.extend([desde, segundos, parametro])
+        condiciones = ["parametro = %s"] + _filtro('bucket', inicio, fin, params)
+        partes.append(f"""
+            SELECT estacion_codigo,
+                   FLOOR(EXTRACT(EPOCH FROM (bucket - %s::timestamp)) / %s)::int AS cuadro,
+                   SUM(n) AS n, SUM(suma) AS suma, MIN(minimo) AS minimo, MAX(maximo) AS maximo
+            FROM {tabla}
+            WHERE {' AND '.join(condiciones)}
+            GROUP BY 1, 2
+        """)
+
+    if not partes:
+        partes.append("""
+            SELECT NULL::integer AS estacion_codigo, NULL::integer AS cuadro, 0::bigint AS n,
+                   NULL::float8 AS suma, NULL::float8 AS minimo, NULL::float8 AS maximo
+            WHERE false
+        """)
+
+    exclusion = ''
+    if excluir:
+        exclusion = 'WHERE estacion_codigo <> ALL(%s)'
+        params.append(list(excluir))
+
+    sql = f"""
+        SELECT estacion_codigo, cuadro, SUM(n) AS n, SUM(suma) AS suma,
+               MIN(minimo) AS minimo, MAX(maximo) AS maximo
+        FROM ({' UNION ALL '.join(partes)}) tramos
+        {exclusion}
+        GROUP BY estacion_codigo, cuadro
+    """
+    return sql, params
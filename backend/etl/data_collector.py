@@ -1,164 +1,122 @@
 import requests
-import json
+import logging
+import os
+import random
+import psycopg2.extras
 from datetime import datetime, timedelta, timezone
 from database.db_manager import get_db_cursor
-
-# URLs SIATA
-WRF_BASE_URL = "https://siata.gov.co/data/siata_app/"
-ESTACIONES_URL = "https://siata.gov.co/data/siata_app/PluviometricaMeteo.json"
-
-WRF_ZONES = [
-    'sabaneta', 'palmitas', 'medOriente', 'medOccidente',
-    'medCentro', 'laestrella', 'itagui', 'girardota',
-    'envigado', 'copacabana', 'caldas', 'bello', 'barbosa'
-]
+from database.rollups import actualizar_rollups
+from .siata_collector import NOT_MODIFIED, get_siata_client
 
 # Zona horaria de Colombia (UTC-5)
 COLOMBIA_TZ = timezone(timedelta(hours=-5))
 
-def collect_all_data():
-    """Recolectar todos los datos: pronósticos, estaciones y mediciones"""
-    print(f"🔄 Iniciando recolección de datos - Hora servidor: {datetime.now()}")
-    print(f"🌍 Hora Colombia: {datetime.now(tz=COLOMBIA_TZ)}")
-    collect_wrf_forecasts()
-    collect_estaciones()
-    collect_mediciones()
-    print("✅ Recolección completa")
-
-def collect_wrf_forecasts():
-    """Recolectar pronósticos WRF de todas las zonas"""
-    print("🌦️ Recolectando pronósticos WRF...")
-
-    for zona in WRF_ZONES:
-        try:
-            url = f"{WRF_BASE_URL}wrf{zona}.json"
-            print(f"  📡 Descargando {zona}...")
-
-            response = requests.get(url, timeout=30)
-            response.raise_for_status()
-
-            data = response.json()
-            print(f"  📊 Datos {zona}: date={data.get('date')}, pronósticos={len(data.get('pronostico', []))}")
-            save_wrf_forecast(zona, data)
-
-        except requests.RequestException as e:
-            print(f"  ❌ Error descargando {zona}: {e}")
-        except json.JSONDecodeError as e:
-            print(f"  ❌ Error JSON en {zona}: {e}")
-        except Exception as e:
-            print(f"  ❌ Error procesando {zona}: {e}")
-
-def collect_estaciones():
-    """Recolectar información de estaciones activas"""
-    print("🏢 Recolectando estaciones...")
-
-    try:
-        response = requests.get(ESTACIONES_URL, timeout=30)
-        response.raise_for_status()
-
-        data = response.json()
-        estaciones = data.get('estaciones', [])
-
-        print(f"  📡 Encontradas {len(estaciones)} estaciones en la red {data.get('red', 'N/A')}")
-
-        contador = 0
-        with get_db_cursor() as cursor:
-            for estacion in estaciones:
-                cursor.execute("""
-                    INSERT INTO estaciones (
-                        codigo, nombre, latitud, longitud, ciudad,
-                        comuna, subcuenca, barrio, valor, red, activa
-                    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                    ON CONFLICT (codigo) DO UPDATE SET
-                        nombre = EXCLUDED.nombre,
-                        latitud = EXCLUDED.latitud,
-                        longitud = EXCLUDED.longitud,
-                        ciudad = EXCLUDED.ciudad,
-                        comuna = EXCLUDED.comuna,
-                        subcuenca = EXCLUDED.subcuenca,
-                        barrio = EXCLUDED.barrio,
-                        valor = EXCLUDED.valor,
-                        red = EXCLUDED.red,
-                        activa = true,
-                        updated_at = CURRENT_TIMESTAMP
-                """, (
-                    estacion.get('codigo'),
-                    estacion.get('nombre', ''),
-                    estacion.get('latitud'),
-                    estacion.get('longitud'),
-                    estacion.get('ciudad', ''),
-                    estacion.get('comuna', ''),
-                    estacion.get('subcuenca', ''),
-                    estacion.get('barrio', ''),
-                    estacion.get('valor', 0),
-                    data.get('red', 'meteo'),
-                    True
-                ))
-                contador += 1
-
-        print(f"  ✅ Guardadas {contador} estaciones")
-
-    except Exception as e:
-        print(f"  ❌ Error recolectando estaciones: {e}")
-
-def collect_mediciones():
-    """Recolectar mediciones de todas las estaciones activas"""
-    print("📊 Recolectando mediciones...")
+# Log por estación (logger "etl.estaciones"): nivel mínimo y fracción de los
+# mensajes bajo WARNING que se emiten; advertencias y errores salen siempre
+ETL_STATION_LOG_LEVEL = os.getenv('ETL_STATION_LOG_LEVEL', 'INFO').upper()
+ETL_STATION_LOG_SAMPLE = float(os.getenv('ETL_STATION_LOG_SAMPLE', '0.05'))
+
+_log_estaciones = logging.getLogger('etl.estaciones')
+_log_estaciones.setLevel(ETL_STATION_LOG_LEVEL)
+
+
+def _log_estacion(nivel, mensaje, *args):
+    """Log por estación filtrado por nivel y muestreado bajo WARNING.
+
+    Corre una vez por estación y ciclo: el mensaje solo se formatea si se emite.
+    """
+    if not _log_estaciones.isEnabledFor(nivel):
+        return
+    if nivel < logging.WARNING and random.random() >= ETL_STATION_LOG_SAMPLE:
+        return
+    _log_estaciones.log(nivel, mensaje, *args)
+
+def save_estaciones(data):
+    """Upsert de la lista de estaciones (JSON ``PluviometricaMeteo``).
+
+    Las estaciones nuevas entran como activas; en las existentes ``activa``
+    no se toca (lo mantiene ``etl.polling`` según sus mediciones).
+    Retorna el número de estaciones guardadas.
+    """
+    estaciones = data.get('estaciones', [])
+    contador = 0
+    with get_db_cursor(statement='guardar_estaciones') as cursor:
+        for estacion in estaciones:
+            cursor.execute("""
+                INSERT INTO estaciones (
+                    codigo, nombre, latitud, longitud, ciudad,
+                    comuna, subcuenca, barrio, valor, red, activa
+                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                ON CONFLICT (codigo) DO UPDATE SET
+                    nombre = EXCLUDED.nombre,
+                    latitud = EXCLUDED.latitud,
+                    longitud = EXCLUDED.longitud,
+                    ciudad = EXCLUDED.ciudad,
+                    comuna = EXCLUDED.comuna,
+                    subcuenca = EXCLUDED.subcuenca,
+                    barrio = EXCLUDED.barrio,
+                    valor = EXCLUDED.valor,
+                    red = EXCLUDED.red,
+                    updated_at = CURRENT_TIMESTAMP
+            """, (
+                estacion.get('codigo'),
+                estacion.get('nombre', ''),
+                estacion.get('latitud'),
+                estacion.get('longitud'),
+                estacion.get('ciudad', ''),
+                estacion.get('comuna', ''),
+                estacion.get('subcuenca', ''),
+                estacion.get('barrio', ''),
+                estacion.get('valor', 0),
+                data.get('red', 'meteo'),
+                True
+            ))
+            contador += 1
+    return contador
 
+def clean_value(value):
+    """Limpiar valores centinela -999 (y outliers < -900) a None"""
     try:
-        with get_db_cursor() as cursor:
-            cursor.execute("SELECT codigo FROM estaciones WHERE activa = true")
-            estaciones = cursor.fetchall()
-
-            print(f"  📡 Procesando {len(estaciones)} estaciones...")
-
-            estaciones_activas = 0
-            estaciones_antiguas = 0
-            estaciones_inactivas = 0
-            mediciones_guardadas = 0
-
-            for i, estacion in enumerate(estaciones):
-                codigo = estacion['codigo']
-                if i % 10 == 0:  # Log cada 10 estaciones
-                    print(f"  🔄 Progreso: {i}/{len(estaciones)} estaciones procesadas")
-
-                resultado = collect_medicion_estacion(codigo)
-                if resultado == 'activa':
-                    estaciones_activas += 1
-                    mediciones_guardadas += 1
-                elif resultado == 'antigua':
-                    estaciones_antiguas += 1
-                elif resultado == 'inactiva':
-                    estaciones_inactivas += 1
-
-            print(f"  📈 Resumen mediciones:")
-            print(f"    ✅ Estaciones activas: {estaciones_activas}")
-            print(f"    ⚠️ Estaciones con datos antiguos: {estaciones_antiguas}")
-            print(f"    🗑️ Estaciones inactivas: {estaciones_inactivas}")
-            print(f"    💾 Mediciones guardadas: {mediciones_guardadas}")
-
-    except Exception as e:
-        print(f"  ❌ Error recolectando mediciones: {e}")
-
-def collect_medicion_estacion(codigo_estacion):
-    """Recolectar medición de una estación específica"""
+        val = float(value)
+        return None if val == -999 or val < -900 else val
+    except (ValueError, TypeError):
+        return None
+
+def clasificar_descarga(codigo_estacion, data, error):
+    """Resultado de la descarga de una estación como ``(resultado, registro)``.
+
+    Agrega a ``collect_medicion_estacion`` los casos de error de descarga y
+    de recurso sin cambios (``NOT_MODIFIED``).
+    """
+    if error is not None:
+        return ('error_conexion' if isinstance(error, requests.RequestException) else 'error'), None
+    if data is NOT_MODIFIED:
+        return 'sin_cambios', None
+    return collect_medicion_estacion(codigo_estacion, data)
+
+def collect_medicion_estacion(codigo_estacion, data=None):
+    """Clasificar y limpiar la medición de una estación específica.
+
+    ``data`` es el JSON ya descargado por el pipeline (``etl.pipeline``); si
+    no se entrega se descarga con el cliente compartido.
+
+    Retorna ``(resultado, registro)``: ``registro`` es la tupla lista para
+    ``save_mediciones`` cuando la estación está activa, o ``None``.
+    """
     try:
-        url = f"{WRF_BASE_URL}{codigo_estacion}.json"
-
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-
-        data = response.json()
+        if data is None:
+            client = get_siata_client()
+            data = client.fetch_json(client.station_url(codigo_estacion))
 
         # Obtener y convertir timestamp
-        date_raw = data.get('date', '0').strip()
-        
+        date_raw = str(data.get('date', '0')).strip()
+
         try:
             # Convertir a float primero, luego a int
             date_timestamp = int(float(date_raw))
         except (ValueError, TypeError):
-            print(f"    ⚠️ Timestamp inválido para estación {codigo_estacion}: {date_raw}")
-            return 'error'
+            _log_estacion(logging.WARNING, "⚠️ Timestamp inválido para estación %s: %s", codigo_estacion, date_raw)
+            return 'error', None
 
         # El timestamp viene en UTC, convertir a hora Colombia sumando 5 horas
         fecha_medicion_utc = datetime.fromtimestamp(date_timestamp, tz=timezone.utc)
@@ -168,150 +126,207 @@ def collect_medicion_estacion(codigo_estacion):
         # Calcular diferencia en horas
         diferencia_horas = (now_colombia.replace(tzinfo=None) - fecha_medicion_colombia.replace(tzinfo=None)).total_seconds() / 3600
 
-        print(f"    📅 Estación {codigo_estacion}:")
-        print(f"        🕐 Medición Colombia: {fecha_medicion_colombia}")
-        print(f"        🕐 Ahora Colombia: {now_colombia}")
-        print(f"        ⏱️ Diferencia: {diferencia_horas:.2f} horas")
+        _log_estacion(logging.DEBUG, "📅 Estación %s: medición %s, ahora %s, diferencia %.2f horas",
+                      codigo_estacion, fecha_medicion_colombia, now_colombia, diferencia_horas)
 
         # Filtrar datos muy antiguos (más de 24 horas)
         if diferencia_horas > 24:
-            print(f"    🗑️ Estación {codigo_estacion} inactiva: {diferencia_horas:.1f} horas sin datos")
-            return 'inactiva'
+            _log_estacion(logging.INFO, "🗑️ Estación %s inactiva: %.1f horas sin datos", codigo_estacion, diferencia_horas)
+            return 'inactiva', None
 
         # Filtrar datos antiguos (más de 2 horas)
         if diferencia_horas > 2:
-            print(f"    ⚠️ Datos antiguos para estación {codigo_estacion}: {diferencia_horas:.2f} horas")
-            return 'antigua'
-
-        print(f"    ✅ Estación {codigo_estacion} activa: {diferencia_horas:.2f} horas")
-
-        # Limpiar valores -999
-        def clean_value(value):
-            try:
-                val = float(value)
-                return None if val == -999 or val < -900 else val
-            except (ValueError, TypeError):
-                return None
-
-        datos_limpios = {
-            't': clean_value(data.get('t')),
-            'h': clean_value(data.get('h')),
-            'p': clean_value(data.get('p')),
-            'ws': clean_value(data.get('ws')),
-            'wd': clean_value(data.get('wd')),
-            'p10m': clean_value(data.get('p10m')),
-            'p1h': clean_value(data.get('p1h')),
-            'p24h': clean_value(data.get('p24h'))
-        }
-
-        with get_db_cursor() as cursor:
-            # Verificar si ya existe esta medición
-            cursor.execute("""
-                SELECT id FROM mediciones
-                WHERE estacion_codigo = %s AND date_timestamp = %s
-            """, (codigo_estacion, date_timestamp))
-
-            existing = cursor.fetchone()
-            if existing:
-                print(f"    🔄 Medición ya existe para estación {codigo_estacion}")
-                return 'existente'
-
-            # Insertar nueva medición (convertir a UTC naive para PostgreSQL)
-            fecha_utc_naive = fecha_medicion_utc.replace(tzinfo=None)
-            
-            cursor.execute("""
-                INSERT INTO mediciones (
-                    estacion_codigo, date_timestamp, fecha_medicion,
-                    t, h, p, ws, wd, p10m, p1h, p24h, is_valid
-                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """, (
-                codigo_estacion,
-                date_timestamp,
-                fecha_utc_naive,  # Guardar en UTC naive
-                datos_limpios['t'],
-                datos_limpios['h'],
-                datos_limpios['p'],
-                datos_limpios['ws'],
-                datos_limpios['wd'],
-                datos_limpios['p10m'],
-                datos_limpios['p1h'],
-                datos_limpios['p24h'],
-                True
-            ))
-            print(f"    💾 Guardada medición para estación {codigo_estacion}")
-            return 'activa'
+            _log_estacion(logging.INFO, "⚠️ Datos antiguos para estación %s: %.2f horas", codigo_estacion, diferencia_horas)
+            return 'antigua', None
+
+        _log_estacion(logging.DEBUG, "✅ Estación %s activa: %.2f horas", codigo_estacion, diferencia_horas)
+
+        # Convertir a UTC naive para PostgreSQL
+        fecha_utc_naive = fecha_medicion_utc.replace(tzinfo=None)
+
+        registro = (
+            codigo_estacion,
+            date_timestamp,
+            fecha_utc_naive,  # Guardar en UTC naive
+            clean_value(data.get('t')),
+            clean_value(data.get('h')),
+            clean_value(data.get('p')),
+            clean_value(data.get('ws')),
+            clean_value(data.get('wd')),
+            clean_value(data.get('p10m')),
+            clean_value(data.get('p1h')),
+            clean_value(data.get('p24h')),
+            True
+        )
+        return 'activa', registro
 
     except requests.RequestException:
         # Silenciar errores de estaciones no disponibles
-        return 'error_conexion'
+        return 'error_conexion', None
     except Exception as e:
-        print(f"    ❌ Error en estación {codigo_estacion}: {e}")
-        return 'error'
+        _log_estacion(logging.WARNING, "❌ Error en estación %s: %s", codigo_estacion, e)
+        return 'error', None
+
+def save_mediciones(registros):
+    """Guardar un lote de mediciones con un único INSERT ... ON CONFLICT.
+
+    La clave única ``(estacion_codigo, date_timestamp)`` hace la inserción
+    idempotente: las mediciones ya existentes se ignoran sin consulta previa.
+    En la misma transacción se actualizan los rollups horarios/diarios y
+    ``ultimas_mediciones`` (solo para las estaciones cuya lectura es más
+    reciente que la almacenada).
+    Retorna el número de filas realmente insertadas.
+    """
+    if not registros:
+        return 0
+
+    with get_db_cursor(statement='guardar_mediciones') as cursor:
+        insertadas = psycopg2.extras.execute_values(cursor, """
+            INSERT INTO mediciones (
+                estacion_codigo, date_timestamp, fecha_medicion,
+                t, h, p, ws, wd, p10m, p1h, p24h, is_valid
+            ) VALUES %s
+            ON CONFLICT (estacion_codigo, date_timestamp, fecha_medicion) DO NOTHING
+            RETURNING fecha_medicion
+        """, registros, page_size=len(registros), fetch=True)
+
+        # Rollups horarios/diarios desde la medición nueva más antigua
+        if insertadas:
+            actualizar_rollups(cursor, min(r['fecha_medicion'] for r in insertadas))
+
+        # Una fila por estación (la más reciente) para el upsert de últimas
+        ultimas = {}
+        for registro in registros:
+            actual = ultimas.get(registro[0])
+            if actual is None or registro[1] > actual[1]:
+                ultimas[registro[0]] = registro
+
+        psycopg2.extras.execute_values(cursor, """
+            INSERT INTO ultimas_mediciones (
+                estacion_codigo, date_timestamp, fecha_medicion,
+                t, h, p, ws, wd, p10m, p1h, p24h, is_valid
+            ) VALUES %s
+            ON CONFLICT (estacion_codigo) DO UPDATE SET
+                date_timestamp = EXCLUDED.date_timestamp,
+                fecha_medicion = EXCLUDED.fecha_medicion,
+                t = EXCLUDED.t,
+                h = EXCLUDED.h,
+                p = EXCLUDED.p,
+                ws = EXCLUDED.ws,
+                wd = EXCLUDED.wd,
+                p10m = EXCLUDED.p10m,
+                p1h = EXCLUDED.p1h,
+                p24h = EXCLUDED.p24h,
+                is_valid = EXCLUDED.is_valid,
+                updated_at = CURRENT_TIMESTAMP
+            WHERE ultimas_mediciones.date_timestamp < EXCLUDED.date_timestamp
+        """, list(ultimas.values()), page_size=len(ultimas))
+
+    return len(insertadas)
 
 def save_wrf_forecast(zona, data):
-    """Guardar pronóstico WRF en la base de datos"""
-    try:
-        with get_db_cursor() as cursor:
-            date_update = data.get('date', '')
-            pronosticos = data.get('pronostico', [])
-
-            print(f"  💾 Guardando {len(pronosticos)} pronósticos para {zona}")
-
-            guardados = 0
-            actualizados = 0
+    """Guardar pronóstico WRF de una zona en la base de datos"""
+    return save_wrf_forecasts({zona: data})
+
+def _forecast_rows(zona, data):
+    """Convertir el JSON WRF de una zona en filas para ``pronosticos``.
+
+    Si la misma fecha aparece repetida se conserva la última ocurrencia
+    (un ON CONFLICT DO UPDATE no puede tocar la misma fila dos veces).
+    """
+    date_update = data.get('date', '')
+    filas = {}
+    for pronostico in data.get('pronostico', []):
+        fecha = pronostico.get('fecha')
+        filas[fecha] = (
+            zona,
+            date_update,
+            fecha,
+            int(pronostico.get('temperatura_maxima', 0)),
+            int(pronostico.get('temperatura_minima', 0)),
+            pronostico.get('lluvia_madrugada', ''),
+            pronostico.get('lluvia_mannana', ''),
+            pronostico.get('lluvia_tarde', ''),
+            pronostico.get('lluvia_noche', '')
+        )
+    return list(filas.values())
+
+def save_wrf_forecasts(pronosticos_por_zona):
+    """Guardar pronósticos WRF de varias zonas con un único upsert.
+
+    ``pronosticos_por_zona`` mapea zona -> JSON WRF. Una zona se omite sin
+    escribir si todas sus fechas entrantes ya están guardadas con el mismo
+    ``date_update`` que trae el JSON (se comparan las filas ``(zona, fecha)``
+    afectadas, no un máximo sobre el texto). El resto se inserta/actualiza en
+    una sola sentencia contra la clave única ``(zona, fecha)``; los conteos de
+    nuevos y actualizados salen del propio ``RETURNING`` (``xmax = 0`` solo
+    en filas insertadas).
+
+    Retorna dict zona -> {'nuevos': n, 'actualizados': n} (o None si se omitió).
+    """
+    if not pronosticos_por_zona:
+        return {}
+
+    por_zona = {}
+    for zona, data in pronosticos_por_zona.items():
+        try:
+            por_zona[zona] = _forecast_rows(zona, data)
+        except (ValueError, TypeError) as e:
+            print(f"  ❌ Error procesando {zona}: {e}")
 
-            for pronostico in pronosticos:
+    try:
+        with get_db_cursor(statement='guardar_pronosticos') as cursor:
+            claves = [(fila[0], fila[2]) for filas_zona in por_zona.values() for fila in filas_zona]
+            almacenados = {}
+            if claves:
                 cursor.execute("""
-                    SELECT id FROM pronosticos
-                    WHERE zona = %s AND fecha = %s
-                """, (zona, pronostico.get('fecha')))
-
-                existing = cursor.fetchone()
-
-                if existing:
-                    cursor.execute("""
-                        UPDATE pronosticos SET
-                            date_update = %s,
-                            temperatura_maxima = %s,
-                            temperatura_minima = %s,
-                            lluvia_madrugada = %s,
-                            lluvia_mannana = %s,
-                            lluvia_tarde = %s,
-                            lluvia_noche = %s
-                        WHERE id = %s
-                    """, (
-                        date_update,
-                        int(pronostico.get('temperatura_maxima', 0)),
-                        int(pronostico.get('temperatura_minima', 0)),
-                        pronostico.get('lluvia_madrugada', ''),
-                        pronostico.get('lluvia_mannana', ''),
-                        pronostico.get('lluvia_tarde', ''),
-                        pronostico.get('lluvia_noche', ''),
-                        existing['id']
-                    ))
-                    actualizados += 1
-                else:
-                    cursor.execute("""
-                        INSERT INTO pronosticos (
-                            zona, date_update, fecha, temperatura_maxima,
-                            temperatura_minima, lluvia_madrugada, lluvia_mannana,
-                            lluvia_tarde, lluvia_noche
-                        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-                    """, (
-                        zona,
-                        date_update,
-                        pronostico.get('fecha'),
-                        int(pronostico.get('temperatura_maxima', 0)),
-                        int(pronostico.get('temperatura_minima', 0)),
-                        pronostico.get('lluvia_madrugada', ''),
-                        pronostico.get('lluvia_mannana', ''),
-                        pronostico.get('lluvia_tarde', ''),
-                        pronostico.get('lluvia_noche', '')
-                    ))
-                    guardados += 1
-
-        print(f"  ✅ {zona}: {guardados} nuevos, {actualizados} actualizados")
+                    SELECT p.zona, p.fecha, p.date_update
+                    FROM pronosticos p
+                    JOIN unnest(%s::text[], %s::text[]) AS k(zona, fecha)
+                      ON p.zona = k.zona AND p.fecha = k.fecha
+                """, ([z for z, _ in claves], [f for _, f in claves]))
+                almacenados = {(r['zona'], r['fecha']): r['date_update'] for r in cursor.fetchall()}
+
+            resultado = {}
+            filas = []
+            for zona, filas_zona in por_zona.items():
+                date_update = pronosticos_por_zona[zona].get('date', '')
+                if date_update and filas_zona and all(
+                        almacenados.get((zona, fila[2])) == date_update for fila in filas_zona):
+                    print(f"  ⏭️ {zona}: sin cambios (date={date_update})")
+                    resultado[zona] = None
+                    continue
+                print(f"  💾 Guardando {len(filas_zona)} pronósticos para {zona}")
+                resultado[zona] = {'nuevos': 0, 'actualizados': 0}
+                filas.extend(filas_zona)
+
+            if filas:
+                retornadas = psycopg2.extras.execute_values(cursor, """
+                    INSERT INTO pronosticos (
+                        zona, date_update, fecha, temperatura_maxima,
+                        temperatura_minima, lluvia_madrugada, lluvia_mannana,
+                        lluvia_tarde, lluvia_noche
+                    ) VALUES %s
+                    ON CONFLICT (zona, fecha) DO UPDATE SET
+                        date_update = EXCLUDED.date_update,
+                        temperatura_maxima = EXCLUDED.temperatura_maxima,
+                        temperatura_minima = EXCLUDED.temperatura_minima,
+                        lluvia_madrugada = EXCLUDED.lluvia_madrugada,
+                        lluvia_mannana = EXCLUDED.lluvia_mannana,
+                        lluvia_tarde = EXCLUDED.lluvia_tarde,
+                        lluvia_noche = EXCLUDED.lluvia_noche
+                    RETURNING zona, (xmax = 0) AS insertado
+                """, filas, page_size=len(filas), fetch=True)
+
+                for r in retornadas:
+                    clave = 'nuevos' if r['insertado'] else 'actualizados'
+                    resultado[r['zona']][clave] += 1
+
+        for zona, conteo in resultado.items():
+            if conteo is not None:
+                print(f"  ✅ {zona}: {conteo['nuevos']} nuevos, {conteo['actualizados']} actualizados")
+        return resultado
 
     except Exception as e:
-        print(f"  ❌ Error guardando {zona}: {e}")
-        raise e
\ No newline at end of file
+        print(f"  ❌ Error guardando pronósticos: {e}")
+        raise e
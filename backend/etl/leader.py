@@ -0,0 +1,148 @@
+"""Elección de líder del ETL con un advisory lock de PostgreSQL.
+
+Solo un proceso en todo el despliegue (workers de la API, réplicas o el
+worker dedicado ``python -m etl.worker``) debe recolectar datos. Cada
+candidato intenta ``pg_try_advisory_lock`` en una conexión propia, fuera
+del pool; quien lo obtiene corre el scheduler mientras esa conexión siga
+viva. Si el proceso muere o pierde la conexión, PostgreSQL libera el lock y
+otro candidato lo toma en el siguiente reintento.
+
+Como el lock puede perderse en medio de un ciclo, las escrituras del ETL
+y las tareas de retención consultan ``es_lider()`` antes de cada lote: un
+proceso que ya no es líder deja de escribir aunque su ciclo siga en curso.
+``es_lider()`` reutiliza la última verificación de la conexión durante
+``ETL_LEADER_CHECK_TTL`` segundos; entre verificaciones, los keepalives de
+la conexión y ``closed`` detectan su caída.
+"""
+import os
+import threading
+import time
+
+import psycopg2
+
+from database.db_manager import DB_CONNECT_TIMEOUT
+
+# Clave del advisory lock ('SIATA' en ASCII); cambiarla separa despliegues que comparten BD
+ETL_LEADER_LOCK_KEY = int(os.getenv('ETL_LEADER_LOCK_KEY', str(0x5349415441)))
+# Segundos entre intentos de tomar el lock y entre verificaciones del líder
+ETL_LEADER_RETRY_SECONDS = float(os.getenv('ETL_LEADER_RETRY_SECONDS', '15'))
+# Segundos durante los que es_lider() reutiliza la última verificación (SELECT 1) del lock
+ETL_LEADER_CHECK_TTL = float(os.getenv('ETL_LEADER_CHECK_TTL', '5'))
+
+
+# Lock del proceso mientras compite por el liderazgo (None: sin elección, p.ej. scripts)
+_lock_actual = None
+
+
+def es_lider():
+    """True si este proceso puede escribir: tiene el lock de líder vivo, o no
+    participa en la elección (``run_cycle`` llamado directamente)."""
+    lock = _lock_actual
+    return lock is None or lock.is_held(max_age=ETL_LEADER_CHECK_TTL)
+
+
+class LeaderLock:
+    """Advisory lock de sesión sobre una conexión dedicada."""
+
+    def __init__(self, key=ETL_LEADER_LOCK_KEY, dsn=None):
+        self.key = key
+        self.dsn = dsn or os.getenv('DATABASE_URL')
+        self._conn = None
+        self._verificado = float('-inf')  # time.monotonic() de la última verificación exitosa
+        self._check_lock = threading.Lock()
+
+    def _connect(self):
+        if self._conn is None or self._conn.closed:
+            # keepalives: detectar pronto una conexión caída (y con ella el lock)
+            self._conn = psycopg2.connect(self.dsn, connect_timeout=DB_CONNECT_TIMEOUT,
+                                          keepalives=1, keepalives_idle=30,
+                                          keepalives_interval=10, keepalives_count=3)
+            self._conn.autocommit = True
+        return self._conn
+
+    def acquire(self):
+        """Intentar tomar el lock sin esperar. Retorna True si este proceso es líder."""
+        with self._connect().cursor() as cursor:
+            cursor.execute("SELECT pg_try_advisory_lock(%s)", (self.key,))
+            tomado = cursor.fetchone()[0]
+        if tomado:
+            self._verificado = time.monotonic()
+        return tomado
+
+    def is_held(self, max_age=0):
+        """True mientras la conexión que tiene el lock siga viva.
+
+        Con ``max_age`` se reutiliza una verificación exitosa de hace menos de
+        ``max_age`` segundos (solo se revisa ``closed``); si no, se consulta
+        la conexión. Las verificaciones se serializan: la conexión es única.
+        """
+        conn = self._conn
+        if conn is None or conn.closed:
+            return False
+        with self._check_lock:
+            if max_age and time.monotonic() - self._verificado < max_age:
+                return True
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT 1")
+            except psycopg2.Error:
+                return False
+            self._verificado = time.monotonic()
+            return True
+
+    def release(self):
+        """Soltar el lock cerrando la conexión (libera todos los locks de la sesión)."""
+        if self._conn is not None and not self._conn.closed:
+            try:
+                self._conn.close()
+            except psycopg2.Error:
+                pass
+        self._conn = None
+        self._verificado = float('-inf')
+
+
+def run_as_leader(start, stop, detener, lock=None):
+    """Esperar el liderazgo, correr ``start()`` y llamar ``stop()`` al perderlo.
+
+    Bloquea hasta que se active el evento ``detener``. Si el lock se pierde
+    o ``start()`` falla, se vuelve a competir por él. ``stop()`` debe esperar
+    a que termine el trabajo en curso: el lock se suelta después.
+    """
+    global _lock_actual
+    lock = lock or LeaderLock()
+    _lock_actual = lock
+    esperando = False
+    while not detener.is_set():
+        try:
+            lider = lock.acquire()
+        except psycopg2.Error as e:
+            print(f"⚠️ No se pudo consultar el lock de líder del ETL: {e}")
+            lock.release()
+            lider = False
+        if not lider:
+            if not esperando:
+                print(f"⏳ Otro proceso es líder del ETL; reintento cada {ETL_LEADER_RETRY_SECONDS:.0f}s")
+                esperando = True
+            detener.wait(ETL_LEADER_RETRY_SECONDS)
+            continue
+
+        esperando = False
+        print(f"👑 Liderazgo del ETL adquirido (pid {os.getpid()})")
+        fallo = False
+        try:
+            start()
+            while not detener.wait(ETL_LEADER_RETRY_SECONDS):
+                if not lock.is_held():
+                    print("⚠️ Liderazgo del ETL perdido: se detiene el scheduler")
+                    break
+        except Exception as e:
+            print(f"❌ Error iniciando el ETL como líder: {e}; reintento en {ETL_LEADER_RETRY_SECONDS:.0f}s")
+            fallo = True
+        finally:
+            try:
+                stop()
+            except Exception as e:
+                print(f"❌ Error deteniendo el scheduler: {e}")
+            lock.release()
+        if fallo:
+            detener.wait(ETL_LEADER_RETRY_SECONDS)
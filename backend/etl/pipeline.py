@@ -0,0 +1,530 @@
+"""Ciclo del ETL en etapas: descarga → limpieza → escritura.
+
+Cada etapa corre en su propio hilo y se comunica con la siguiente por una
+cola acotada (``ETL_QUEUE_SIZE``), así la red, el parseo y la base de datos
+trabajan a la vez y una etapa lenta frena a la anterior (backpressure) en
+lugar de acumular memoria:
+
+- **descarga**: pronósticos WRF y lista de estaciones en paralelo (solo
+  cada ``ETL_INTERVAL_MINUTES``); cuando la lista quedó escrita, las
+  mediciones de las estaciones con sondeo pendiente (``etl.polling``).
+  El ciclo corre cada ``ETL_POLL_SECONDS``.
+- **limpieza**: descarta recursos sin cambios o con error y clasifica/limpia
+  cada medición (``clasificar_descarga``).
+- **escritura**: upsert de estaciones, pronósticos al completar las zonas y
+  mediciones en lotes de ``ETL_WRITE_BATCH``.
+
+El ciclo tiene un plazo total (``ETL_CYCLE_DEADLINE``, por defecto 10 s
+menos que ``ETL_POLL_SECONDS`` para terminar antes del siguiente disparo):
+al vencer se dejan de iniciar descargas y lo ya descargado se termina de
+escribir. Un lock
+evita que dos ciclos se solapen en el mismo proceso, y antes de cada
+escritura se verifica que el proceso siga siendo el líder (``etl.leader``);
+si no, el ciclo se aborta sin escribir más. ``abortar_ciclo`` lo detiene
+desde fuera (al soltar el liderazgo). Al final se registra
+el resultado de cada estación descargada (cadencia, backoff y ``activa``).
+
+Cada ciclo registra por etapa los ítems, el tiempo ocupado y el tiempo en
+espera de las colas (vacía = etapa anterior lenta, llena = siguiente lenta),
+y por cola la profundidad máxima y promedio (``get_last_cycle_stats``). El
+resumen y el resultado/latencia de cada estación quedan en la bitácora
+``etl_runs`` (``etl.runs``).
+"""
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+import metrics
+from database.db_manager import get_db_cursor
+from database.ingest import INGEST_INTERVAL_MINUTES, INGEST_POLL_SECONDS, bump_ingest_generation
+from . import polling, runs
+from .leader import es_lider
+from .data_collector import (
+    COLOMBIA_TZ, clasificar_descarga, save_estaciones, save_mediciones, save_wrf_forecasts
+)
+from .siata_collector import NOT_MODIFIED, WRF_ZONES, get_siata_client
+
+ETL_QUEUE_SIZE = int(os.getenv('ETL_QUEUE_SIZE', '64'))
+ETL_WRITE_BATCH = int(os.getenv('ETL_WRITE_BATCH', '500'))
+# Plazo total del ciclo (s); por defecto 10 s menos que la cadencia del scheduler
+ETL_CYCLE_DEADLINE = float(os.getenv('ETL_CYCLE_DEADLINE', str(max(30, INGEST_POLL_SECONDS - 10))))
+
+# Marcadores en las colas
+_FIN = object()
+_FIN_CATALOGO = object()  # pronósticos y lista de estaciones ya emitidos
+
+_ciclo_lock = threading.Lock()
+_ultimo_ciclo = None
+_ultimo_catalogo = None  # time.monotonic() de la última descarga de pronósticos/estaciones
+_ciclo_actual = None
+
+
+class _Abortado(Exception):
+    """Otra etapa falló; la actual debe terminar."""
+
+
+class _SinLiderazgo(Exception):
+    """El proceso perdió el lock de líder: no se escribe más en este ciclo."""
+
+    def __init__(self):
+        super().__init__("liderazgo del ETL perdido")
+
+
+def _verificar_lider():
+    if not es_lider():
+        raise _SinLiderazgo()
+
+
+class _Etapa:
+    def __init__(self, nombre):
+        self.nombre = nombre
+        self.items = 0
+        self.ocupado = 0.0
+        self.espera = 0.0
+        self.inicio = None
+        self.fin = None
+
+    def resumen(self):
+        duracion = (self.fin or time.monotonic()) - (self.inicio or time.monotonic())
+        return {
+            'items': self.items,
+            'segundos': round(duracion, 3),
+            'ocupado_s': round(self.ocupado, 3),
+            'espera_s': round(self.espera, 3),
+            'items_por_s': round(self.items / self.ocupado, 1) if self.ocupado > 0 else None,
+        }
+
+
+class _Cola:
+    """``queue.Queue`` acotada que mide su profundidad y las esperas."""
+
+    def __init__(self, maxsize, abortar):
+        self._q = queue.Queue(maxsize)
+        self._abortar = abortar
+        self.maxsize = maxsize
+        self.max_profundidad = 0
+        self._suma_profundidad = 0
+        self._puts = 0
+
+    def put(self, item, etapa):
+        inicio = time.monotonic()
+        while True:
+            if self._abortar.is_set():
+                raise _Abortado()
+            try:
+                self._q.put(item, timeout=0.5)
+                break
+            except queue.Full:
+                continue
+        etapa.espera += time.monotonic() - inicio
+        profundidad = self._q.qsize()
+        self.max_profundidad = max(self.max_profundidad, profundidad)
+        self._suma_profundidad += profundidad
+        self._puts += 1
+
+    def get(self, etapa):
+        inicio = time.monotonic()
+        while True:
+            if self._abortar.is_set():
+                raise _Abortado()
+            try:
+                item = self._q.get(timeout=0.5)
+                break
+            except queue.Empty:
+                continue
+        etapa.espera += time.monotonic() - inicio
+        return item
+
+    def resumen(self):
+        return {
+            'capacidad': self.maxsize,
+            'max_profundidad': self.max_profundidad,
+            'profundidad_promedio': round(self._suma_profundidad / self._puts, 2) if self._puts else 0,
+        }
+
+
+class _Ciclo:
+    """Estado compartido por las etapas de un ciclo."""
+
+    def __init__(self, deadline, catalogo):
+        self.client = get_siata_client()
+        self.catalogo = catalogo
+        self.inicio = time.monotonic()
+        self.fecha_inicio = datetime.now(tz=COLOMBIA_TZ)
+        self.deadline = deadline
+        self.limite = self.inicio + deadline
+        self.abortar = threading.Event()
+        self.catalogo_listo = threading.Event()
+        self.catalogo_fallido = False
+        self.descargas = _Cola(ETL_QUEUE_SIZE, self.abortar)
+        self.registros = _Cola(ETL_QUEUE_SIZE, self.abortar)
+        self.etapas = {n: _Etapa(n) for n in ('descarga', 'limpieza', 'escritura')}
+        self.vencido = False
+        self.omitidas = 0
+        self.escrituras = 0
+        self.errores = []
+        self.mediciones = {'activa': 0, 'antigua': 0, 'inactiva': 0, 'sin_cambios': 0,
+                           'error_conexion': 0, 'error': 0}
+        self.mediciones_guardadas = 0
+        self.sondeos = []
+        self.latencias = {}
+        self.fallidas = set()
+        self.estaciones = 0
+        self.sondeadas = 0
+
+    def plazo_vencido(self):
+        if not self.vencido and time.monotonic() >= self.limite:
+            self.vencido = True
+            print(f"⏰ Plazo del ciclo ({self.deadline:.0f}s) vencido: no se inician más descargas")
+        return self.vencido
+
+
+# ---------------------------------------------------------------------------
+# Etapas
+# ---------------------------------------------------------------------------
+def _descargar(ciclo):
+    etapa = ciclo.etapas['descarga']
+    client = ciclo.client
+
+    if ciclo.catalogo:
+        urls = {('pronostico', zona): client.forecast_url(zona) for zona in WRF_ZONES}
+        urls[('estaciones', None)] = client.stations_url()
+        print(f"  📡 Descargando {len(WRF_ZONES)} zonas WRF y la lista de estaciones...")
+        emitidas = _emitir_descargas(ciclo, etapa, client.fetch_many(urls, timeout=30, conditional=True, timed=True))
+        if emitidas < len(urls):
+            ciclo.catalogo_fallido = True
+    ciclo.descargas.put(_FIN_CATALOGO, etapa)
+
+    # Las mediciones necesitan las estaciones nuevas ya escritas (clave foránea)
+    while not ciclo.catalogo_listo.wait(0.5):
+        if ciclo.abortar.is_set():
+            return
+        if ciclo.plazo_vencido():
+            break
+
+    codigos, ciclo.estaciones = polling.estaciones_a_sondear()
+    if ciclo.plazo_vencido():
+        ciclo.omitidas = len(codigos)
+        return
+    print(f"  📡 Descargando {len(codigos)} de {ciclo.estaciones} estaciones "
+          f"(paralelismo {client.max_workers})...")
+    urls = {('medicion', codigo): client.station_url(codigo) for codigo in codigos}
+    ciclo.sondeadas = _emitir_descargas(ciclo, etapa, client.fetch_many(urls, conditional=True, timed=True))
+    ciclo.omitidas = len(codigos) - ciclo.sondeadas
+
+
+def _emitir_descargas(ciclo, etapa, descargas):
+    emitidas = 0
+    marca = time.monotonic()
+    try:
+        for (tipo, clave), data, error, segundos in descargas:
+            etapa.ocupado += time.monotonic() - marca
+            etapa.items += 1
+            if tipo == 'medicion':
+                ciclo.latencias[clave] = segundos
+            ciclo.descargas.put((tipo, clave, data, error), etapa)
+            emitidas += 1
+            if ciclo.plazo_vencido():
+                break
+            marca = time.monotonic()
+    finally:
+        descargas.close()  # cancela las descargas pendientes
+    return emitidas
+
+
+def _limpiar(ciclo):
+    etapa = ciclo.etapas['limpieza']
+    while True:
+        item = ciclo.descargas.get(etapa)
+        if item is _FIN or item is _FIN_CATALOGO:
+            ciclo.registros.put(item, etapa)
+            if item is _FIN:
+                return
+            continue
+
+        marca = time.monotonic()
+        tipo, clave, data, error = item
+        salida = None
+        if tipo == 'medicion':
+            resultado, registro = clasificar_descarga(clave, data, error)
+            ciclo.mediciones[resultado] = ciclo.mediciones.get(resultado, 0) + 1
+            ciclo.sondeos.append((clave, resultado, registro[1] if registro is not None else None))
+            if registro is not None:
+                salida = ('medicion', clave, registro)
+            elif resultado in ('antigua', 'inactiva'):
+                # Procesada sin nada que escribir: no volver a clasificarla si no cambia
+                ciclo.client.confirm(ciclo.client.station_url(clave))
+        elif error is not None:
+            nombre = clave or 'lista de estaciones'
+            print(f"  ❌ Error descargando {nombre}: {error}")
+            ciclo.catalogo_fallido = True
+        elif data is NOT_MODIFIED:
+            print(f"  ⏭️ {clave or 'Lista de estaciones'}: sin cambios desde la última descarga")
+        elif tipo == 'pronostico':
+            print(f"  📊 Datos {clave}: date={data.get('date')}, pronósticos={len(data.get('pronostico', []))}")
+            salida = item[:3]
+        else:
+            print(f"  📡 Encontradas {len(data.get('estaciones', []))} estaciones en la red {data.get('red', 'N/A')}")
+            salida = item[:3]
+        etapa.items += 1
+        etapa.ocupado += time.monotonic() - marca
+        if salida is not None:
+            ciclo.registros.put(salida, etapa)
+
+
+def _escribir(ciclo):
+    etapa = ciclo.etapas['escritura']
+    client = ciclo.client
+    pronosticos = {}
+    mediciones = []
+
+    def guardar_pronosticos():
+        if not pronosticos:
+            return
+        if not es_lider():
+            client.forget(*(client.forecast_url(zona) for zona in pronosticos))
+            raise _SinLiderazgo()
+        try:
+            resultado = save_wrf_forecasts(pronosticos)
+            ciclo.escrituras += sum(c['nuevos'] + c['actualizados'] for c in resultado.values() if c is not None)
+            # Zonas que no se pudieron procesar quedan sin confirmar y se reintentan
+            client.confirm(*(client.forecast_url(zona) for zona in resultado))
+        except Exception as e:
+            # Ya reportado en save_wrf_forecasts; reintentar en el próximo ciclo
+            ciclo.errores.append(f"pronósticos: {e}")
+            ciclo.catalogo_fallido = True
+            client.forget(*(client.forecast_url(zona) for zona in pronosticos))
+        pronosticos.clear()
+
+    def guardar_mediciones():
+        if not mediciones:
+            return
+        if not es_lider():
+            client.forget(*(client.station_url(r[0]) for r in mediciones))
+            raise _SinLiderazgo()
+        try:
+            guardadas = save_mediciones(mediciones)
+            ciclo.mediciones_guardadas += guardadas
+            ciclo.escrituras += guardadas
+            client.confirm(*(client.station_url(r[0]) for r in mediciones))
+        except Exception as e:
+            print(f"  ❌ Error guardando {len(mediciones)} mediciones: {e}")
+            ciclo.errores.append(f"mediciones: {e}")
+            ciclo.fallidas.update(r[0] for r in mediciones)
+            client.forget(*(client.station_url(r[0]) for r in mediciones))
+        mediciones.clear()
+
+    while True:
+        item = ciclo.registros.get(etapa)
+        marca = time.monotonic()
+        if item is _FIN_CATALOGO or item is _FIN:
+            guardar_pronosticos()
+            ciclo.catalogo_listo.set()
+            if item is _FIN:
+                guardar_mediciones()
+                etapa.ocupado += time.monotonic() - marca
+                return
+        else:
+            tipo, clave, data = item
+            etapa.items += 1
+            if tipo == 'pronostico':
+                pronosticos[clave] = data
+            elif tipo == 'estaciones':
+                if not es_lider():
+                    client.forget(client.stations_url())
+                    raise _SinLiderazgo()
+                try:
+                    contador = save_estaciones(data)
+                    ciclo.escrituras += contador
+                    client.confirm(client.stations_url())
+                    print(f"  ✅ Guardadas {contador} estaciones")
+                except Exception as e:
+                    print(f"  ❌ Error guardando estaciones: {e}")
+                    ciclo.errores.append(f"estaciones: {e}")
+                    ciclo.catalogo_fallido = True
+                    client.forget(client.stations_url())
+            else:
+                mediciones.append(data)
+                if len(mediciones) >= ETL_WRITE_BATCH:
+                    guardar_mediciones()
+        etapa.ocupado += time.monotonic() - marca
+
+
+def _correr_etapa(ciclo, nombre, funcion, salida):
+    etapa = ciclo.etapas[nombre]
+    etapa.inicio = time.monotonic()
+    try:
+        funcion(ciclo)
+        if salida is not None:
+            salida.put(_FIN, etapa)
+    except _Abortado:
+        pass
+    except Exception as e:
+        print(f"  ❌ Error en la etapa de {nombre}: {e}")
+        ciclo.errores.append(f"{nombre}: {e}")
+        ciclo.abortar.set()
+    finally:
+        etapa.fin = time.monotonic()
+
+
+# ---------------------------------------------------------------------------
+# Ciclo
+# ---------------------------------------------------------------------------
+def _catalogo_pendiente():
+    return _ultimo_catalogo is None or time.monotonic() - _ultimo_catalogo >= INGEST_INTERVAL_MINUTES * 60
+
+
+def _sondeos(ciclo):
+    # Una lectura que no se pudo guardar cuenta como fallo: se reintenta pronto
+    return [(c, 'error', None) if c in ciclo.fallidas else (c, r, ts) for c, r, ts in ciclo.sondeos]
+
+
+def _registrar_sondeos(ciclo):
+    try:
+        _verificar_lider()
+        ciclo.escrituras += polling.registrar_sondeos(_sondeos(ciclo))
+    except Exception as e:
+        print(f"  ❌ Error registrando el sondeo de estaciones: {e}")
+        ciclo.errores.append(f"sondeo: {e}")
+
+
+def _registrar_ejecucion(ciclo, resumen):
+    """Guardar el ciclo en la bitácora; no cuenta como escritura de datos."""
+    estaciones = [(c, r, ciclo.latencias.get(c)) for c, r, _ in _sondeos(ciclo)]
+    try:
+        _verificar_lider()
+        return runs.guardar_ejecucion(resumen, estaciones)
+    except Exception as e:
+        print(f"  ❌ Error guardando la bitácora del ciclo: {e}")
+        return None
+
+
+def run_cycle(deadline=None, catalogo=None):
+    """Ejecutar un ciclo y retornar sus estadísticas.
+
+    ``catalogo`` fuerza (o evita) la descarga de pronósticos y lista de
+    estaciones; por defecto se hace si pasaron ``ETL_INTERVAL_MINUTES``
+    desde el último catálogo descargado y escrito sin errores (si falla, el
+    siguiente ciclo lo reintenta).
+    """
+    global _ultimo_catalogo, _ciclo_actual
+    if catalogo is None:
+        catalogo = _catalogo_pendiente()
+    ciclo = _Ciclo(ETL_CYCLE_DEADLINE if deadline is None else deadline, catalogo)
+    ciclo.client.reset_stats()
+    _ciclo_actual = ciclo
+    hilos = [
+        threading.Thread(target=_correr_etapa, name=f'etl-{nombre}', daemon=True,
+                         args=(ciclo, nombre, funcion, salida))
+        for nombre, funcion, salida in (
+            ('descarga', _descargar, ciclo.descargas),
+            ('limpieza', _limpiar, ciclo.registros),
+            ('escritura', _escribir, None),
+        )
+    ]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    _ciclo_actual = None
+    if catalogo and ciclo.catalogo_listo.is_set() and not ciclo.catalogo_fallido:
+        _ultimo_catalogo = time.monotonic()
+    _registrar_sondeos(ciclo)
+
+    resumen = {
+        'inicio': ciclo.fecha_inicio.isoformat(),
+        'duracion_s': round(time.monotonic() - ciclo.inicio, 3),
+        'plazo_s': ciclo.deadline,
+        'vencido': ciclo.vencido,
+        'abortado': ciclo.abortar.is_set(),
+        'catalogo': ciclo.catalogo,
+        'estaciones': ciclo.estaciones,
+        'estaciones_sondeadas': ciclo.sondeadas,
+        'estaciones_omitidas': ciclo.omitidas,
+        'escrituras': ciclo.escrituras,
+        'mediciones': dict(ciclo.mediciones, guardadas=ciclo.mediciones_guardadas),
+        'descargas': ciclo.client.stats(),
+        'etapas': {n: e.resumen() for n, e in ciclo.etapas.items()},
+        'colas': {'descargas': ciclo.descargas.resumen(), 'registros': ciclo.registros.resumen()},
+        'errores': ciclo.errores,
+    }
+    resumen['run_id'] = _registrar_ejecucion(ciclo, resumen)
+    return resumen
+
+
+def _imprimir_resumen(resumen):
+    m = resumen['mediciones']
+    print(f"  📈 Resumen mediciones ({resumen['estaciones_sondeadas']} de {resumen['estaciones']} estaciones sondeadas):")
+    print(f"    ✅ Estaciones activas: {m['activa']}")
+    print(f"    ⚠️ Estaciones con datos antiguos: {m['antigua']}")
+    print(f"    🗑️ Estaciones inactivas: {m['inactiva']}")
+    print(f"    ⏭️ Estaciones sin cambios: {m['sin_cambios']}")
+    print(f"    💾 Mediciones guardadas: {m['guardadas']} ({m['activa'] - m['guardadas']} ya existentes)")
+    if resumen['estaciones_omitidas']:
+        print(f"    ⏰ Estaciones sin descargar por el plazo: {resumen['estaciones_omitidas']}")
+    d = resumen['descargas']
+    print(f"📦 Descargas: {d['misses']} con cambios, {d['hits']} sin cambios "
+          f"({d['not_modified']} por 304, {d['same_digest']} por digest), "
+          f"{d['bytes_downloaded']} bytes descargados, {d['bytes_saved']} bytes ahorrados")
+    for nombre, e in resumen['etapas'].items():
+        print(f"⏱️ Etapa {nombre}: {e['items']} ítems en {e['segundos']}s "
+              f"(ocupado {e['ocupado_s']}s, espera {e['espera_s']}s, {e['items_por_s']} ítems/s)")
+    for nombre, c in resumen['colas'].items():
+        print(f"📥 Cola {nombre}: máx {c['max_profundidad']}/{c['capacidad']}, promedio {c['profundidad_promedio']}")
+
+
+def _registrar_metricas(resumen):
+    """Volcar el resumen del ciclo a las métricas de Prometheus."""
+    metrics.etl_cycle_duration.observe(resumen['duracion_s'])
+    for nombre, etapa in resumen['etapas'].items():
+        metrics.etl_stage_busy.inc(nombre, amount=etapa['ocupado_s'])
+        metrics.etl_stage_wait.inc(nombre, amount=etapa['espera_s'])
+        metrics.etl_stage_items.inc(nombre, amount=etapa['items'])
+    metrics.etl_writes.inc(amount=resumen['escrituras'])
+    metrics.etl_errors.inc(amount=len(resumen['errores']))
+    metrics.etl_last_cycle.set(time.time())
+
+
+def collect_all_data():
+    """Recolectar todos los datos: pronósticos, estaciones y mediciones.
+
+    Si ya hay un ciclo en curso en este proceso, este disparo se omite.
+    """
+    global _ultimo_ciclo
+    if not _ciclo_lock.acquire(blocking=False):
+        print("⏭️ Ciclo anterior aún en curso: se omite esta recolección")
+        return None
+    try:
+        print(f"🔄 Iniciando recolección de datos - Hora servidor: {datetime.now()}")
+        print(f"🌍 Hora Colombia: {datetime.now(tz=COLOMBIA_TZ)}")
+        resumen = run_cycle()
+        _imprimir_resumen(resumen)
+        _registrar_metricas(resumen)
+        # Nueva versión de ingesta solo si cambió algo: invalida cachés derivadas
+        # (interpolaciones, teselas) y los ETag de la API
+        if resumen['escrituras'] and es_lider():
+            try:
+                print(f"🔖 Versión de ingesta {bump_ingest_generation()} ({resumen['escrituras']} filas escritas)")
+            except Exception as e:
+                print(f"❌ Error actualizando la versión de ingesta: {e}")
+        else:
+            print("⏭️ Sin escrituras: la versión de ingesta no cambia")
+        _ultimo_ciclo = resumen
+        print(f"✅ Recolección completa en {resumen['duracion_s']}s")
+        return resumen
+    finally:
+        _ciclo_lock.release()
+
+
+def abortar_ciclo():
+    """Pedir al ciclo en curso (si hay) que termine cuanto antes."""
+    ciclo = _ciclo_actual
+    if ciclo is not None:
+        ciclo.abortar.set()
+
+
+def get_last_cycle_stats():
+    """Estadísticas del último ciclo completado en este proceso (o None)."""
+    return _ultimo_ciclo
@@ -0,0 +1,142 @@
+"""Sondeo adaptativo de estaciones.
+
+En lugar de descargar todas las estaciones en cada ciclo, cada una tiene su
+próxima descarga en ``sondeo_estaciones``:
+
+- **Lectura nueva** (``activa`` con ``date_timestamp`` mayor al último):
+  se actualiza la cadencia con un EWMA de los segundos entre lecturas
+  (``ETL_POLL_EWMA_ALPHA``) y se agenda para cuando se espera la siguiente
+  (``date_timestamp + cadencia + ETL_POLL_SLACK_SECONDS``).
+- **Sin lectura nueva** (sin cambios, datos antiguos, inactiva o error):
+  backoff exponencial desde ``ETL_POLL_SECONDS``, duplicando en cada fallo
+  consecutivo hasta ``ETL_POLL_MAX_BACKOFF``. Una estación caída se consulta
+  cada vez menos, pero nunca se abandona.
+
+La clasificación de cada descarga se refleja en ``estaciones.activa``:
+``activa``/``antigua`` → true, ``inactiva`` (más de 24 h sin datos) → false.
+Los errores de descarga y los recursos sin cambios no la modifican.
+
+La cadencia inicial sale de la mediana de intervalos en ``mediciones``
+(carga inicial de ``init.sql``); como esa historia se tomó con el sondeo
+fijo anterior, el EWMA la corrige en los primeros ciclos.
+"""
+import os
+from datetime import datetime, timedelta, timezone
+
+import psycopg2.extras
+
+from database.db_manager import get_db_cursor
+from database.ingest import INGEST_POLL_SECONDS
+
+ETL_POLL_EWMA_ALPHA = float(os.getenv('ETL_POLL_EWMA_ALPHA', '0.3'))
+ETL_POLL_SLACK_SECONDS = float(os.getenv('ETL_POLL_SLACK_SECONDS', '30'))
+ETL_POLL_MAX_BACKOFF = float(os.getenv('ETL_POLL_MAX_BACKOFF', str(6 * 3600)))
+# Cadencias aprendidas fuera de este rango se recortan
+CADENCIA_MAX = 24 * 3600
+
+# Resultado de la clasificación -> valor de estaciones.activa (None = sin cambio)
+_ACTIVA_POR_RESULTADO = {'activa': True, 'antigua': True, 'inactiva': False}
+
+
+def estaciones_a_sondear():
+    """``(códigos con descarga pendiente, total de estaciones)``.
+
+    Incluye las estaciones sin estado de sondeo (nuevas), estén o no
+    marcadas como activas.
+    """
+    with get_db_cursor(statement='estaciones_a_sondear') as cursor:
+        cursor.execute("""
+            SELECT e.codigo, (s.proximo_sondeo IS NULL OR s.proximo_sondeo <= CURRENT_TIMESTAMP) AS pendiente
+            FROM estaciones e
+            LEFT JOIN sondeo_estaciones s ON s.estacion_codigo = e.codigo
+        """)
+        filas = cursor.fetchall()
+    return [r['codigo'] for r in filas if r['pendiente']], len(filas)
+
+
+def _backoff(fallos):
+    return min(ETL_POLL_MAX_BACKOFF, INGEST_POLL_SECONDS * 2 ** max(0, fallos - 1))
+
+
+def siguiente_estado(previo, resultado, date_timestamp, ahora):
+    """Nuevo estado de sondeo de una estación tras una descarga.
+
+    ``previo`` es la fila actual de ``sondeo_estaciones`` (o None) y
+    ``date_timestamp`` el de la lectura si ``resultado == 'activa'``.
+    Retorna ``(cadencia_s, ultimo_timestamp, fallos, proximo_sondeo)``.
+    """
+    previo = previo or {}
+    cadencia = previo.get('cadencia_s')
+    ultimo = previo.get('ultimo_timestamp')
+    fallos = previo.get('fallos') or 0
+
+    nueva = resultado == 'activa' and date_timestamp is not None and (ultimo is None or date_timestamp > ultimo)
+    if not nueva:
+        fallos += 1
+        return cadencia, ultimo, fallos, ahora + timedelta(seconds=_backoff(fallos))
+
+    if ultimo is not None:
+        intervalo = date_timestamp - ultimo
+        cadencia = intervalo if cadencia is None else (
+            ETL_POLL_EWMA_ALPHA * intervalo + (1 - ETL_POLL_EWMA_ALPHA) * cadencia
+        )
+    cadencia = min(CADENCIA_MAX, max(INGEST_POLL_SECONDS, cadencia or INGEST_POLL_SECONDS))
+    esperado = datetime.fromtimestamp(date_timestamp + cadencia + ETL_POLL_SLACK_SECONDS, tz=timezone.utc)
+    return cadencia, date_timestamp, 0, max(esperado, ahora)
+
+
+def registrar_sondeos(resultados):
+    """Guardar el resultado de las descargas del ciclo.
+
+    ``resultados`` es una lista de ``(codigo, resultado, date_timestamp)``.
+    Actualiza ``sondeo_estaciones`` y ``estaciones.activa`` en una sola
+    transacción. Retorna el número de estaciones cuyo ``activa`` cambió.
+    """
+    if not resultados:
+        return 0
+    ahora = datetime.now(timezone.utc)
+    codigos = [r[0] for r in resultados]
+    with get_db_cursor(statement='registrar_sondeos') as cursor:
+        cursor.execute("""
+            SELECT estacion_codigo, cadencia_s, ultimo_timestamp, fallos
+            FROM sondeo_estaciones WHERE estacion_codigo = ANY(%s)
+        """, (codigos,))
+        previos = {r['estacion_codigo']: r for r in cursor.fetchall()}
+
+        filas = []
+        activas = []
+        for codigo, resultado, date_timestamp in resultados:
+            cadencia, ultimo, fallos, proximo = siguiente_estado(
+                previos.get(codigo), resultado, date_timestamp, ahora
+            )
+            filas.append((codigo, cadencia, ultimo, fallos, resultado, proximo))
+            if resultado in _ACTIVA_POR_RESULTADO:
+                activas.append((codigo, _ACTIVA_POR_RESULTADO[resultado]))
+
+        psycopg2.extras.execute_values(cursor, """
+            INSERT INTO sondeo_estaciones (
+                estacion_codigo, cadencia_s, ultimo_timestamp, fallos, ultimo_resultado, proximo_sondeo
+            ) VALUES %s
+            ON CONFLICT (estacion_codigo) DO UPDATE SET
+                cadencia_s = EXCLUDED.cadencia_s,
+                ultimo_timestamp = EXCLUDED.ultimo_timestamp,
+                fallos = EXCLUDED.fallos,
+                ultimo_resultado = EXCLUDED.ultimo_resultado,
+                proximo_sondeo = EXCLUDED.proximo_sondeo,
+                updated_at = CURRENT_TIMESTAMP
+        """, filas, page_size=len(filas))
+
+        cambiadas = []
+        if activas:
+            cambiadas = psycopg2.extras.execute_values(cursor, """
+                UPDATE estaciones e
+                SET activa = v.activa, updated_at = CURRENT_TIMESTAMP
+                FROM (VALUES %s) AS v(codigo, activa)
+                WHERE e.codigo = v.codigo AND e.activa IS DISTINCT FROM v.activa
+                RETURNING e.codigo, e.activa
+            """, activas, page_size=len(activas), fetch=True)
+
+    for r in cambiadas:
+        estado = 'activa' if r['activa'] else 'inactiva'
+        print(f"  🔁 Estación {r['codigo']} marcada como {estado}")
+    return len(cambiadas)
@@ -0,0 +1,80 @@
+"""Bitácora persistente de los ciclos del ETL.
+
+Cada ciclo deja una fila en ``etl_runs`` (duración, plazo, conteos por
+resultado, escrituras, errores y el detalle de etapas/colas/descargas en
+``resumen``) y una fila por estación sondeada en ``etl_run_estaciones`` con
+su resultado y la latencia de la descarga. ``/api/etl/runs`` consulta ambas
+para ver la tendencia de duración de los ciclos y qué estaciones consumen
+el presupuesto del ciclo.
+
+La retención (``ETL_RUNS_RETENTION_DAYS``) se aplica con la tarea diaria
+del scheduler; las filas por estación se borran en cascada.
+"""
+import os
+
+import psycopg2.extras
+
+from database.db_manager import get_db_cursor
+
+# Días de bitácora que se conservan (0 = sin límite)
+ETL_RUNS_RETENTION_DAYS = int(os.getenv('ETL_RUNS_RETENTION_DAYS', '30'))
+
+
+def guardar_ejecucion(resumen, estaciones):
+    """Registrar un ciclo y sus estaciones; retorna el ``id`` del ciclo.
+
+    ``estaciones`` es una lista de ``(codigo, resultado, latencia_s)``
+    (latencia ``None`` si no se midió).
+    """
+    m = resumen['mediciones']
+    detalle = {k: resumen[k] for k in ('etapas', 'colas', 'descargas')}
+    with get_db_cursor(statement='guardar_ejecucion') as cursor:
+        cursor.execute("""
+            INSERT INTO etl_runs (
+                inicio, duracion_s, plazo_s, vencido, abortado, catalogo,
+                estaciones, estaciones_sondeadas, estaciones_omitidas,
+                activas, antiguas, inactivas, sin_cambios, errores_descarga,
+                mediciones_guardadas, escrituras, errores, resumen
+            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            RETURNING id
+        """, (
+            resumen['inicio'], resumen['duracion_s'], resumen['plazo_s'],
+            resumen['vencido'], resumen['abortado'], resumen['catalogo'],
+            resumen['estaciones'], resumen['estaciones_sondeadas'], resumen['estaciones_omitidas'],
+            m['activa'], m['antigua'], m['inactiva'], m['sin_cambios'],
+            m['error_conexion'] + m['error'],
+            m['guardadas'], resumen['escrituras'], resumen['errores'],
+            psycopg2.extras.Json(detalle),
+        ))
+        run_id = cursor.fetchone()['id']
+        if estaciones:
+            psycopg2.extras.execute_values(cursor, """
+                INSERT INTO etl_run_estaciones (run_id, estacion_codigo, resultado, latencia_ms)
+                VALUES %s
+                ON CONFLICT (run_id, estacion_codigo) DO NOTHING
+            """, [
+                (run_id, codigo, resultado, round(latencia * 1000, 1) if latencia is not None else None)
+                for codigo, resultado, latencia in estaciones
+            ], page_size=len(estaciones))
+    return run_id
+
+
+def podar_ejecuciones(dias=ETL_RUNS_RETENTION_DAYS):
+    """Borrar ciclos más antiguos que ``dias``. Retorna cuántos se borraron."""
+    if dias <= 0:
+        return 0
+    with get_db_cursor(statement='podar_ejecuciones') as cursor:
+        cursor.execute("DELETE FROM etl_runs WHERE inicio < CURRENT_TIMESTAMP - %s * INTERVAL '1 day'", (dias,))
+        return cursor.rowcount
+
+
+def mantener_bitacora(continuar=None):
+    """Tarea diaria: retención de la bitácora del ETL (omitida si ``continuar()`` es False)."""
+    if continuar is not None and not continuar():
+        return
+    try:
+        borrados = podar_ejecuciones()
+        if borrados:
+            print(f"🧹 Bitácora ETL: {borrados} ciclos anteriores a {ETL_RUNS_RETENTION_DAYS} días eliminados")
+    except Exception as e:
+        print(f"❌ Error podando la bitácora ETL: {e}")
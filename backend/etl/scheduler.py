@@ -1,24 +1,136 @@
 from apscheduler.schedulers.background import BackgroundScheduler
-from .data_collector import collect_all_data
+from datetime import datetime, timedelta
+from .pipeline import collect_all_data, abortar_ciclo
+from .leader import run_as_leader, es_lider
+from .runs import mantener_bitacora
+from database.db_manager import ensure_schema
+from database.partitions import mantener_particiones
+from database.ingest import INGEST_POLL_SECONDS
+import metrics
 import atexit
+import threading
 
-def start_scheduler():
-    """Inicializar el scheduler para ETL"""
-    scheduler = BackgroundScheduler()
+# Segundos entre reintentos si la base de datos no está disponible al arrancar
+_REINTENTO_ARRANQUE = 30
+
+# Estado del arranque en segundo plano (lo reporta /api/health/ready)
+_arranque = {'iniciado': None, 'esquema_listo': False, 'error': None, 'lider': False}
+
+
+def get_startup_state():
+    """Estado del arranque del scheduler en este proceso."""
+    return dict(_arranque)
+
+
+def _preparar_y_programar(scheduler):
+    """Asegurar esquema/particiones y programar los jobs periódicos.
+
+    Corre dentro del scheduler, así ``start_scheduler`` retorna de inmediato
+    y la API atiende peticiones mientras tanto.
+    """
+    try:
+        # Asegurar esquema (restricciones nuevas en bases existentes)
+        ensure_schema()
+        mantener_particiones()
+        _arranque['esquema_listo'] = True
+    except Exception as e:
+        _arranque['error'] = str(e)
+        print(f"❌ Error preparando la base de datos: {e}; reintento en {_REINTENTO_ARRANQUE}s")
+        scheduler.add_job(func=_preparar_y_programar, args=(scheduler,), id='startup_job',
+                          trigger='date', run_date=datetime.now() + timedelta(seconds=_REINTENTO_ARRANQUE),
+                          replace_existing=True)
+        return
+    _arranque['error'] = None
 
-    # Job para recolectar todos los datos cada 10 minutos
+    # Ciclo de recolección cada ETL_POLL_SECONDS (60 por defecto): solo se
+    # descargan las estaciones con sondeo pendiente, y pronósticos/lista de
+    # estaciones cada ETL_INTERVAL_MINUTES. El primero corre de inmediato.
     scheduler.add_job(
         func=collect_all_data,
         trigger="interval",
-        minutes=10,
-        id='data_collection_job'
+        seconds=INGEST_POLL_SECONDS,
+        next_run_time=datetime.now(),
+        id='data_collection_job',
+        # Nunca dos ciclos a la vez; disparos atrasados se fusionan en uno
+        max_instances=1,
+        coalesce=True,
+        misfire_grace_time=INGEST_POLL_SECONDS
     )
 
-    # Ejecutar una vez al inicio
-    collect_all_data()
+    # Particiones futuras de mediciones y retención/archivo, una vez al día
+    scheduler.add_job(
+        func=mantener_particiones,
+        args=(es_lider,),
+        trigger="interval",
+        hours=24,
+        id='partition_maintenance_job'
+    )
+
+    # Retención de la bitácora de ciclos (etl_runs), una vez al día
+    scheduler.add_job(
+        func=mantener_bitacora,
+        args=(es_lider,),
+        trigger="interval",
+        hours=24,
+        id='etl_runs_retention_job'
+    )
+
+
+def _crear_scheduler():
+    """Scheduler con el job de arranque; se crea uno por cada periodo de liderazgo."""
+    scheduler = BackgroundScheduler()
+    _arranque['iniciado'] = datetime.now().isoformat()
+    _arranque['esquema_listo'] = False
+
+    # Sin trigger: se ejecuta una vez, apenas arranca el scheduler
+    scheduler.add_job(func=_preparar_y_programar, args=(scheduler,), id='startup_job')
+    return scheduler
+
+
+def run_etl(detener):
+    """Correr el scheduler mientras este proceso tenga el lock de líder.
+
+    Bloquea hasta que se active ``detener``; lo usan el worker dedicado
+    (``python -m etl.worker``) y el modo embebido de la API.
+    """
+    actual = {}
+
+    def iniciar():
+        scheduler = _crear_scheduler()
+        scheduler.start()
+        actual['scheduler'] = scheduler
+        _arranque['lider'] = True
+        metrics.etl_leader.set(1)
+        print("✅ Scheduler iniciado (primera recolección en segundo plano)")
+
+    def parar():
+        _arranque['lider'] = False
+        metrics.etl_leader.set(0)
+        scheduler = actual.pop('scheduler', None)
+        if scheduler is not None and scheduler.running:
+            # Abortar el ciclo en curso y esperarlo: el lock se suelta después
+            # de esto, y ninguna escritura debe quedar corriendo sin liderazgo
+            abortar_ciclo()
+            scheduler.shutdown(wait=True)
+            print("🛑 Scheduler detenido")
+
+    run_as_leader(iniciar, parar, detener)
+
+
+def start_scheduler():
+    """Inicializar el ETL embebido sin bloquear el arranque.
+
+    La elección de líder corre en un hilo; solo el proceso que obtiene el
+    lock (ver ``etl.leader``) programa la recolección.
+    """
+    detener = threading.Event()
+    hilo = threading.Thread(target=run_etl, args=(detener,), name='etl-leader', daemon=True)
+    hilo.start()
+    print("✅ ETL embebido: compitiendo por el lock de líder en segundo plano")
 
-    scheduler.start()
-    print("✅ Scheduler iniciado")
+    # Detener el scheduler y soltar el lock cuando la aplicación termine
+    def _apagar():
+        detener.set()
+        hilo.join(timeout=5)
 
-    # Apagar el scheduler cuando la aplicación termine
-    atexit.register(lambda: scheduler.shutdown())
\ No newline at end of file
+    atexit.register(_apagar)
@@ -1,46 +1,235 @@
 import requests
+import hashlib
 import json
-import time
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
 from datetime import datetime
 import logging
+import time
+
+import metrics
+
+# URLs SIATA
+BASE_URL = "https://siata.gov.co/data/siata_app/"
+
+WRF_ZONES = [
+    'sabaneta', 'palmitas', 'medOriente', 'medOccidente', 'medCentro',
+    'laestrella', 'itagui', 'girardota', 'envigado', 'copacabana',
+    'caldas', 'bello', 'barbosa'
+]
+
+# Paralelismo máximo de descargas (configurable por entorno)
+DEFAULT_MAX_WORKERS = int(os.getenv('ETL_MAX_WORKERS', '16'))
+DEFAULT_TIMEOUT = float(os.getenv('ETL_HTTP_TIMEOUT', '10'))
+
+# Centinela devuelto por descargas condicionales cuando el recurso no cambió
+NOT_MODIFIED = object()
+
 
 class SiataCollector:
-    def __init__(self):
-        self.base_url = "https://siata.gov.co/data/siata_app"
-        self.zones = [
-            'sabaneta', 'palmitas', 'medOriente', 'medOccidente', 'medCentro',
-            'laestrella', 'itagui', 'girardota', 'envigado', 'copacabana',
-            'caldas', 'bello', 'barbosa'
-        ]
+    """Cliente HTTP único para los recursos JSON de SIATA.
 
-    def fetch_forecast_data(self):
-        """Obtiene datos de pronóstico para todas las zonas"""
-        forecast_data = {}
+    Mantiene una sola ``requests.Session`` con pool de conexiones keep-alive
+    dimensionado según el paralelismo, de modo que pronósticos WRF, lista de
+    estaciones y mediciones por estación reutilizan las mismas conexiones TLS.
+    ``fetch_many`` descarga varios recursos en paralelo con un límite de
+    concurrencia acotado.
+
+    Las descargas condicionales recuerdan por URL el ``ETag``,
+    ``Last-Modified`` y un digest del contenido: se envían
+    ``If-None-Match``/``If-Modified-Since`` y, si el servidor responde 304 o
+    el cuerpo tiene el mismo digest, se devuelve ``NOT_MODIFIED`` sin
+    decodificar el JSON. Los validadores de una respuesta nueva quedan
+    pendientes hasta que el consumidor la procesa y llama ``confirm``; si
+    el JSON no decodifica o el procesamiento falla (``forget``) se
+    descartan, y el siguiente ciclo vuelve a descargar y procesar el recurso.
+    """
+
+    def __init__(self, base_url=BASE_URL, max_workers=None, timeout=None):
+        self.base_url = base_url
+        self.zones = list(WRF_ZONES)
+        self.max_workers = max(1, max_workers or DEFAULT_MAX_WORKERS)
+        self.timeout = timeout or DEFAULT_TIMEOUT
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_workers)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self._validators = {}
+        self._pendientes = {}
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    # ------------------------------------------------------------------
+    # URLs
+    # ------------------------------------------------------------------
+    def forecast_url(self, zone):
+        return f"{self.base_url}wrf{zone}.json"
+
+    def stations_url(self):
+        return f"{self.base_url}PluviometricaMeteo.json"
+
+    def station_url(self, station_id):
+        return f"{self.base_url}{station_id}.json"
+
+    def _resource(self, url):
+        """Tipo de recurso para las métricas (sin el código de estación)."""
+        if url == self.stations_url():
+            return 'estaciones'
+        if url.startswith(f"{self.base_url}wrf"):
+            return 'wrf'
+        return 'estacion'
+
+    # ------------------------------------------------------------------
+    # Descarga
+    # ------------------------------------------------------------------
+    def _get(self, url, timeout, headers=None):
+        """``session.get`` midiendo latencia y estado HTTP por tipo de recurso."""
+        resource = self._resource(url)
+        inicio = time.perf_counter()
+        try:
+            response = self.session.get(url, timeout=timeout, headers=headers)
+        except requests.Timeout:
+            metrics.siata_fetches.inc(resource, 'timeout')
+            raise
+        except requests.RequestException:
+            metrics.siata_fetches.inc(resource, 'error')
+            raise
+        finally:
+            metrics.siata_fetch_duration.observe(time.perf_counter() - inicio, resource)
+        metrics.siata_fetches.inc(resource, response.status_code)
+        return response
+
+    def fetch_json(self, url, timeout=None, conditional=False):
+        """Descarga y decodifica un JSON. Lanza ``requests.RequestException``
+        o ``ValueError`` si la respuesta no es válida.
+
+        Con ``conditional=True`` devuelve ``NOT_MODIFIED`` si el recurso no
+        cambió desde la última descarga confirmada de esa URL (``confirm``).
+        """
+        if not conditional:
+            response = self._get(url, timeout or self.timeout)
+            response.raise_for_status()
+            return response.json()
+
+        with self._lock:
+            previo = self._validators.get(url)
+        headers = {}
+        if previo:
+            if previo.get('etag'):
+                headers['If-None-Match'] = previo['etag']
+            if previo.get('last_modified'):
+                headers['If-Modified-Since'] = previo['last_modified']
+
+        response = self._get(url, timeout or self.timeout, headers)
+        if response.status_code == 304 and previo:
+            self._count(hits=1, not_modified=1, bytes_saved=previo['size'])
+            return NOT_MODIFIED
+        response.raise_for_status()
 
-        for zone in self.zones:
+        body = response.content
+        digest = hashlib.blake2b(body, digest_size=16).digest()
+        if previo and previo['digest'] == digest:
+            self._count(hits=1, same_digest=1, bytes_downloaded=len(body))
+            return NOT_MODIFIED
+        self._count(misses=1, bytes_downloaded=len(body))
+        data = json.loads(body)
+        with self._lock:
+            self._pendientes[url] = {
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+                'digest': digest,
+                'size': len(body),
+            }
+        return data
+
+    def confirm(self, *urls):
+        """Recordar los validadores de ``urls`` una vez procesadas (p.ej. escritas en BD)."""
+        with self._lock:
+            for url in urls:
+                validador = self._pendientes.pop(url, None)
+                if validador is not None:
+                    self._validators[url] = validador
+
+    def forget(self, *urls):
+        """Olvidar validadores para forzar el reprocesamiento de ``urls``."""
+        with self._lock:
+            for url in urls:
+                self._validators.pop(url, None)
+                self._pendientes.pop(url, None)
+
+    def _count(self, **incrementos):
+        with self._lock:
+            for clave, valor in incrementos.items():
+                self._stats[clave] += valor
+
+    def reset_stats(self):
+        """Reiniciar contadores de descargas condicionales (uno por ciclo)."""
+        with self._lock:
+            self._stats = {
+                'hits': 0, 'misses': 0, 'not_modified': 0, 'same_digest': 0,
+                'bytes_downloaded': 0, 'bytes_saved': 0,
+            }
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+    def _fetch_timed(self, url, timeout, conditional):
+        inicio = time.perf_counter()
+        try:
+            data = self.fetch_json(url, timeout, conditional)
+        except Exception as e:
+            return None, e, time.perf_counter() - inicio
+        return data, None, time.perf_counter() - inicio
+
+    def fetch_many(self, urls, timeout=None, conditional=False, timed=False):
+        """Descarga en paralelo un mapeo ``clave -> url``.
+
+        Genera tuplas ``(clave, data, error)`` a medida que terminan las
+        descargas; ``error`` es ``None`` si la descarga fue exitosa y
+        ``data`` es ``NOT_MODIFIED`` si ``conditional`` y no hubo cambios.
+        Con ``timed=True`` se agrega la latencia de la descarga en segundos
+        (sin la espera por un hilo libre): ``(clave, data, error, segundos)``.
+        Si el consumidor deja de iterar (p.ej. por el plazo del ciclo), las
+        descargas aún no iniciadas se cancelan.
+        """
+        items = list(urls.items())
+        if not items:
+            return
+        workers = min(self.max_workers, len(items))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='siata-fetch') as pool:
+            futures = {
+                pool.submit(self._fetch_timed, url, timeout, conditional): key
+                for key, url in items
+            }
             try:
-                url = f"{self.base_url}/wrf{zone}.json"
-                response = requests.get(url, timeout=10)
-                if response.status_code == 200:
-                    forecast_data[zone] = response.json()
-                    logging.info(f"Datos de pronóstico obtenidos para {zone}")
-                else:
-                    logging.warning(f"Error al obtener datos de {zone}: {response.status_code}")
-            except Exception as e:
-                logging.error(f"Error al obtener datos de {zone}: {e}")
+                for future in as_completed(futures):
+                    data, error, segundos = future.result()
+                    if timed:
+                        yield futures[future], data, error, segundos
+                    else:
+                        yield futures[future], data, error
+            finally:
+                pool.shutdown(wait=False, cancel_futures=True)
 
+    def fetch_forecast_data(self):
+        """Obtiene datos de pronóstico para todas las zonas"""
+        forecast_data = {}
+        urls = {zone: self.forecast_url(zone) for zone in self.zones}
+        for zone, data, error in self.fetch_many(urls, timeout=30):
+            if error is None:
+                forecast_data[zone] = data
+                logging.info(f"Datos de pronóstico obtenidos para {zone}")
+            else:
+                logging.error(f"Error al obtener datos de {zone}: {error}")
         return forecast_data
 
     def fetch_stations_list(self):
         """Obtiene la lista de estaciones activas"""
         try:
-            url = f"{self.base_url}/PluviometricaMeteo.json"
-            response = requests.get(url, timeout=10)
-            if response.status_code == 200:
-                return response.json()
-            else:
-                logging.warning(f"Error al obtener lista de estaciones: {response.status_code}")
-                return None
+            return self.fetch_json(self.stations_url(), timeout=30)
         except Exception as e:
             logging.error(f"Error al obtener lista de estaciones: {e}")
             return None
@@ -48,33 +237,52 @@ class SiataCollector:
     def fetch_station_data(self, station_id):
         """Obtiene datos de una estación específica"""
         try:
-            url = f"{self.base_url}/{station_id}.json"
-            response = requests.get(url, timeout=10)
-            if response.status_code == 200:
-                data = response.json()
-                data['station_id'] = station_id
-                data['timestamp'] = datetime.now().isoformat()
-                return data
-            else:
-                logging.warning(f"Error al obtener datos de estación {station_id}: {response.status_code}")
-                return None
+            data = self.fetch_json(self.station_url(station_id))
+            data['station_id'] = station_id
+            data['timestamp'] = datetime.now().isoformat()
+            return data
         except Exception as e:
             logging.error(f"Error al obtener datos de estación {station_id}: {e}")
             return None
 
+    def fetch_stations_data(self, station_ids, conditional=False):
+        """Descarga en paralelo la medición actual de varias estaciones.
+
+        Genera ``(station_id, data, error)`` en orden de finalización.
+        """
+        urls = {sid: self.station_url(sid) for sid in station_ids}
+        yield from self.fetch_many(urls, conditional=conditional)
+
     def fetch_all_stations_data(self):
         """Obtiene datos de todas las estaciones activas"""
         stations_list = self.fetch_stations_list()
         if not stations_list or 'estaciones' not in stations_list:
             return {}
 
+        info = {station['codigo']: station for station in stations_list['estaciones']}
         stations_data = {}
-        for station in stations_list['estaciones']:
-            station_id = station['codigo']
-            station_data = self.fetch_station_data(station_id)
-            if station_data:
-                # Combinar información de la estación con sus datos
-                station_data['info'] = station
-                stations_data[station_id] = station_data
-
-        return stations_data
\ No newline at end of file
+        for station_id, data, error in self.fetch_stations_data(info.keys()):
+            if error is not None:
+                logging.error(f"Error al obtener datos de estación {station_id}: {error}")
+                continue
+            data['station_id'] = station_id
+            data['timestamp'] = datetime.now().isoformat()
+            # Combinar información de la estación con sus datos
+            data['info'] = info[station_id]
+            stations_data[station_id] = data
+
+        return stations_data
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_siata_client():
+    """Cliente compartido del proceso (se crea una sola vez)."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = SiataCollector()
+    return _client
@@ -0,0 +1,43 @@
+"""Worker dedicado del ETL: ``python -m etl.worker`` (desde ``backend/``).
+
+Corre la recolección fuera de la API, que entonces se despliega con
+``ETL_MODE=off``. Se pueden levantar varias réplicas: el lock de líder
+(``etl.leader``) garantiza que solo una recolecta y las demás quedan en
+espera para tomar el relevo.
+
+Con ``ETL_METRICS_PORT`` el worker sirve sus métricas (ciclos, etapas,
+descargas a SIATA, consultas) en ``http://<host>:<puerto>/metrics``.
+"""
+import logging
+import os
+import signal
+import threading
+
+import metrics
+from .scheduler import run_etl
+
+# Puerto de /metrics del worker (0 = deshabilitado)
+ETL_METRICS_PORT = int(os.getenv('ETL_METRICS_PORT', '0'))
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    detener = threading.Event()
+
+    def _senal(signum, _frame):
+        print(f"🛑 Señal {signal.Signals(signum).name}: deteniendo worker ETL")
+        detener.set()
+
+    signal.signal(signal.SIGTERM, _senal)
+    signal.signal(signal.SIGINT, _senal)
+
+    print("🚀 Worker ETL iniciado")
+    if ETL_METRICS_PORT:
+        metrics.start_http_server(ETL_METRICS_PORT)
+        print(f"📈 Métricas en :{ETL_METRICS_PORT}/metrics")
+    run_etl(detener)
+    print("👋 Worker ETL detenido")
+
+
+if __name__ == '__main__':
+    main()
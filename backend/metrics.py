@@ -0,0 +1,282 @@
+"""Métricas del proceso en formato de texto de Prometheus.
+
+Registro mínimo sin dependencias: contadores, histogramas y gauges
+calculados al exportar. Registrar una observación cuesta un lock y un
+``bisect`` (del orden de 1 µs), así que las métricas quedan siempre
+activas. Cada proceso (API o worker ETL) expone las suyas: la API en
+``/metrics`` y el worker en ``ETL_METRICS_PORT``.
+
+Para acotar la cardinalidad, cada métrica admite como máximo
+``METRICS_MAX_SERIES`` combinaciones de etiquetas; las siguientes se
+acumulan en la serie con todas las etiquetas en ``otros``.
+"""
+import abc
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+# Combinaciones de etiquetas por métrica antes de agrupar en "otros"
+METRICS_MAX_SERIES = int(os.getenv('METRICS_MAX_SERIES', '500'))
+
+# Buckets (s) de latencias de peticiones, consultas y descargas
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+# Buckets (bytes) de tamaños de respuesta
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+# Buckets (s) de duración de un ciclo ETL
+CYCLE_BUCKETS = (1, 2.5, 5, 10, 20, 30, 60, 120, 300, 600)
+
+_registry = []
+_registry_lock = threading.Lock()
+
+
+def _escape(valor):
+    return str(valor).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(nombres, valores, extra=None):
+    pares = [f'{n}="{_escape(v)}"' for n, v in zip(nombres, valores)]
+    if extra:
+        pares.append(extra)
+    return '{' + ','.join(pares) + '}' if pares else ''
+
+
+def _numero(valor):
+    if valor == float('inf'):
+        return '+Inf'
+    if isinstance(valor, float) and valor.is_integer() and abs(valor) < 1e15:
+        return str(int(valor))
+    return repr(valor) if isinstance(valor, float) else str(valor)
+
+
+class _Metric(abc.ABC):
+    tipo = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._series = {}
+        with _registry_lock:
+            _registry.append(self)
+
+    def _key(self, valores):
+        if len(valores) != len(self.labelnames):
+            raise ValueError(f"{self.name}: se esperaban etiquetas {self.labelnames}")
+        return tuple(str(v) for v in valores)
+
+    def _serie(self, valores, nueva):
+        """Serie de ``valores`` (creándola bajo el lock); respeta el límite de series."""
+        key = self._key(valores)
+        serie = self._series.get(key)
+        if serie is None:
+            if len(self._series) >= METRICS_MAX_SERIES:
+                key = ('otros',) * len(self.labelnames)
+                serie = self._series.get(key)
+            if serie is None:
+                serie = self._series[key] = nueva()
+        return serie
+
+    def _header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.tipo}"]
+
+    @abc.abstractmethod
+    def render(self):
+        """Líneas de exposición de la métrica."""
+
+
+class Counter(_Metric):
+    """Contador monótono."""
+    tipo = 'counter'
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            serie = self._serie(labels, lambda: [0])
+            serie[0] += amount
+
+    def render(self):
+        with self._lock:
+            series = [(k, v[0]) for k, v in self._series.items()]
+        return self._header() + [
+            f"{self.name}{_labels(self.labelnames, k)} {_numero(v)}" for k, v in sorted(series)
+        ]
+
+
+class Histogram(_Metric):
+    """Histograma con buckets fijos (acumulados al exportar)."""
+    tipo = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, *labels):
+        # [conteos por bucket (+Inf al final), suma, total]
+        with self._lock:
+            serie = self._serie(labels, lambda: [[0] * (len(self.buckets) + 1), 0.0, 0])
+            serie[0][bisect_left(self.buckets, value)] += 1
+            serie[1] += value
+            serie[2] += 1
+
+    @contextmanager
+    def time(self, *labels):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - inicio, *labels)
+
+    def render(self):
+        with self._lock:
+            series = [(k, list(v[0]), v[1], v[2]) for k, v in self._series.items()]
+        lineas = self._header()
+        for key, conteos, suma, total in sorted(series):
+            acumulado = 0
+            for limite, conteo in zip(self.buckets + (float('inf'),), conteos):
+                acumulado += conteo
+                le = f'le="{_numero(float(limite))}"'
+                lineas.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {acumulado}")
+            etiquetas = _labels(self.labelnames, key)
+            lineas.append(f"{self.name}_sum{etiquetas} {_numero(suma)}")
+            lineas.append(f"{self.name}_count{etiquetas} {total}")
+        return lineas
+
+
+class Gauge(_Metric):
+    """Gauge con valores fijados explícitamente o leídos al exportar.
+
+    ``callback`` retorna ``{tupla_de_etiquetas: valor}`` (o None si no hay datos).
+    """
+    tipo = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=(), callback=None):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+
+    def set(self, value, *labels):
+        with self._lock:
+            self._serie(labels, lambda: [0])[0] = value
+
+    def render(self):
+        if self.callback is not None:
+            series = list((self.callback() or {}).items())
+        else:
+            with self._lock:
+                series = [(k, v[0]) for k, v in self._series.items()]
+        return self._header() + [
+            f"{self.name}{_labels(self.labelnames, k)} {_numero(v)}"
+            for k, v in sorted(series) if v is not None
+        ]
+
+
+def render():
+    """Todas las métricas registradas en formato de texto de Prometheus."""
+    with _registry_lock:
+        metricas = list(_registry)
+    lineas = []
+    for metrica in metricas:
+        lineas.extend(metrica.render())
+    return '\n'.join(lineas) + '\n'
+
+
+# ----------------------------------------------------------------------
+# Métricas de la aplicación
+# ----------------------------------------------------------------------
+http_requests = Counter(
+    'siata_http_requests_total', 'Peticiones atendidas por la API', ('endpoint', 'method', 'status'))
+http_request_duration = Histogram(
+    'siata_http_request_duration_seconds', 'Latencia de las peticiones a la API', ('endpoint', 'method'))
+http_response_size = Histogram(
+    'siata_http_response_size_bytes', 'Tamaño del cuerpo de las respuestas (tras compresión)',
+    ('endpoint',), buckets=SIZE_BUCKETS)
+
+db_query_duration = Histogram(
+    'siata_db_query_duration_seconds', 'Duración de cada execute en PostgreSQL', ('statement',))
+
+interpolation_duration = Histogram(
+    'siata_interpolation_duration_seconds', 'Tiempo de cálculo de interpolaciones',
+    ('method', 'grid_size'))
+
+siata_fetch_duration = Histogram(
+    'siata_fetch_duration_seconds', 'Latencia de las descargas hacia SIATA', ('resource',))
+siata_fetches = Counter(
+    'siata_fetch_total', 'Descargas hacia SIATA por recurso y estado HTTP', ('resource', 'status'))
+
+etl_cycle_duration = Histogram(
+    'siata_etl_cycle_duration_seconds', 'Duración de los ciclos ETL', buckets=CYCLE_BUCKETS)
+etl_stage_busy = Counter(
+    'siata_etl_stage_busy_seconds_total', 'Tiempo ocupado por etapa del ciclo ETL', ('stage',))
+etl_stage_wait = Counter(
+    'siata_etl_stage_wait_seconds_total', 'Tiempo en espera (colas) por etapa del ciclo ETL', ('stage',))
+etl_stage_items = Counter(
+    'siata_etl_stage_items_total', 'Ítems procesados por etapa del ciclo ETL', ('stage',))
+etl_writes = Counter(
+    'siata_etl_writes_total', 'Filas escritas por el ETL')
+etl_errors = Counter(
+    'siata_etl_errors_total', 'Errores registrados en ciclos ETL')
+etl_last_cycle = Gauge(
+    'siata_etl_last_cycle_timestamp_seconds', 'Fin del último ciclo ETL (epoch)')
+etl_leader = Gauge(
+    'siata_etl_leader', '1 si este proceso tiene el lock de líder del ETL')
+
+
+# ----------------------------------------------------------------------
+# Exposición
+# ----------------------------------------------------------------------
+def init_app(app):
+    """Medir latencia, estado y tamaño de cada petición y servir ``/metrics``.
+
+    Registrar antes que ``api.compression`` para medir el cuerpo comprimido
+    (los ``after_request`` corren en orden inverso). En respuestas en
+    streaming la latencia es hasta los encabezados y no se mide el tamaño.
+    """
+    from flask import Response, g, request
+
+    @app.before_request
+    def _iniciar_cronometro():
+        g.metrics_inicio = time.perf_counter()
+
+    @app.after_request
+    def _registrar_peticion(response):
+        inicio = g.pop('metrics_inicio', None)
+        endpoint = request.endpoint or 'sin_ruta'
+        if inicio is not None:
+            http_request_duration.observe(time.perf_counter() - inicio, endpoint, request.method)
+        http_requests.inc(endpoint, request.method, response.status_code)
+        if not response.is_streamed:
+            size = response.calculate_content_length()
+            if size is not None:
+                http_response_size.observe(size, endpoint)
+        return response
+
+    @app.route('/metrics')
+    def metrics():
+        return Response(render(), content_type=CONTENT_TYPE)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?', 1)[0] != '/metrics':
+            self.send_error(404)
+            return
+        cuerpo = render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_http_server(port, host='0.0.0.0'):
+    """Servir ``/metrics`` en un hilo (para procesos sin Flask, como el worker ETL)."""
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+    return server
@@ -0,0 +1,34 @@
+import os
+import sys
+from contextlib import contextmanager
+
+import pytest
+
+# Los módulos del backend se importan como paquetes de primer nivel (api, database, etl)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def transaccion():
+    """``get_db_cursor`` de reemplazo sobre ``TEST_DATABASE_URL`` (con el esquema de
+    ``init.sql`` aplicado); todo se revierte al terminar. Sin la variable, la prueba se omite."""
+    dsn = os.getenv('TEST_DATABASE_URL')
+    if not dsn:
+        pytest.skip("TEST_DATABASE_URL no definida")
+    import psycopg2
+    import psycopg2.extras
+    conn = psycopg2.connect(dsn)
+
+    @contextmanager
+    def get_db_cursor(name=None, statement=None):
+        cursor = conn.cursor(name=name, cursor_factory=psycopg2.extras.RealDictCursor)
+        try:
+            yield cursor
+        finally:
+            cursor.close()
+
+    try:
+        yield get_db_cursor
+    finally:
+        conn.rollback()
+        conn.close()
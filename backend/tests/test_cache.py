@@ -0,0 +1,147 @@
+"""``api.cache.ResultCache``: single-flight, TTL/LRU e invalidación por ingesta."""
+import threading
+import time
+
+import pytest
+
+from api import cache
+from api.cache import ResultCache
+
+
+@pytest.fixture
+def generacion(monkeypatch):
+    actual = {'valor': 1}
+    monkeypatch.setattr(cache, 'get_ingest_generation', lambda: actual['valor'])
+    return actual
+
+
+def _contador(valor='v'):
+    llamadas = []
+
+    def compute():
+        llamadas.append(1)
+        return valor, True
+    return compute, llamadas
+
+
+def test_memoriza_hasta_que_cambia_la_generacion(generacion):
+    c = ResultCache()
+    compute, llamadas = _contador()
+    assert c.get_or_compute('k', compute) == 'v'
+    assert c.get_or_compute('k', compute) == 'v'
+    assert len(llamadas) == 1
+
+    generacion['valor'] = 2
+    c.get_or_compute('k', compute)
+    assert len(llamadas) == 2
+    stats = c.stats()
+    assert stats['generation'] == 2
+    assert stats['invalidations'] == 1
+    assert (stats['hits'], stats['misses']) == (1, 2)
+
+
+def test_primer_uso_no_cuenta_como_invalidacion(generacion):
+    c = ResultCache()
+    assert c.stats()['generation'] is None
+    c.get_or_compute('k', _contador()[0])
+    assert c.stats()['invalidations'] == 0
+
+
+def test_resultado_de_una_ingesta_anterior_no_se_guarda(generacion):
+    c = ResultCache()
+
+    def compute():
+        generacion['valor'] = 2  # el ETL terminó un ciclo durante el cálculo
+        return 'viejo', True
+    assert c.get_or_compute('k', compute) == 'viejo'
+    assert c.stats()['entries'] == 0
+
+
+def test_no_cacheables(generacion):
+    c = ResultCache()
+    llamadas = []
+
+    def compute():
+        llamadas.append(1)
+        return 'error', False
+    c.get_or_compute('k', compute)
+    c.get_or_compute('k', compute)
+    assert len(llamadas) == 2
+
+
+def test_ttl(generacion):
+    c = ResultCache(ttl=0.05)
+    compute, llamadas = _contador()
+    c.get_or_compute('k', compute)
+    time.sleep(0.08)
+    c.get_or_compute('k', compute)
+    assert len(llamadas) == 2
+
+
+def test_lru_por_entradas(generacion):
+    c = ResultCache(max_entries=2)
+    for clave in ('a', 'b'):
+        c.get_or_compute(clave, _contador(clave)[0])
+    c.get_or_compute('a', _contador()[0])  # 'a' pasa a ser la más reciente
+    c.get_or_compute('c', _contador('c')[0])
+
+    compute_b, llamadas_b = _contador('b')
+    compute_a, llamadas_a = _contador('a')
+    c.get_or_compute('a', compute_a)
+    assert llamadas_a == []
+    c.get_or_compute('b', compute_b)
+    assert llamadas_b == [1]
+    assert c.stats()['evictions'] >= 1
+
+
+def test_presupuesto_de_memoria(generacion):
+    class Arreglo:
+        def __init__(self, nbytes):
+            self.nbytes = nbytes
+
+    c = ResultCache(max_bytes=100)
+    c.get_or_compute('a', lambda: (Arreglo(60), True))
+    c.get_or_compute('b', lambda: (Arreglo(60), True))
+    c.get_or_compute('enorme', lambda: (Arreglo(500), True))
+    stats = c.stats()
+    assert stats['entries'] == 1
+    assert stats['bytes'] == 60
+    assert [k['key'] for k in stats['keys']][0] == 'enorme'
+
+
+def test_single_flight(generacion):
+    c = ResultCache()
+    empezo = threading.Event()
+    liberar = threading.Event()
+    llamadas = []
+
+    def compute():
+        llamadas.append(1)
+        empezo.set()
+        liberar.wait(2)
+        return 'v', True
+
+    resultados = []
+    hilos = [threading.Thread(target=lambda: resultados.append(c.get_or_compute('k', compute)))
+             for _ in range(8)]
+    hilos[0].start()
+    empezo.wait(2)
+    for hilo in hilos[1:]:
+        hilo.start()
+    time.sleep(0.05)
+    liberar.set()
+    for hilo in hilos:
+        hilo.join(2)
+
+    assert llamadas == [1]
+    assert resultados == ['v'] * 8
+
+
+def test_error_en_compute_libera_a_los_que_esperan(generacion):
+    c = ResultCache()
+
+    def falla():
+        raise RuntimeError("boom")
+    with pytest.raises(RuntimeError):
+        c.get_or_compute('k', falla)
+    assert c.get_or_compute('k', _contador()[0]) == 'v'
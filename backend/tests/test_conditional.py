@@ -0,0 +1,95 @@
+"""``api.conditional``: ETag, Last-Modified y 304 según la versión de ingesta."""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from flask import Flask, jsonify
+
+from api import conditional as cond
+from database.ingest import INGEST_POLL_SECONDS
+
+
+@pytest.fixture
+def app(monkeypatch):
+    estado = {'version': 7, 'updated_at': datetime.now(timezone.utc).replace(microsecond=0)}
+    monkeypatch.setattr(cond, 'get_ingest_state', lambda: (estado['version'], estado['updated_at']))
+    llamadas = []
+    app = Flask(__name__)
+
+    @app.route('/datos')
+    @cond.conditional
+    def datos():
+        llamadas.append(1)
+        return jsonify({'ok': True})
+
+    @app.route('/falla')
+    @cond.conditional
+    def falla():
+        return jsonify({'ok': False}), 500
+
+    app.estado, app.llamadas = estado, llamadas
+    return app
+
+
+def test_validadores_en_respuesta_200(app):
+    r = app.test_client().get('/datos')
+    assert r.status_code == 200
+    assert r.headers['ETag'] == 'W/"7"'
+    assert r.last_modified == app.estado['updated_at']
+    max_age = int(r.headers['Cache-Control'].split('max-age=')[1].split(',')[0])
+    assert 0 < max_age <= INGEST_POLL_SECONDS
+    assert 'must-revalidate' in r.headers['Cache-Control']
+
+
+def test_if_none_match_vigente_304_sin_ejecutar_la_vista(app):
+    cliente = app.test_client()
+    r = cliente.get('/datos', headers={'If-None-Match': 'W/"7"'})
+    assert r.status_code == 304
+    assert r.data == b''
+    assert r.headers['ETag'] == 'W/"7"'
+    assert app.llamadas == []
+
+
+def test_nueva_ingesta_invalida_el_etag(app):
+    app.estado['version'] = 8
+    r = app.test_client().get('/datos', headers={'If-None-Match': 'W/"7"'})
+    assert r.status_code == 200
+    assert r.headers['ETag'] == 'W/"8"'
+
+
+def test_if_modified_since(app):
+    cliente = app.test_client()
+    actualizado = app.estado['updated_at']
+    assert cliente.get('/datos', headers={'If-Modified-Since': _http(actualizado)}).status_code == 304
+    anterior = actualizado - timedelta(seconds=1)
+    assert cliente.get('/datos', headers={'If-Modified-Since': _http(anterior)}).status_code == 200
+
+
+def test_if_none_match_tiene_prioridad(app):
+    r = app.test_client().get('/datos', headers={
+        'If-None-Match': 'W/"6"',
+        'If-Modified-Since': _http(app.estado['updated_at']),
+    })
+    assert r.status_code == 200
+
+
+def test_errores_sin_validadores(app):
+    r = app.test_client().get('/falla')
+    assert r.status_code == 500
+    assert 'ETag' not in r.headers
+
+
+def test_sin_version_conocida_se_ejecuta_la_vista(app):
+    app.estado['version'] = None
+    r = app.test_client().get('/datos', headers={'If-None-Match': 'W/"7"'})
+    assert r.status_code == 200
+    assert 'ETag' not in r.headers
+
+
+def test_max_age_vencido_queda_en_cero(app):
+    app.estado['updated_at'] -= timedelta(seconds=INGEST_POLL_SECONDS * 3)
+    r = app.test_client().get('/datos')
+    assert 'max-age=0' in r.headers['Cache-Control']
+
+
+def _http(fecha):
+    return fecha.strftime('%a, %d %b %Y %H:%M:%S GMT')
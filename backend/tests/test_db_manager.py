@@ -0,0 +1,60 @@
+"""``execute_prepared``: placeholders admitidos y preparación por conexión."""
+import pytest
+
+from database import db_manager
+from database.db_manager import ConnectionPool, execute_prepared
+
+
+class _Conexion:
+    pass
+
+
+class _Cursor:
+    def __init__(self, conexion=None):
+        self.connection = conexion or _Conexion()
+        self.ejecutadas = []
+
+    def execute(self, sql, params=None):
+        self.ejecutadas.append((sql, params))
+
+
+@pytest.fixture(params=[False, True], ids=['directo', 'preparado'])
+def modo(request, monkeypatch):
+    monkeypatch.setattr(db_manager, 'DB_PREPARED_STATEMENTS', request.param)
+    pool = ConnectionPool('postgresql://no-usado', minconn=0)
+    monkeypatch.setattr(db_manager, 'get_pool', lambda: pool)
+    return request.param
+
+
+@pytest.mark.parametrize('sql, params', [
+    ("SELECT nombre FROM estaciones WHERE nombre LIKE 'a%%' AND codigo = %s", (1,)),
+    ("SELECT * FROM estaciones WHERE codigo = %(codigo)s", ()),
+    ("SELECT %d", ()),
+])
+def test_rechaza_placeholders_no_soportados(modo, sql, params):
+    cursor = _Cursor()
+    with pytest.raises(ValueError, match='placeholder no soportado'):
+        execute_prepared(cursor, 'consulta', sql, params)
+    assert cursor.ejecutadas == []
+
+
+def test_rechaza_conteo_distinto(modo):
+    with pytest.raises(ValueError, match='2 placeholders y 1 parámetros'):
+        execute_prepared(_Cursor(), 'consulta', "SELECT %s, %s", (1,))
+
+
+def test_prepara_una_vez_por_conexion(modo):
+    sql = "SELECT * FROM pronosticos WHERE zona = %s AND fecha >= %s"
+    conexion = _Conexion()
+    primero, segundo, otra = _Cursor(conexion), _Cursor(conexion), _Cursor()
+    for cursor in (primero, segundo, otra):
+        execute_prepared(cursor, 'pronostico_zona', sql, ('medellin', '2026-01-01'))
+
+    if not modo:
+        assert primero.ejecutadas == [(sql, ('medellin', '2026-01-01'))]
+        return
+    prepare = "PREPARE pronostico_zona AS SELECT * FROM pronosticos WHERE zona = $1 AND fecha >= $2"
+    execute = ("EXECUTE pronostico_zona (%s, %s)", ('medellin', '2026-01-01'))
+    assert primero.ejecutadas == [(prepare, None), execute]
+    assert segundo.ejecutadas == [execute]
+    assert otra.ejecutadas == [(prepare, None), execute]
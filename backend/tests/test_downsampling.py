@@ -0,0 +1,30 @@
+"""Largest-Triangle-Three-Buckets de ``api.downsampling``."""
+import numpy as np
+import pytest
+
+from api.downsampling import lttb
+
+
+@pytest.mark.parametrize('n, n_out', [(10, 3), (1000, 50), (1001, 999), (5000, 1000)])
+def test_conserva_primer_y_ultimo_punto(n, n_out):
+    rng = np.random.default_rng(n)
+    x = np.cumsum(rng.random(n) + 0.1)
+    y = rng.standard_normal(n)
+    indices = lttb(x, y, n_out)
+    assert len(indices) == n_out
+    assert indices[0] == 0
+    assert indices[-1] == n - 1
+    assert np.all(np.diff(indices) > 0)
+
+
+def test_conserva_el_pico():
+    x = np.arange(1000, dtype=float)
+    y = np.zeros(1000)
+    y[437] = 100.0
+    assert 437 in lttb(x, y, 20)
+
+
+def test_sin_reduccion_si_hay_pocos_puntos():
+    x = np.arange(5, dtype=float)
+    np.testing.assert_array_equal(lttb(x, x, 5), np.arange(5))
+    np.testing.assert_array_equal(lttb(x, x, 50), np.arange(5))
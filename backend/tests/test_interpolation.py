@@ -0,0 +1,41 @@
+"""Pesos dispersos de ``api.interpolation`` contra ``scipy.interpolate.griddata``."""
+import numpy as np
+import pytest
+
+pytest.importorskip('scipy')
+from scipy.interpolate import griddata
+
+from api.interpolation import GridInterpolator, interpolate_series
+
+
+def _estaciones(semilla, n=25):
+    rng = np.random.default_rng(semilla)
+    lats = 6.1 + rng.random(n) * 0.3
+    lons = -75.7 + rng.random(n) * 0.3
+    vals = 20 + 5 * rng.standard_normal(n)
+    return lats, lons, vals
+
+
+@pytest.mark.parametrize('semilla', [0, 1, 2])
+@pytest.mark.parametrize('grid_size', [10, 37])
+def test_lineal_igual_a_griddata(semilla, grid_size):
+    lats, lons, vals = _estaciones(semilla)
+    interpolador = GridInterpolator(lats, lons, grid_size, 'linear')
+    obtenido = interpolador(vals)
+    esperado = griddata((lats, lons), vals, (interpolador.grid_lat, interpolador.grid_lon), method='linear')
+
+    assert interpolador.method == 'linear'
+    # Fuera del casco convexo ambos dan NaN (las esquinas del rectángulo suelen quedar fuera)
+    np.testing.assert_array_equal(np.isnan(obtenido), np.isnan(esperado))
+    assert np.isnan(obtenido).any()
+    dentro = ~np.isnan(esperado)
+    np.testing.assert_allclose(obtenido[dentro], esperado[dentro], rtol=1e-9, atol=1e-9)
+
+
+def test_serie_usa_los_mismos_pesos():
+    lats, lons, vals = _estaciones(3)
+    cuadros = np.column_stack([vals, vals * 2, vals - 1])
+    grid_lat, grid_lon, grids = interpolate_series(lats, lons, cuadros, 15)
+    for k in range(cuadros.shape[1]):
+        esperado = griddata((lats, lons), cuadros[:, k], (grid_lat, grid_lon), method='linear')
+        np.testing.assert_allclose(grids[k], esperado, rtol=1e-9, atol=1e-9, equal_nan=True)
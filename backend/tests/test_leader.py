@@ -0,0 +1,184 @@
+"""Elección de líder (``etl.leader``) con una conexión PostgreSQL falsa."""
+import threading
+
+import psycopg2
+import pytest
+
+from etl import leader
+from etl.leader import LeaderLock, run_as_leader
+
+
+class _Cursor:
+    def __init__(self, conexion):
+        self.conexion = conexion
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        self.conexion.consultas.append(sql)
+        if self.conexion.caida:
+            raise psycopg2.OperationalError("conexión perdida")
+
+    def fetchone(self):
+        return (self.conexion.servidor.tomar(self.conexion),)
+
+
+class _Conexion:
+    def __init__(self, servidor):
+        self.servidor = servidor
+        self.closed = 0
+        self.caida = False
+        self.autocommit = False
+        self.consultas = []
+
+    def cursor(self):
+        return _Cursor(self)
+
+    def close(self):
+        self.closed = 1
+        self.servidor.soltar(self)
+
+
+class _Servidor:
+    """Advisory lock de sesión: lo tiene a lo sumo una conexión abierta."""
+
+    def __init__(self):
+        self.duenio = None
+        self.conexiones = []
+
+    def connect(self, dsn, **kwargs):
+        conexion = _Conexion(self)
+        self.conexiones.append(conexion)
+        return conexion
+
+    def tomar(self, conexion):
+        if self.duenio is None or self.duenio.closed:
+            self.duenio = conexion
+        return self.duenio is conexion
+
+    def soltar(self, conexion):
+        if self.duenio is conexion:
+            self.duenio = None
+
+
+@pytest.fixture
+def servidor(monkeypatch):
+    s = _Servidor()
+    monkeypatch.setattr(leader.psycopg2, 'connect', s.connect)
+    monkeypatch.setattr(leader, 'ETL_LEADER_RETRY_SECONDS', 0.01)
+    monkeypatch.setattr(leader, '_lock_actual', None)
+    return s
+
+
+def test_un_solo_lider(servidor):
+    a, b = LeaderLock(dsn='x'), LeaderLock(dsn='x')
+    assert a.acquire()
+    assert not b.acquire()
+    a.release()
+    assert b.acquire()
+
+
+def test_es_lider_sin_eleccion(servidor):
+    # run_cycle llamado directamente (scripts) escribe sin lock
+    assert leader.es_lider()
+
+
+def test_es_lider_reutiliza_la_verificacion(servidor, monkeypatch):
+    lock = LeaderLock(dsn='x')
+    lock.acquire()
+    monkeypatch.setattr(leader, '_lock_actual', lock)
+    conexion = servidor.conexiones[0]
+    antes = len(conexion.consultas)
+    for _ in range(50):
+        assert leader.es_lider()
+    assert len(conexion.consultas) == antes  # sin SELECT 1 dentro del TTL
+
+    monkeypatch.setattr(leader, 'ETL_LEADER_CHECK_TTL', 0)
+    assert leader.es_lider()
+    assert conexion.consultas[-1] == "SELECT 1"
+
+
+def test_conexion_cerrada_o_caida(servidor, monkeypatch):
+    lock = LeaderLock(dsn='x')
+    lock.acquire()
+    monkeypatch.setattr(leader, '_lock_actual', lock)
+    conexion = servidor.conexiones[0]
+
+    conexion.closed = 1
+    assert not leader.es_lider()  # detectado sin consultar aunque la verificación sea reciente
+
+    conexion.closed = 0
+    conexion.caida = True
+    assert not lock.is_held()
+
+
+def _correr(detener, start, stop, lock):
+    hilo = threading.Thread(target=run_as_leader, args=(start, stop, detener, lock))
+    hilo.start()
+    return hilo
+
+
+def test_detiene_el_scheduler_al_perder_el_lock(servidor):
+    eventos = []
+    detener = threading.Event()
+    lock = LeaderLock(dsn='x')
+
+    def start():
+        eventos.append('start')
+        servidor.conexiones[-1].caida = True  # se pierde la conexión tras arrancar
+
+    def stop():
+        eventos.append('stop')
+        if eventos.count('stop') == 2:
+            detener.set()
+
+    hilo = _correr(detener, start, stop, lock)
+    hilo.join(5)
+    assert not hilo.is_alive()
+    # start → pérdida → stop y se vuelve a competir (nueva conexión)
+    assert eventos[:2] == ['start', 'stop']
+    assert eventos.count('start') == 2
+    assert len(servidor.conexiones) >= 2
+    assert servidor.conexiones[0].closed
+
+
+def test_error_en_start_vuelve_a_competir(servidor):
+    intentos = []
+    paradas = []
+    detener = threading.Event()
+
+    def start():
+        intentos.append(1)
+        if len(intentos) < 3:
+            raise RuntimeError("scheduler roto")
+        detener.set()
+
+    hilo = _correr(detener, start, lambda: paradas.append(1), LeaderLock(dsn='x'))
+    hilo.join(5)
+    assert not hilo.is_alive()
+    assert len(intentos) == 3
+    assert len(paradas) == 3
+    # Cada intento fallido soltó el lock
+    assert servidor.duenio is None
+
+
+def test_espera_mientras_otro_es_lider(servidor):
+    otro = LeaderLock(dsn='x')
+    otro.acquire()
+    detener = threading.Event()
+    eventos = []
+    hilo = _correr(detener, lambda: eventos.append('start'), lambda: eventos.append('stop'), LeaderLock(dsn='x'))
+    threading.Event().wait(0.05)
+    assert eventos == []
+    otro.release()
+    for _ in range(200):
+        if eventos:
+            break
+        threading.Event().wait(0.01)
+    detener.set()
+    hilo.join(5)
+    assert eventos == ['start', 'stop']
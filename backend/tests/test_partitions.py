@@ -0,0 +1,58 @@
+"""Particiones de ``mediciones`` (``database.partitions``)."""
+from datetime import date, datetime
+
+import pytest
+
+from database import partitions
+
+
+def test_sumar_meses():
+    assert partitions._sumar_meses(date(2024, 11, 1), 3) == date(2025, 2, 1)
+    assert partitions._sumar_meses(date(2024, 1, 1), -1) == date(2023, 12, 1)
+
+
+@pytest.fixture
+def bd(transaccion, monkeypatch):
+    monkeypatch.setattr(partitions, 'get_db_cursor', transaccion)
+    with transaccion() as cursor:
+        cursor.execute("""
+            INSERT INTO estaciones (codigo, nombre, latitud, longitud)
+            VALUES (-8, 'prueba', 6.2, -75.5)
+            ON CONFLICT (codigo) DO NOTHING
+        """)
+    return transaccion
+
+
+def test_filas_sin_particion_van_a_default_y_se_mueven(bd):
+    with bd() as cursor:
+        cursor.execute("""
+            INSERT INTO mediciones (estacion_codigo, date_timestamp, fecha_medicion, t)
+            VALUES (-8, 1, %s, 21.5)
+            RETURNING tableoid::regclass::text AS particion
+        """, (datetime(1990, 3, 15, 12),))
+        assert cursor.fetchone()['particion'] == 'mediciones_default'
+
+    assert date(1990, 3, 1) in partitions.vaciar_particion_default()
+
+    with bd() as cursor:
+        cursor.execute("""
+            SELECT tableoid::regclass::text AS particion, t FROM mediciones
+            WHERE estacion_codigo = -8 AND fecha_medicion = %s
+        """, (datetime(1990, 3, 15, 12),))
+        fila = cursor.fetchone()
+        cursor.execute("SELECT COUNT(*) AS n FROM mediciones_default WHERE fecha_medicion < '1991-01-01'")
+        restantes = cursor.fetchone()['n']
+    assert fila['particion'] == 'mediciones_1990_03'
+    assert float(fila['t']) == 21.5
+    assert restantes == 0
+    assert ('mediciones_1990_03', date(1990, 3, 1)) in partitions.listar_particiones()
+    assert all(nombre != 'mediciones_default' for nombre, _ in partitions.listar_particiones())
+
+
+def test_vaciar_default_respeta_continuar(bd):
+    with bd() as cursor:
+        cursor.execute("""
+            INSERT INTO mediciones (estacion_codigo, date_timestamp, fecha_medicion)
+            VALUES (-8, 1, '1990-05-02')
+        """)
+    assert partitions.vaciar_particion_default(continuar=lambda: False) == []
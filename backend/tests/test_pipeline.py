@@ -0,0 +1,216 @@
+"""Ciclo en etapas de ``etl.pipeline`` con descargas y escrituras falsas."""
+import threading
+import time
+
+import pytest
+
+from etl import pipeline
+from etl.siata_collector import NOT_MODIFIED, WRF_ZONES
+
+
+class _Cliente:
+    """Cliente SIATA falso: ``fetch_many`` sirve ``respuestas`` con ``demora`` por recurso."""
+
+    max_workers = 4
+
+    def __init__(self, demora=0.0):
+        self.demora = demora
+        self.respuestas = {}
+        self.confirmadas = []
+        self.olvidadas = []
+
+    def forecast_url(self, zona):
+        return f"wrf{zona}"
+
+    def stations_url(self):
+        return "estaciones"
+
+    def station_url(self, codigo):
+        return f"estacion/{codigo}"
+
+    def reset_stats(self):
+        pass
+
+    def stats(self):
+        return {'hits': 0, 'misses': 0, 'not_modified': 0, 'same_digest': 0,
+                'bytes_downloaded': 0, 'bytes_saved': 0}
+
+    def confirm(self, *urls):
+        self.confirmadas.extend(urls)
+
+    def forget(self, *urls):
+        self.olvidadas.extend(urls)
+
+    def fetch_many(self, urls, timeout=None, conditional=False, timed=False):
+        for clave, url in urls.items():
+            if self.demora:
+                time.sleep(self.demora)
+            data = self.respuestas.get(url, NOT_MODIFIED)
+            if isinstance(data, Exception):
+                yield clave, None, data, self.demora
+            else:
+                yield clave, data, None, self.demora
+
+
+class _Escrituras:
+    """Registra lo que el pipeline escribe; ``fallar`` hace fallar ``save_mediciones``."""
+
+    def __init__(self, demora=0.0):
+        self.demora = demora
+        self.fallar = False
+        self.mediciones = []
+        self.lotes = 0
+        self.estaciones = []
+        self.pronosticos = []
+        self.sondeos = []
+        self.ejecuciones = []
+
+    def save_mediciones(self, registros):
+        if self.fallar:
+            raise RuntimeError("BD caída")
+        time.sleep(self.demora)
+        self.lotes += 1
+        self.mediciones.extend(registros)
+        return len(registros)
+
+    def save_estaciones(self, data):
+        self.estaciones.append(data)
+        return len(data['estaciones'])
+
+    def save_wrf_forecasts(self, por_zona):
+        self.pronosticos.append(dict(por_zona))
+        return {zona: {'nuevos': 1, 'actualizados': 0} for zona in por_zona}
+
+    def registrar_sondeos(self, resultados):
+        self.sondeos.extend(resultados)
+        return len(resultados)
+
+    def guardar_ejecucion(self, resumen, estaciones):
+        self.ejecuciones.append((resumen, estaciones))
+        return len(self.ejecuciones)
+
+
+@pytest.fixture
+def entorno(monkeypatch):
+    def preparar(codigos, demora_descarga=0.0, demora_escritura=0.0, lider=True):
+        cliente = _Cliente(demora_descarga)
+        ahora = time.time()
+        for codigo in codigos:
+            cliente.respuestas[cliente.station_url(codigo)] = {'date': ahora - 60, 't': 20.0}
+        escrituras = _Escrituras(demora_escritura)
+        lideres = {'valor': lider}
+        monkeypatch.setattr(pipeline, 'get_siata_client', lambda: cliente)
+        monkeypatch.setattr(pipeline, 'save_mediciones', escrituras.save_mediciones)
+        monkeypatch.setattr(pipeline, 'save_estaciones', escrituras.save_estaciones)
+        monkeypatch.setattr(pipeline, 'save_wrf_forecasts', escrituras.save_wrf_forecasts)
+        monkeypatch.setattr(pipeline.polling, 'estaciones_a_sondear', lambda: (list(codigos), len(codigos)))
+        monkeypatch.setattr(pipeline.polling, 'registrar_sondeos', escrituras.registrar_sondeos)
+        monkeypatch.setattr(pipeline.runs, 'guardar_ejecucion', escrituras.guardar_ejecucion)
+        monkeypatch.setattr(pipeline, 'es_lider', lambda: lideres['valor'])
+        monkeypatch.setattr(pipeline, 'bump_ingest_generation', lambda: 1)
+        monkeypatch.setattr(pipeline, '_ultimo_catalogo', None)
+        return cliente, escrituras, lideres
+    return preparar
+
+
+def test_ciclo_completo(entorno):
+    cliente, escrituras, _ = entorno(range(1, 21))
+    for zona in WRF_ZONES:
+        cliente.respuestas[cliente.forecast_url(zona)] = {'date': '1', 'pronostico': []}
+    cliente.respuestas[cliente.stations_url()] = {'estaciones': [{'codigo': 1}], 'red': 'meteo'}
+
+    resumen = pipeline.run_cycle(deadline=30, catalogo=True)
+
+    assert resumen['errores'] == []
+    assert not resumen['vencido'] and not resumen['abortado']
+    assert resumen['estaciones_sondeadas'] == 20
+    assert sorted(r[0] for r in escrituras.mediciones) == list(range(1, 21))
+    assert len(escrituras.estaciones) == 1
+    assert set(escrituras.pronosticos[0]) == set(WRF_ZONES)
+    assert len(escrituras.sondeos) == 20
+    assert resumen['run_id'] == 1
+    # Todo lo escrito queda confirmado; nada olvidado
+    assert set(cliente.confirmadas) >= {cliente.station_url(c) for c in range(1, 21)} | {cliente.stations_url()}
+    assert cliente.olvidadas == []
+    assert pipeline._ultimo_catalogo is not None
+
+
+def test_plazo_deja_de_iniciar_descargas(entorno):
+    _, escrituras, _ = entorno(range(1, 201), demora_descarga=0.01)
+    inicio = time.monotonic()
+    resumen = pipeline.run_cycle(deadline=0.2, catalogo=False)
+
+    assert resumen['vencido']
+    assert 0 < resumen['estaciones_sondeadas'] < 200
+    assert resumen['estaciones_sondeadas'] + resumen['estaciones_omitidas'] == 200
+    # Lo descargado antes del plazo se escribe igual
+    assert len(escrituras.mediciones) == resumen['estaciones_sondeadas']
+    assert time.monotonic() - inicio < 1.5
+
+
+def test_backpressure_con_colas_acotadas(entorno, monkeypatch):
+    monkeypatch.setattr(pipeline, 'ETL_QUEUE_SIZE', 2)
+    monkeypatch.setattr(pipeline, 'ETL_WRITE_BATCH', 1)
+    _, escrituras, _ = entorno(range(1, 31), demora_escritura=0.005)
+
+    resumen = pipeline.run_cycle(deadline=30, catalogo=False)
+
+    assert len(escrituras.mediciones) == 30
+    assert escrituras.lotes == 30
+    for cola in resumen['colas'].values():
+        assert cola['capacidad'] == 2
+        assert cola['max_profundidad'] <= 2
+    # La escritura lenta frena a las etapas anteriores
+    assert resumen['etapas']['descarga']['espera_s'] + resumen['etapas']['limpieza']['espera_s'] > 0.05
+
+
+def test_sin_liderazgo_aborta_sin_escribir(entorno):
+    cliente, escrituras, _ = entorno(range(1, 11), lider=False)
+
+    resumen = pipeline.run_cycle(deadline=30, catalogo=False)
+
+    assert resumen['abortado']
+    assert any('liderazgo' in e for e in resumen['errores'])
+    assert escrituras.mediciones == []
+    assert escrituras.sondeos == []
+    assert escrituras.ejecuciones == []
+    assert resumen['run_id'] is None
+    assert cliente.confirmadas == []
+    assert set(cliente.olvidadas) == {cliente.station_url(c) for c in range(1, 11)}
+
+
+def test_error_de_escritura_olvida_y_reintenta(entorno):
+    cliente, escrituras, _ = entorno(range(1, 6))
+    escrituras.fallar = True
+
+    resumen = pipeline.run_cycle(deadline=30, catalogo=False)
+
+    assert any(e.startswith('mediciones:') for e in resumen['errores'])
+    assert set(cliente.olvidadas) == {cliente.station_url(c) for c in range(1, 6)}
+    assert cliente.confirmadas == []
+    # Las estaciones sin guardar cuentan como fallo para el sondeo adaptativo
+    assert {r for _, r, _ in escrituras.sondeos} == {'error'}
+
+
+def test_catalogo_fallido_no_marca_el_catalogo(entorno):
+    cliente, _, _ = entorno([])
+    cliente.respuestas[cliente.stations_url()] = ConnectionError("caída")
+
+    pipeline.run_cycle(deadline=30, catalogo=True)
+
+    assert pipeline._ultimo_catalogo is None
+    assert pipeline._catalogo_pendiente()
+
+
+def test_ciclos_no_se_solapan(entorno):
+    entorno(range(1, 31), demora_descarga=0.01)
+    resultados = []
+    primero = threading.Thread(target=lambda: resultados.append(pipeline.collect_all_data()))
+    primero.start()
+    while pipeline._ciclo_actual is None and primero.is_alive():
+        time.sleep(0.001)
+
+    assert pipeline.collect_all_data() is None
+    primero.join()
+    assert resultados[0] is not None
+    assert resultados[0]['estaciones_sondeadas'] == 30
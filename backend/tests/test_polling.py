@@ -0,0 +1,43 @@
+"""Backoff de ``siguiente_estado`` ante descargas sin lectura nueva."""
+from datetime import datetime, timedelta, timezone
+
+from database.ingest import INGEST_POLL_SECONDS
+from etl import polling
+from etl.polling import ETL_POLL_MAX_BACKOFF, siguiente_estado
+
+AHORA = datetime(2026, 1, 1, 12, tzinfo=timezone.utc)
+
+
+def _fallar(veces, resultado='sin_cambios'):
+    estado = None
+    for _ in range(veces):
+        cadencia, ultimo, fallos, proximo = siguiente_estado(estado, resultado, None, AHORA)
+        estado = {'cadencia_s': cadencia, 'ultimo_timestamp': ultimo, 'fallos': fallos}
+    return estado, proximo
+
+
+def test_backoff_se_duplica_por_fallo():
+    for veces in range(1, 5):
+        estado, proximo = _fallar(veces)
+        assert estado['fallos'] == veces
+        esperado = min(ETL_POLL_MAX_BACKOFF, INGEST_POLL_SECONDS * 2 ** (veces - 1))
+        assert proximo - AHORA == timedelta(seconds=esperado)
+
+
+def test_backoff_tiene_tope(monkeypatch):
+    monkeypatch.setattr(polling, 'ETL_POLL_MAX_BACKOFF', INGEST_POLL_SECONDS * 4)
+    for resultado in ('sin_cambios', 'error_conexion', 'inactiva'):
+        estado, proximo = _fallar(40, resultado)
+        assert estado['fallos'] == 40
+        assert proximo - AHORA == timedelta(seconds=INGEST_POLL_SECONDS * 4)
+
+
+def test_lectura_nueva_reinicia_los_fallos():
+    estado, _ = _fallar(5)
+    estado['ultimo_timestamp'] = int(AHORA.timestamp()) - 600
+    lectura = int(AHORA.timestamp()) - 60
+    cadencia, ultimo, fallos, proximo = siguiente_estado(estado, 'activa', lectura, AHORA)
+    assert fallos == 0
+    assert ultimo == lectura
+    assert cadencia == 540
+    assert proximo > AHORA
@@ -0,0 +1,78 @@
+"""Tramos de ``planificar_ventana`` para ventanas no alineadas y ``consulta_cuadros``."""
+from datetime import datetime, timedelta
+
+import pytest
+
+from database.rollups import consulta_cuadros, planificar_ventana
+
+
+def _contiguos(tramos, desde, hasta):
+    assert tramos[0][1] == desde
+    assert tramos[-1][2] == hasta
+    for (_, _, fin), (_, inicio, _) in zip(tramos, tramos[1:]):
+        assert fin == inicio
+
+
+def test_ventana_de_varios_dias_no_alineada():
+    desde = datetime(2026, 1, 1, 10, 15)
+    hasta = datetime(2026, 1, 3, 5, 40)
+    tramos = planificar_ventana(desde, hasta)
+    assert tramos == [
+        ('crudo', desde, datetime(2026, 1, 1, 11)),
+        ('hora', datetime(2026, 1, 1, 11), datetime(2026, 1, 2)),
+        ('dia', datetime(2026, 1, 2), datetime(2026, 1, 3)),
+        ('hora', datetime(2026, 1, 3), datetime(2026, 1, 3, 5)),
+        ('crudo', datetime(2026, 1, 3, 5), hasta),
+    ]
+    _contiguos(tramos, desde, hasta)
+
+
+def test_ventana_dentro_de_un_dia():
+    desde = datetime(2026, 1, 1, 10, 15)
+    hasta = datetime(2026, 1, 1, 13, 20)
+    tramos = planificar_ventana(desde, hasta)
+    assert tramos == [
+        ('crudo', desde, datetime(2026, 1, 1, 11)),
+        ('hora', datetime(2026, 1, 1, 11), datetime(2026, 1, 1, 13)),
+        ('crudo', datetime(2026, 1, 1, 13), hasta),
+    ]
+
+
+def test_ventana_dentro_de_una_hora():
+    desde = datetime(2026, 1, 1, 10, 15)
+    hasta = datetime(2026, 1, 1, 10, 45)
+    assert planificar_ventana(desde, hasta) == [('crudo', desde, hasta)]
+
+
+def test_bordes_alineados_sin_tramos_crudos():
+    desde = datetime(2026, 1, 1)
+    hasta = datetime(2026, 1, 4)
+    assert planificar_ventana(desde, hasta) == [('dia', desde, hasta)]
+
+
+def test_ventana_vacia_o_invertida():
+    t = datetime(2026, 1, 1, 10, 15)
+    assert planificar_ventana(t, t) == []
+    assert planificar_ventana(datetime(2026, 1, 2), t) == []
+
+
+def test_cuadros_horarios_solo_de_rollups():
+    sql, params = consulta_cuadros('t', datetime(2026, 1, 1, 6), timedelta(hours=3), 16, excluir={403})
+    assert 'FROM mediciones_hora' in sql
+    assert 'mediciones_dia' not in sql
+    assert 'FROM mediciones m' not in sql
+    assert params[-1] == [403]
+
+
+def test_cuadros_diarios_usan_mediciones_dia():
+    sql, _ = consulta_cuadros('t', datetime(2026, 1, 1), timedelta(days=1), 10)
+    assert 'mediciones_dia' in sql
+
+
+def test_cuadros_requieren_horas_enteras():
+    with pytest.raises(ValueError):
+        consulta_cuadros('t', datetime(2026, 1, 1), timedelta(minutes=90), 4)
+    with pytest.raises(ValueError):
+        consulta_cuadros('t', datetime(2026, 1, 1, 0, 30), timedelta(hours=1), 4)
+    with pytest.raises(ValueError):
+        consulta_cuadros('x', datetime(2026, 1, 1), timedelta(hours=1), 4)
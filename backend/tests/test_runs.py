@@ -0,0 +1,71 @@
+"""Bitácora de ciclos (``etl.runs``) sobre PostgreSQL (``TEST_DATABASE_URL``)."""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from etl import runs
+
+
+@pytest.fixture
+def bd(transaccion, monkeypatch):
+    monkeypatch.setattr(runs, 'get_db_cursor', transaccion)
+    return transaccion
+
+
+def _resumen(inicio=None, **cambios):
+    resumen = {
+        'inicio': (inicio or datetime.now(timezone.utc)).isoformat(),
+        'duracion_s': 12.5, 'plazo_s': 50.0, 'vencido': False, 'abortado': False,
+        'catalogo': True, 'estaciones': 10, 'estaciones_sondeadas': 3, 'estaciones_omitidas': 0,
+        'escrituras': 4,
+        'mediciones': {'activa': 2, 'antigua': 1, 'inactiva': 0, 'sin_cambios': 0,
+                       'error_conexion': 1, 'error': 1, 'guardadas': 2},
+        'etapas': {'descarga': {'items': 3}}, 'colas': {}, 'descargas': {'hits': 1},
+        'errores': ['mediciones: x'],
+    }
+    resumen.update(cambios)
+    return resumen
+
+
+def test_guardar_ejecucion(bd):
+    run_id = runs.guardar_ejecucion(_resumen(), [(1, 'activa', 0.1234), (2, 'error_conexion', None),
+                                                 (1, 'activa', 9.0)])
+    with bd() as cursor:
+        cursor.execute("SELECT * FROM etl_runs WHERE id = %s", (run_id,))
+        fila = cursor.fetchone()
+        cursor.execute("SELECT estacion_codigo, resultado, latencia_ms FROM etl_run_estaciones "
+                       "WHERE run_id = %s ORDER BY estacion_codigo", (run_id,))
+        estaciones = cursor.fetchall()
+
+    assert (fila['activas'], fila['antiguas'], fila['errores_descarga']) == (2, 1, 2)
+    assert fila['mediciones_guardadas'] == 2 and fila['escrituras'] == 4
+    assert fila['errores'] == ['mediciones: x']
+    assert fila['resumen'] == {'etapas': {'descarga': {'items': 3}}, 'colas': {}, 'descargas': {'hits': 1}}
+    # Latencia en ms redondeada; una estación repetida se registra una vez
+    assert [(e['estacion_codigo'], e['resultado'], e['latencia_ms']) for e in estaciones] == [
+        (1, 'activa', pytest.approx(123.4)), (2, 'error_conexion', None)]
+
+
+def test_podar_ejecuciones_borra_en_cascada(bd):
+    vieja = runs.guardar_ejecucion(_resumen(datetime.now(timezone.utc) - timedelta(days=40)), [(1, 'activa', 0.1)])
+    nueva = runs.guardar_ejecucion(_resumen(), [(1, 'activa', 0.1)])
+
+    assert runs.podar_ejecuciones(0) == 0
+    assert runs.podar_ejecuciones(30) >= 1
+    with bd() as cursor:
+        cursor.execute("SELECT id FROM etl_runs WHERE id IN (%s, %s)", (vieja, nueva))
+        assert [r['id'] for r in cursor.fetchall()] == [nueva]
+        cursor.execute("SELECT count(*) AS n FROM etl_run_estaciones WHERE run_id = %s", (vieja,))
+        assert cursor.fetchone()['n'] == 0
+
+
+def test_mantener_bitacora_sin_liderazgo_no_poda(bd):
+    vieja = runs.guardar_ejecucion(_resumen(datetime.now(timezone.utc) - timedelta(days=400)), [])
+    runs.mantener_bitacora(continuar=lambda: False)
+    with bd() as cursor:
+        cursor.execute("SELECT count(*) AS n FROM etl_runs WHERE id = %s", (vieja,))
+        assert cursor.fetchone()['n'] == 1
+    runs.mantener_bitacora(continuar=lambda: True)
+    with bd() as cursor:
+        cursor.execute("SELECT count(*) AS n FROM etl_runs WHERE id = %s", (vieja,))
+        assert cursor.fetchone()['n'] == 0
@@ -0,0 +1,102 @@
+"""Descargas condicionales de ``SiataCollector.fetch_json``."""
+import json
+
+import pytest
+import requests
+
+from etl.siata_collector import NOT_MODIFIED, SiataCollector
+
+
+class _Respuesta:
+    def __init__(self, status_code, content=b'', headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"HTTP {self.status_code}")
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class _Servidor:
+    """Sesión falsa: sirve ``cuerpo`` con ETag y responde 304 si coincide."""
+
+    def __init__(self, cuerpo, etag='"v1"'):
+        self.cuerpo = cuerpo
+        self.etag = etag
+        self.peticiones = []
+
+    def get(self, url, timeout=None, headers=None):
+        headers = headers or {}
+        self.peticiones.append(headers)
+        if self.etag is not None and headers.get('If-None-Match') == self.etag:
+            return _Respuesta(304)
+        return _Respuesta(200, self.cuerpo, {'ETag': self.etag} if self.etag else {})
+
+
+@pytest.fixture
+def cliente():
+    c = SiataCollector(base_url='http://siata.test/')
+    c.servidor = _Servidor(b'{"date": 1, "t": 20.5}')
+    c.session = c.servidor
+    return c
+
+
+def test_sin_confirmar_se_vuelve_a_procesar(cliente):
+    url = cliente.station_url(1)
+    assert cliente.fetch_json(url, conditional=True) == {'date': 1, 't': 20.5}
+    # Sin confirm (p.ej. la escritura falló) no se envían validadores
+    assert cliente.fetch_json(url, conditional=True) == {'date': 1, 't': 20.5}
+    assert 'If-None-Match' not in cliente.servidor.peticiones[1]
+
+
+def test_confirmado_responde_not_modified(cliente):
+    url = cliente.station_url(1)
+    cliente.fetch_json(url, conditional=True)
+    cliente.confirm(url)
+    assert cliente.fetch_json(url, conditional=True) is NOT_MODIFIED
+    assert cliente.servidor.peticiones[1]['If-None-Match'] == '"v1"'
+    stats = cliente.stats()
+    assert stats['not_modified'] == 1
+    assert stats['misses'] == 1
+
+
+def test_mismo_digest_sin_etag(cliente):
+    cliente.servidor.etag = None
+    url = cliente.station_url(1)
+    cliente.fetch_json(url, conditional=True)
+    cliente.confirm(url)
+    assert cliente.fetch_json(url, conditional=True) is NOT_MODIFIED
+    assert cliente.stats()['same_digest'] == 1
+
+
+def test_cuerpo_invalido_no_deja_validadores(cliente):
+    url = cliente.station_url(1)
+    cliente.servidor.cuerpo = b'{"date": 1, "t": 2'  # truncado
+    with pytest.raises(ValueError):
+        cliente.fetch_json(url, conditional=True)
+    cliente.confirm(url)
+    # El mismo contenido (corregido) se vuelve a descargar y decodificar
+    cliente.servidor.cuerpo = b'{"date": 1, "t": 20.5}'
+    assert cliente.fetch_json(url, conditional=True) == {'date': 1, 't': 20.5}
+    assert 'If-None-Match' not in cliente.servidor.peticiones[1]
+
+
+def test_forget_descarta_confirmados_y_pendientes(cliente):
+    url = cliente.station_url(1)
+    cliente.fetch_json(url, conditional=True)
+    cliente.confirm(url)
+    cliente.forget(url)
+    assert cliente.fetch_json(url, conditional=True) == {'date': 1, 't': 20.5}
+    cliente.forget(url)
+    cliente.confirm(url)
+    assert cliente.fetch_json(url, conditional=True) == {'date': 1, 't': 20.5}
+
+
+def test_error_http(cliente):
+    cliente.servidor.get = lambda url, timeout=None, headers=None: _Respuesta(503)
+    with pytest.raises(requests.HTTPError):
+        cliente.fetch_json(cliente.station_url(1), conditional=True)
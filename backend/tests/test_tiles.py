@@ -0,0 +1,87 @@
+"""Teselas raster (``api.tiles``): PNG, muestreo de la grilla y poda de versiones."""
+import os
+import struct
+import zlib
+
+import numpy as np
+import pytest
+
+from api import tiles
+from api.tiles import TILE_SIZE, TileField, encode_png, prune_tiles, render_tile, save_tile, tile_path
+
+
+def _decodificar_png(png):
+    assert png[:8] == b'\x89PNG\r\n\x1a\n'
+    pos, chunks = 8, {}
+    while pos < len(png):
+        largo, = struct.unpack('>I', png[pos:pos + 4])
+        tag = png[pos + 4:pos + 8]
+        data = png[pos + 8:pos + 8 + largo]
+        crc, = struct.unpack('>I', png[pos + 8 + largo:pos + 12 + largo])
+        assert crc == zlib.crc32(tag + data) & 0xffffffff
+        chunks.setdefault(tag, b'')
+        chunks[tag] += data
+        pos += 12 + largo
+    ancho, alto, profundidad, color = struct.unpack('>IIBB', chunks[b'IHDR'][:10])
+    assert (profundidad, color) == (8, 6)  # RGBA de 8 bits
+    crudo = np.frombuffer(zlib.decompress(chunks[b'IDAT']), dtype=np.uint8).reshape(alto, ancho * 4 + 1)
+    assert not crudo[:, 0].any()  # filtro 0 en cada fila
+    return crudo[:, 1:].reshape(alto, ancho, 4)
+
+
+def test_encode_png_ida_y_vuelta():
+    rgba = np.random.default_rng(0).integers(0, 256, (7, 5, 4), dtype=np.uint8)
+    np.testing.assert_array_equal(_decodificar_png(encode_png(rgba)), rgba)
+
+
+def _campo(stats=None):
+    lat = np.linspace(6.0, 6.4, 5)
+    lon = np.linspace(-75.8, -75.4, 5)
+    grid_lon, grid_lat = np.meshgrid(lon, lat)
+    valores = grid_lat * 10  # crece hacia el norte
+    valores[0, 0] = np.nan
+    stats = stats or {'min': 60, 'q25': 61, 'q50': 62, 'q75': 63, 'q90': 63.5, 'max': 64}
+    return TileField(grid_lat, grid_lon, valores, stats, 'temperature')
+
+
+def test_muestreo_bilineal_y_fuera_de_la_grilla():
+    campo = _campo()
+    assert campo.sample(np.array(6.2), np.array(-75.6)) == pytest.approx(62.0)
+    assert np.isnan(campo.sample(np.array(7.0), np.array(-75.6)))
+
+
+def test_colores_siguen_la_escala():
+    campo = _campo()
+    rgba = campo.colorize(np.array([60.0, 64.0, np.nan]))
+    assert tuple(rgba[0, :3]) == (0, 0, 255)    # mínimo → primer color de la paleta
+    assert tuple(rgba[1, :3]) == (255, 0, 0)    # máximo → último color
+    assert rgba[2, 3] == 0 and rgba[0, 3] == tiles.TILE_ALPHA
+
+
+def test_render_tile():
+    campo = _campo()
+    # Tesela de zoom 8 que contiene el área metropolitana
+    n = 2 ** 8
+    x = int((-75.6 + 180) / 360 * n)
+    y = int((1 - np.arcsinh(np.tan(np.radians(6.2))) / np.pi) / 2 * n)
+    rgba = _decodificar_png(render_tile(campo, 8, x, y))
+    assert rgba.shape == (TILE_SIZE, TILE_SIZE, 4)
+    assert (rgba[..., 3] > 0).any() and (rgba[..., 3] == 0).any()
+    assert render_tile(campo, 8, 0, 0) is None  # lejos de la grilla
+
+
+def test_prune_conserva_la_version_anterior(tmp_path):
+    for nombre in ('3', '4', '5', 'otro'):
+        (tmp_path / nombre).mkdir()
+    prune_tiles('6', str(tmp_path))
+    assert sorted(os.listdir(tmp_path)) == ['5', 'otro']
+
+
+def test_save_tile_escribe_y_poda_al_cambiar_de_version(tmp_path, monkeypatch):
+    monkeypatch.setattr(tiles, '_current_version', None)
+    (tmp_path / '1').mkdir()
+    ruta = tile_path('3', 'temperature', 'mean_grid_24', 8, 1, 2, str(tmp_path))
+    save_tile(ruta, '3', b'png', str(tmp_path))
+    assert open(ruta, 'rb').read() == b'png'
+    assert sorted(os.listdir(tmp_path)) == ['3']
+    assert not [f for f in os.listdir(os.path.dirname(ruta)) if f.endswith('.tmp')]
@@ -71,6 +71,9 @@ class MapManager {
                     <label class="checkbox-inline">
                         <input id="hm-interpolate" type="checkbox" /> Interpolar
                     </label>
+                    <label class="checkbox-inline">
+                        <input id="hm-raster" type="checkbox" /> Raster
+                    </label>
                     <label class="checkbox-inline">
                         <input id="hm-toggle-markers" type="checkbox" checked /> Marcadores
                     </label>
@@ -79,6 +82,8 @@ class MapManager {
                             <option value="grid" selected>Grid</option>
                             <option value="poly2">Polinomio 2º</option>
                             <option value="poly3">Polinomio 3º</option>
+                            <option value="idw">IDW</option>
+                            <option value="kriging">Kriging</option>
                         </select>
                     </label>
                 </div>
@@ -207,6 +212,7 @@ class MapManager {
             const endDate = document.getElementById('hm-end-date').value;
             const interpolate = document.getElementById('hm-interpolate').checked;
             const method = document.getElementById('hm-method').value;
+            const raster = document.getElementById('hm-raster').checked;
             const showMarkers = document.getElementById('hm-toggle-markers').checked;
             if (!showMarkers) this.clearMarkers(); else if (this.markers.length===0) this.addStationsToMap();
             this.showHeatmapMessage('Generando...');
@@ -214,12 +220,13 @@ class MapManager {
             const qs = new URLSearchParams();
             qs.append('parameter', parameter); qs.append('agg', agg);
             if (hoursBack) qs.append('hours_back', hoursBack); else { if (startDate) qs.append('start_date', startDate); if (endDate) qs.append('end_date', endDate);}
-            const endpoint = interpolate ? `/api/heatmap/interpolate?${qs.toString()}&grid_size=55&method=${method}` : `/api/heatmap?${qs.toString()}`;
+            if (interpolate && raster) { await this.renderTileLayer(parameter, qs, method); return; }
+            const endpoint = interpolate ? `/api/heatmap/interpolate?${qs.toString()}&grid_size=55&method=${method}&format=f32` : `/api/heatmap?${qs.toString()}`;
             const resp = await fetch(endpoint);
             if (!resp.ok) throw new Error('HTTP '+resp.status);
             const json = await resp.json();
             if (!json.success) throw new Error(json.error||'Error backend');
-            const points = interpolate ? (json.interpolated_points||[]) : (json.points||[]);
+            const points = interpolate ? (json.grid ? this.gridToPoints(json.grid) : (json.interpolated_points||[])) : (json.points||[]);
             if (points.length === 0) { this.showHeatmapMessage('Sin puntos'); return; }
             this.currentRawPoints = points;
             const values = points.map(p=>p.value).filter(v=>typeof v==='number');
@@ -238,11 +245,50 @@ class MapManager {
         }
     }
 
+    // Teselas PNG renderizadas en el backend (/api/heatmap/tiles); la escala da leyenda y versión
+    async renderTileLayer(parameter, qs, method){
+        qs.delete('parameter'); qs.append('method', method);
+        try {
+            const resp = await fetch(`/api/heatmap/tiles/${parameter}/scale?${qs.toString()}`);
+            const json = await resp.json();
+            if (!resp.ok || !json.success) { this.showHeatmapMessage(json.warning || json.error || 'Sin datos para teselas'); return; }
+            const stats = json.stats;
+            if (!stats || typeof stats.min !== 'number' || typeof stats.max !== 'number') { this.showHeatmapMessage(json.warning || 'Sin escala para teselas'); return; }
+            qs.append('v', json.version);
+            this.clearHeatmap();
+            this.heatmapLayer = L.tileLayer(`/api/heatmap/tiles/${parameter}/{z}/{x}/{y}.png?${qs.toString()}`, { opacity: 0.8, maxZoom: json.max_zoom }).addTo(this.map);
+            this.showDynamicLegend(parameter, stats.min, stats.max, {stats});
+            this.updateMetaInfo({parameter, agg: json.aggregation, count: 'raster', min: stats.min, max: stats.max, interpolate: true, method});
+        } catch (e) {
+            console.error(e);
+            this.showHeatmapMessage('Error generando teselas');
+        }
+    }
+
+    // Grilla columnar de /api/heatmap/interpolate (format=columnar|f32) → puntos con valor
+    gridToPoints(grid){
+        const [lat0, lon0] = grid.origin, [dLat, dLon] = grid.step, [rows, cols] = grid.shape;
+        let values = grid.values;
+        if (grid.encoding === 'float32-le-base64') {
+            const bin = atob(grid.values); const view = new DataView(new ArrayBuffer(bin.length));
+            for (let i=0;i<bin.length;i++) view.setUint8(i, bin.charCodeAt(i));
+            values = new Float32Array(rows*cols);
+            for (let i=0;i<values.length;i++) values[i] = view.getFloat32(i*4, true);
+        }
+        const points = [];
+        for (let i=0;i<rows;i++) for (let j=0;j<cols;j++) {
+            const v = values[i*cols+j];
+            if (v == null || Number.isNaN(v)) continue;
+            points.push({latitude: lat0+i*dLat, longitude: lon0+j*dLon, value: v});
+        }
+        return points;
+    }
+
     updateMetaInfo(meta) {
         this.lastHeatmapMeta = meta;
         const el = document.getElementById('hm-meta');
         if (!el) return; el.style.display='block';
-    const methodLabel = meta.method==='poly2' ? 'Polinomio 2º' : meta.method==='poly3' ? 'Polinomio 3º' : 'Grid';
+    const methodLabel = meta.method==='poly2' ? 'Polinomio 2º' : meta.method==='poly3' ? 'Polinomio 3º' : meta.method==='idw' ? 'IDW' : meta.method==='kriging' ? 'Kriging' : 'Grid';
     const extra = meta.method? ` • ${methodLabel}`:'';
     el.innerHTML = `<div><strong>${this.prettyParam(meta.parameter)}</strong> (${meta.agg}) ${meta.interpolate? '• Interpolado':''}${extra}</div>
             <div>Puntos: ${meta.count}</div>